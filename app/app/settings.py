@@ -43,6 +43,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'core',
     'rest_framework',
     'rest_framework.authtoken',
@@ -52,6 +53,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.performance.PerformanceMiddleware',
+    'core.queries.QueryInspectionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -85,15 +88,82 @@ WSGI_APPLICATION = 'app.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
+# Seconds a worker keeps its database connection between requests (0
+# closes it after every request). Connections idle for longer than
+# DB_HEALTH_CHECK_IDLE seconds are pinged before they are reused.
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', 600))
+DB_HEALTH_CHECK_IDLE = int(os.environ.get('DB_HEALTH_CHECK_IDLE', 10))
+# Set when DB_HOST is a pgbouncer in transaction pooling mode, which cannot
+# keep server-side cursors open across transactions
+DB_PGBOUNCER = bool(int(os.environ.get('DB_PGBOUNCER', 0)))
+
+# Threads (each with its own connection) running the ORM code of async
+# views per ASGI process; 0 runs it on each request's own thread
+ASYNC_DB_THREADS = int(os.environ.get('ASYNC_DB_THREADS', 16))
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
         'HOST': os.environ.get('DB_HOST'),
+        'PORT': os.environ.get('DB_PORT', ''),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
+        'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+        'DISABLE_SERVER_SIDE_CURSORS': DB_PGBOUNCER,
+        'OPTIONS': {
+            'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', 5)),
+        },
+    }
+}
+
+# Read replicas: comma separated host[:port] of hot standbys of DB_HOST,
+# added as replica1, replica2... and read from by the safe-method requests
+# of the recipe, tag and ingredient endpoints (core.replicas). A user who
+# writes reads from the primary for DB_REPLICA_STICKY_SECONDS. Replicas
+# lagging more than DB_REPLICA_MAX_LAG seconds, or down, are skipped; each
+# worker checks them every DB_REPLICA_CHECK_INTERVAL seconds.
+DB_REPLICA_HOSTS = [
+    host.strip()
+    for host in os.environ.get('DB_REPLICA_HOSTS', '').split(',')
+    if host.strip()
+]
+DB_REPLICA_STICKY_SECONDS = int(
+    os.environ.get('DB_REPLICA_STICKY_SECONDS', 10)
+)
+DB_REPLICA_MAX_LAG = float(os.environ.get('DB_REPLICA_MAX_LAG', 5))
+DB_REPLICA_CHECK_INTERVAL = float(
+    os.environ.get('DB_REPLICA_CHECK_INTERVAL', 5)
+)
+
+for number, replica in enumerate(DB_REPLICA_HOSTS, 1):
+    replica_host, _, replica_port = replica.partition(':')
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'HOST': replica_host,
+        'PORT': replica_port or DATABASES['default']['PORT'],
+        'OPTIONS': dict(DATABASES['default']['OPTIONS']),
+        # Tests read the test database through the replica aliases
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['core.replicas.ReplicaRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.0/topics/cache/
+# Set REDIS_URL to share the cache between workers.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
+if os.environ.get('REDIS_URL'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['REDIS_URL'],
+    }
 
 
 # Password validation
@@ -137,6 +207,13 @@ MEDIA_URL = '/static/media/'
 
 STATIC_ROOT = '/vol/web/static/'
 MEDIA_URL  = '/vol/web/media/'
+
+# Write uploaded files straight to disk instead of buffering small ones
+# in worker memory
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
@@ -144,9 +221,145 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'core.User'
 
+# JSON is rendered and parsed by core.fastjson, with orjson when it is
+# installed; 0 switches back to DRF's own renderer and parser
+API_FAST_JSON = bool(int(os.environ.get('API_FAST_JSON', 1)))
+
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS' : 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.fastjson.FastJSONRenderer' if API_FAST_JSON
+        else 'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'core.fastjson.FastJSONParser' if API_FAST_JSON
+        else 'rest_framework.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+}
+API_PAGE_SIZE = int(os.environ.get('API_PAGE_SIZE', 100))
+API_MAX_PAGE_SIZE = int(os.environ.get('API_MAX_PAGE_SIZE', 1000))
+
+# Token authentication cache: an in-process LRU of resolved tokens,
+# optionally backed by a shared cache alias from CACHES
+TOKEN_AUTH_CACHE_SIZE = int(os.environ.get('TOKEN_AUTH_CACHE_SIZE', 10000))
+TOKEN_AUTH_CACHE_TTL = int(os.environ.get('TOKEN_AUTH_CACHE_TTL', 30))
+TOKEN_AUTH_SHARED_CACHE = os.environ.get('TOKEN_AUTH_SHARED_CACHE') or None
+TOKEN_AUTH_SHARED_CACHE_TTL = int(
+    os.environ.get('TOKEN_AUTH_SHARED_CACHE_TTL', 300)
+)
+
+# Seconds list and retrieve responses stay in the per-user response cache,
+# 0 disables it. A write invalidates the cached responses through the
+# default cache, so it needs a cache shared by all workers: off by default
+# without REDIS_URL, where each worker would keep serving stale lists.
+RECIPE_RESPONSE_CACHE_TTL = int(os.environ.get(
+    'RECIPE_RESPONSE_CACHE_TTL', 300 if os.environ.get('REDIS_URL') else 0
+))
+
+# Resized copies rendered for each uploaded recipe image, by a pool of
+# RECIPE_IMAGE_WORKERS threads per process (0 renders them inline)
+RECIPE_IMAGE_VARIANT_WIDTHS = [160, 320, 640]
+RECIPE_IMAGE_QUALITY = 80
+RECIPE_IMAGE_WORKERS = int(os.environ.get('RECIPE_IMAGE_WORKERS', 2))
+
+# Recipe image uploads are streamed to a temporary file and checked from
+# their header only. Keep the size limit in line with nginx's
+# client_max_body_size (CLIENT_MAX_BODY_SIZE in the proxy image).
+RECIPE_IMAGE_MAX_UPLOAD_SIZE = int(
+    os.environ.get('RECIPE_IMAGE_MAX_UPLOAD_SIZE', 10 * 1024 * 1024)
+)
+RECIPE_IMAGE_MAX_PIXELS = int(
+    os.environ.get('RECIPE_IMAGE_MAX_PIXELS', 40_000_000)
+)
+RECIPE_IMAGE_FORMATS = ['JPEG', 'PNG', 'GIF', 'WEBP']
+# Image uploads allowed per user, e.g. "60/hour"; empty disables the quota.
+# The counts are kept in the cache: without REDIS_URL each worker counts
+# its own, and a user gets the quota once per worker.
+RECIPE_IMAGE_UPLOAD_RATE = os.environ.get(
+    'RECIPE_IMAGE_UPLOAD_RATE', '60/hour'
+) or None
+
+# Text search configuration of the recipe search vectors. Changing it
+# needs the vectors rebuilt with recipe.search.update_search_vectors.
+RECIPE_SEARCH_CONFIG = os.environ.get('RECIPE_SEARCH_CONFIG', 'english')
+
+# Tag and ingredient autocomplete (the ``q`` parameter): matches returned,
+# shortest input matched by trigrams rather than by prefix, and the
+# in-process cache of recent results. Cached results are keyed by the
+# catalog version in the default cache, so like the response cache they
+# are kept only when REDIS_URL shares it between workers.
+RECIPE_AUTOCOMPLETE_LIMIT = 10
+RECIPE_AUTOCOMPLETE_TRIGRAM_MIN_LENGTH = 3
+RECIPE_AUTOCOMPLETE_CACHE_SIZE = int(
+    os.environ.get('RECIPE_AUTOCOMPLETE_CACHE_SIZE', 10000)
+)
+RECIPE_AUTOCOMPLETE_CACHE_TTL = int(os.environ.get(
+    'RECIPE_AUTOCOMPLETE_CACHE_TTL', 60 if os.environ.get('REDIS_URL') else 0
+))
+
+# Serve the recipe, tag and ingredient endpoints with their async views.
+# Set by app.asgi; under WSGI the sync views are faster.
+RECIPE_ASYNC_VIEWS = bool(int(os.environ.get('RECIPE_ASYNC_VIEWS', 0)))
+
+# Per-request performance metrics (core.performance): share of requests
+# measured, whether their timings are sent in a Server-Timing header, and
+# the level of the core.performance logger, INFO to log every measured
+# request
+PERFORMANCE_SAMPLE_RATE = float(
+    os.environ.get('PERFORMANCE_SAMPLE_RATE', 1.0)
+)
+PERFORMANCE_SERVER_TIMING = bool(
+    int(os.environ.get('PERFORMANCE_SERVER_TIMING', 1))
+)
+
+# Slow query and N+1 detection (core.queries): 'raise' fails requests
+# running one query QUERY_REPEAT_THRESHOLD times or a query slower than
+# QUERY_SLOW_MS, 'log' logs them for a QUERY_INSPECTION_SAMPLE_RATE share
+# of requests and 'off' disables it
+QUERY_INSPECTION = os.environ.get('QUERY_INSPECTION', 'log')
+QUERY_INSPECTION_SAMPLE_RATE = float(
+    os.environ.get('QUERY_INSPECTION_SAMPLE_RATE', 0.01)
+)
+QUERY_REPEAT_THRESHOLD = int(os.environ.get('QUERY_REPEAT_THRESHOLD', 3))
+QUERY_SLOW_MS = float(os.environ.get('QUERY_SLOW_MS', 100))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'core.performance': {
+            'handlers': ['console'],
+            'level': os.environ.get('PERFORMANCE_LOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
+        'core.queries': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
 }
+
+# Prometheus metrics (core.metrics) at /metrics, served to scrapers sending
+# METRICS_TOKEN as a bearer token and disabled without one. Set
+# PROMETHEUS_MULTIPROC_DIR to aggregate the workers' metrics.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+METRICS_MAX_ROUTES = int(os.environ.get('METRICS_MAX_ROUTES', 200))
+
+# Rows validated, inserted or exported per batch by the bulk endpoints
+RECIPE_BULK_CHUNK_SIZE = int(os.environ.get('RECIPE_BULK_CHUNK_SIZE', 500))
+
+# Most used tags and ingredients listed by the recipe stats endpoint
+RECIPE_STATS_LIMIT = int(os.environ.get('RECIPE_STATS_LIMIT', 50))
+
 SPECTACULAR_SETTINGS = {
     'TITLE': 'Recipe API APP',
     'DESCRIPTION': 'Django Rest, Docker & Docker compose',
@@ -1,6 +1,18 @@
 from django.apps import AppConfig
+from django.core.signals import request_finished, request_started
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from core import db, metrics, performance, queries
+
+        request_started.connect(db.check_connections)
+        request_finished.connect(db.mark_connections_used)
+        request_finished.connect(metrics.update_open_connections)
+        connection_created.connect(performance.install_query_timer)
+        connection_created.connect(queries.install_query_inspector)
+        connection_created.connect(metrics.connection_opened)
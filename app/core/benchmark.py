@@ -0,0 +1,78 @@
+"""
+Timing helpers shared by the benchmark management commands
+"""
+import statistics
+import time
+
+
+def time_calls(func, repeat, warmup=1):
+    """Call ``func`` ``repeat`` times, returning each duration in ms"""
+    for _ in range(warmup):
+        func()
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    return timings
+
+
+def percentile(ordered, percent):
+    """Return the nearest-rank percentile of sorted values"""
+    index = round(percent / 100 * (len(ordered) - 1))
+    return ordered[min(len(ordered) - 1, index)]
+
+
+def summarize(timings):
+    """Return summary statistics of a list of durations in ms"""
+    ordered = sorted(timings)
+    return {
+        'count': len(ordered),
+        'mean': statistics.fmean(ordered),
+        'min': ordered[0],
+        'p50': percentile(ordered, 50),
+        'p95': percentile(ordered, 95),
+        'p99': percentile(ordered, 99),
+        'max': ordered[-1],
+    }
+
+
+def format_summary(name, summary):
+    """Return a one line report of a summary"""
+    return (
+        f'{name}: n={summary["count"]} '
+        f'mean={summary["mean"]:.2f}ms p50={summary["p50"]:.2f}ms '
+        f'p95={summary["p95"]:.2f}ms p99={summary["p99"]:.2f}ms '
+        f'max={summary["max"]:.2f}ms'
+    )
+
+
+def compare_results(baseline, results, threshold):
+    """Compare benchmark results against a baseline run
+
+    Both map a scenario name to its summary, with the mean ``queries`` per
+    request. Returns a report line per scenario in both runs and the names
+    of the scenarios whose p95 grew by more than ``threshold`` percent or
+    which now run more queries.
+    """
+    lines, regressions = [], []
+    for name, summary in results.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]
+        change = (summary['p95'] / before['p95'] - 1) * 100
+        queries_added = summary['queries'] - before['queries']
+
+        regressed = change > threshold or queries_added > 0.005
+        if regressed:
+            regressions.append(name)
+        lines.append(
+            f'{name}: p50 {before["p50"]:.2f} -> {summary["p50"]:.2f}ms '
+            f'p95 {before["p95"]:.2f} -> {summary["p95"]:.2f}ms '
+            f'({change:+.1f}%) queries {before["queries"]:.1f} -> '
+            f'{summary["queries"]:.1f}'
+            + (' REGRESSED' if regressed else '')
+        )
+    return lines, regressions
@@ -0,0 +1,58 @@
+"""
+In-process caching helpers
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from core.metrics import record_cache
+
+
+class TTLCache:
+    """A thread-safe LRU mapping whose entries expire after ``ttl`` seconds
+
+    Holds at most ``max_size`` entries, evicting the least recently used
+    one when full. A ``max_size`` or ``ttl`` of 0 disables the cache.
+    Lookups of a cache with a ``name`` are counted in the cache hit and
+    miss metrics.
+    """
+
+    def __init__(self, max_size, ttl, name=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.name = name
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                del self._data[key]
+                entry = None
+            if entry is not None:
+                self._data.move_to_end(key)
+
+        if self.name:
+            record_cache(self.name, entry is not None)
+        return default if entry is None else entry[1]
+
+    def set(self, key, value):
+        if self.max_size <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
@@ -0,0 +1,98 @@
+"""
+Persistent database connections and the thread pool used by async views
+
+With ``CONN_MAX_AGE`` set, a worker keeps its connection between requests.
+A connection that died while idle (database restart, pgbouncer or firewall
+timeout) would only be noticed when the next request's first query fails,
+so a connection idle for longer than ``DB_HEALTH_CHECK_IDLE`` seconds is
+pinged when a request starts and replaced if it no longer answers.
+
+Async views run their ORM code on a fixed pool of ``ASYNC_DB_THREADS``
+threads, each keeping its own persistent connection, which bounds the
+connections an ASGI process opens however many requests it holds.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connections
+
+from core import metrics
+
+
+def _persistent(connection):
+    return connection.settings_dict['CONN_MAX_AGE'] != 0
+
+
+def check_connections(**kwargs):
+    """Close persistent connections that went bad while idle"""
+    now = time.monotonic()
+    for connection in connections.all():
+        if connection.connection is None or not _persistent(connection):
+            continue
+        if connection.in_atomic_block:
+            continue
+
+        last_used = getattr(connection, 'last_request_at', None)
+        idle = settings.DB_HEALTH_CHECK_IDLE
+        if last_used is not None and now - last_used < idle:
+            continue
+
+        if not connection.is_usable():
+            connection.close()
+
+
+def mark_connections_used(**kwargs):
+    """Record when each persistent connection last served a request"""
+    now = time.monotonic()
+    for connection in connections.all():
+        if connection.connection is not None:
+            connection.last_request_at = now
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    """Return the database thread pool, created lazily in each process"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.ASYNC_DB_THREADS,
+                thread_name_prefix='async-db',
+            )
+    return _executor
+
+
+def _call_as_request(func, *args, **kwargs):
+    # The request signals fire on another thread, so the pool thread's
+    # own connection is checked and expired around each call instead
+    check_connections()
+    close_old_connections()
+    metrics.async_db_threads_busy.inc()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        metrics.async_db_threads_busy.dec()
+        close_old_connections()
+        mark_connections_used()
+
+
+async def run_in_db_thread(func, *args, **kwargs):
+    """Run blocking database code from async code
+
+    With ``ASYNC_DB_THREADS`` set to 0 it runs on the request's own thread
+    instead, like Django runs sync views under ASGI.
+    """
+    if not settings.ASYNC_DB_THREADS:
+        return await sync_to_async(func)(*args, **kwargs)
+
+    return await sync_to_async(
+        _call_as_request,
+        thread_sensitive=False,
+        executor=_get_executor()
+    )(func, *args, **kwargs)
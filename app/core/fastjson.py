@@ -0,0 +1,95 @@
+"""
+Fast JSON rendering and parsing
+
+``FastJSONRenderer`` and ``FastJSONParser`` replace DRF's ``JSONRenderer``
+and ``JSONParser`` in ``REST_FRAMEWORK``. With orjson installed they
+encode serializer data, ``ReturnList`` and ``OrderedDict`` included,
+straight to UTF-8 bytes and decode request bodies from them in C. Values
+DRF formats its own way (``Decimal``, datetimes, lazy strings, ...) are
+passed to DRF's ``JSONEncoder``, so responses are byte for byte the same,
+except that NaN and infinite floats become ``null`` instead of failing.
+
+Without orjson, and for indented output or non default JSON settings,
+they fall back to the stdlib ``json`` module as DRF does.
+"""
+import json
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+_default = encoders.JSONEncoder().default
+
+if orjson is not None:
+    # Datetimes are left to DRF, which trims them to milliseconds
+    ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+
+def dumps(data):
+    """Return ``data`` as compact UTF-8 JSON bytes, as DRF renders it"""
+    if orjson is not None:
+        content = orjson.dumps(data, default=_default, option=ORJSON_OPTIONS)
+    else:
+        content = json.dumps(
+            data,
+            cls=encoders.JSONEncoder,
+            ensure_ascii=False,
+            allow_nan=False,
+            separators=(',', ':')
+        ).encode()
+    # Keep the output a strict subset of JavaScript, like DRF
+    return content.replace(
+        '\u2028'.encode(), b'\\u2028'
+    ).replace(
+        '\u2029'.encode(), b'\\u2029'
+    )
+
+
+def loads(content):
+    """Decode JSON from UTF-8 bytes or a string"""
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSON renderer using orjson when it is installed"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            data is None
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {})
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        return dumps(data)
+
+
+class FastJSONParser(JSONParser):
+    """JSON parser using orjson on UTF-8 bodies when it is installed"""
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if (
+            orjson is None
+            or not self.strict
+            or encoding.lower().replace('-', '') != 'utf8'
+        ):
+            return super().parse(stream, media_type, parser_context)
+
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
@@ -0,0 +1,62 @@
+"""
+    Django command to benchmark per-request database connection handling
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import request_finished, request_started
+from django.db import connections
+
+from core.benchmark import format_summary, summarize, time_calls
+
+
+class Command(BaseCommand):
+    help = (
+        'Time simulated requests opening a new database connection each '
+        'and reusing a persistent one'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=500,
+            help='Requests to time for each mode',
+        )
+        parser.add_argument(
+            '--database',
+            default='default',
+            help='Database alias to benchmark',
+        )
+
+    def request_cycle(self, connection):
+        """Run one query between the signals Django sends for a request"""
+        request_started.send(sender=self.__class__)
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+                cursor.fetchone()
+        finally:
+            request_finished.send(sender=self.__class__)
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.in_atomic_block:
+            raise CommandError('Cannot benchmark inside a transaction')
+
+        settings_dict = connection.settings_dict
+        original_max_age = settings_dict['CONN_MAX_AGE']
+        modes = [
+            ('new connection per request', 0),
+            ('persistent connection', original_max_age or 600),
+        ]
+        try:
+            for name, max_age in modes:
+                connection.close()
+                settings_dict['CONN_MAX_AGE'] = max_age
+                timings = time_calls(
+                    lambda: self.request_cycle(connection),
+                    options['requests']
+                )
+                self.stdout.write(format_summary(name, summarize(timings)))
+        finally:
+            connection.close()
+            settings_dict['CONN_MAX_AGE'] = original_max_age
@@ -0,0 +1,114 @@
+"""
+    Django command to load test running API servers over HTTP
+"""
+import threading
+import time
+from http.client import HTTPConnection, HTTPSConnection
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.benchmark import format_summary, summarize
+
+
+def run_load(url, headers, concurrency, requests, timeout):
+    """Send ``requests`` GETs to ``url`` from ``concurrency`` clients
+
+    Each client reuses one keep-alive connection. Returns the latency of
+    each successful request in ms, the number of failures and the elapsed
+    wall clock time in seconds.
+    """
+    parts = urlsplit(url)
+    connection_class = (
+        HTTPSConnection if parts.scheme == 'https' else HTTPConnection
+    )
+    path = parts.path + (f'?{parts.query}' if parts.query else '')
+    remaining = iter(range(requests))
+    lock = threading.Lock()
+    timings, failures = [], [0]
+
+    def client():
+        connection = connection_class(parts.netloc, timeout=timeout)
+        while True:
+            with lock:
+                if next(remaining, None) is None:
+                    break
+            start = time.perf_counter()
+            try:
+                connection.request('GET', path, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                ok = response.status < 400
+            except OSError:
+                connection.close()
+                ok = False
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                if ok:
+                    timings.append(elapsed)
+                else:
+                    failures[0] += 1
+        connection.close()
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return timings, failures[0], time.perf_counter() - start
+
+
+class Command(BaseCommand):
+    help = (
+        'Load test API URLs, e.g. the same endpoint served over WSGI and '
+        'ASGI, and report requests per second and latency'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='+', help='URLs to GET')
+        parser.add_argument(
+            '--token',
+            help='API token sent in the Authorization header',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=50,
+            help='Concurrent clients',
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=2000,
+            help='Requests sent to each URL',
+        )
+        parser.add_argument(
+            '--timeout',
+            type=float,
+            default=30,
+            help='Seconds before a request fails',
+        )
+
+    def handle(self, *args, **options):
+        headers = {}
+        if options['token']:
+            headers['Authorization'] = f'Token {options["token"]}'
+
+        for url in options['urls']:
+            timings, failures, elapsed = run_load(
+                url,
+                headers,
+                options['concurrency'],
+                options['requests'],
+                options['timeout'],
+            )
+            if not timings:
+                raise CommandError(f'Every request to {url} failed')
+
+            self.stdout.write(format_summary(
+                f'{url} {len(timings) / elapsed:.1f} req/s '
+                f'failed={failures}',
+                summarize(timings)
+            ))
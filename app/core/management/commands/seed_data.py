@@ -0,0 +1,382 @@
+"""
+    Django command to seed the database with synthetic data in bulk
+"""
+import csv
+import io
+import itertools
+import multiprocessing
+import os
+import random
+import time
+from argparse import ArgumentTypeError
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+
+from core.models import (
+    Ingredient,
+    IngredientSummary,
+    Recipe,
+    RecipeSummary,
+    Tag,
+    TagSummary,
+)
+from recipe import summary
+from recipe.search import update_search_vectors
+from recipe.seeding import STYLES, WORDS, names
+
+
+def count_range(value):
+    """Parse ``N`` or ``MIN-MAX`` into a (min, max) pair"""
+    low, _, high = value.partition('-')
+    try:
+        low, high = int(low), int(high or low)
+    except ValueError:
+        low = high = -1
+    if low < 0 or high < low:
+        raise ArgumentTypeError(f'{value!r} is not N or MIN-MAX')
+    return low, high
+
+
+def reserve_ids(model, count):
+    """Advance the primary key sequence of a model by ``count`` IDs
+
+    Returns the first of the reserved, consecutive IDs. Rows inserted
+    elsewhere at the same time may take IDs from the middle of the range,
+    so seed while nothing else writes to the table.
+    """
+    if not count:
+        return None
+
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT setval(seq, nextval(seq) + %s - 1) '
+            'FROM pg_get_serial_sequence(%s, %s) AS seq',
+            [count, table, model._meta.pk.column]
+        )
+        return cursor.fetchone()[0] - count + 1
+
+
+def copy_rows(cursor, table, columns, rows):
+    """Load rows into a table with COPY, returning how many were loaded"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, quoting=csv.QUOTE_ALL)
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+    buffer.seek(0)
+
+    cursor.copy_expert(
+        f'COPY {table} ({", ".join(columns)}) FROM STDIN WITH (FORMAT csv)',
+        buffer
+    )
+    return count
+
+
+def user_picker(plan, rng):
+    """Return a function choosing the index of each recipe's user"""
+    users = plan['users']
+    if plan['distribution'] == 'uniform':
+        return lambda: rng.randrange(users)
+
+    # Zipf: the user at rank r owns a share of recipes proportional to
+    # 1 / r ** exponent, so a few users own most of them
+    weights = itertools.accumulate(
+        1 / rank ** plan['exponent'] for rank in range(1, users + 1)
+    )
+    cum_weights = list(weights)
+    population = range(users)
+    return lambda: rng.choices(population, cum_weights=cum_weights)[0]
+
+
+def seed_attributes(cursor, plan, start, stop):
+    """Insert the tags and ingredients of users ``start`` to ``stop``"""
+    tag_names = names(STYLES, plan['tags'])
+    ingredient_names = names(WORDS, plan['ingredients'])
+
+    rows = copy_rows(cursor, Tag._meta.db_table, ['id', 'user_id', 'name'], (
+        [
+            plan['first_tag'] + user * plan['tags'] + i,
+            plan['first_user'] + user,
+            name,
+        ]
+        for user in range(start, stop)
+        for i, name in enumerate(tag_names)
+    ))
+    rows += copy_rows(cursor, Ingredient._meta.db_table, [
+        'id', 'user_id', 'name', 'quantity',
+    ], (
+        [
+            plan['first_ingredient'] + user * plan['ingredients'] + i,
+            plan['first_user'] + user,
+            name,
+            '',
+        ]
+        for user in range(start, stop)
+        for i, name in enumerate(ingredient_names)
+    ))
+    return rows
+
+
+def seed_recipes(cursor, plan, start, stop):
+    """Insert recipes ``start`` to ``stop`` with their tags and ingredients"""
+    rng = random.Random(f'{plan["seed"]}-recipes-{start}')
+    pick_user = user_picker(plan, rng)
+    owners = [pick_user() for _ in range(start, stop)]
+    first_id = plan['first_recipe'] + start
+
+    rows = copy_rows(cursor, Recipe._meta.db_table, [
+        'id', 'user_id', 'title', 'description', 'time_minutes', 'price',
+        'link', 'image_variants',
+    ], (
+        [
+            first_id + i,
+            plan['first_user'] + user,
+            ' '.join(rng.sample(WORDS, 2) + rng.sample(STYLES, 1)).title(),
+            ' '.join(rng.choices(WORDS, k=12)),
+            rng.randint(5, 240),
+            f'{rng.randint(100, 9999) / 100:.2f}',
+            '',
+            '{}',
+        ]
+        for i, user in enumerate(owners)
+    ))
+
+    for field, per_user, per_recipe, first_related in (
+        ('tags', plan['tags'], plan['tags_per_recipe'], plan['first_tag']),
+        (
+            'ingredients',
+            plan['ingredients'],
+            plan['ingredients_per_recipe'],
+            plan['first_ingredient'],
+        ),
+    ):
+        m2m = Recipe._meta.get_field(field)
+        low, high = per_recipe
+        rows += copy_rows(cursor, m2m.remote_field.through._meta.db_table, [
+            m2m.m2m_column_name(), m2m.m2m_reverse_name(),
+        ], (
+            [first_id + i, first_related + user * per_user + related]
+            for i, user in enumerate(owners)
+            for related in rng.sample(
+                range(per_user),
+                min(rng.randint(low, high), per_user)
+            )
+        ))
+
+    if plan['search_vectors']:
+        # The statistics of the tables being loaded are stale, and planned
+        # from them the lookups of each recipe's names scan whole tables
+        cursor.execute('SET LOCAL enable_seqscan = off')
+        update_search_vectors(Recipe.objects.filter(
+            pk__range=(first_id, first_id + len(owners) - 1)
+        ))
+    return rows
+
+
+def run_job(job):
+    """Run one chunk of seeding in its own transaction"""
+    kind, plan, start, stop = job
+    seed = seed_attributes if kind == 'attributes' else seed_recipes
+    with transaction.atomic(), connection.cursor() as cursor:
+        return stop - start, seed(cursor, plan, start, stop)
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed users, tags, ingredients, recipes and the links between them '
+        'with COPY, split across worker processes'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=1000,
+            help='Users to create',
+        )
+        parser.add_argument(
+            '--recipes',
+            type=int,
+            default=100000,
+            help='Recipes to create across all users',
+        )
+        parser.add_argument(
+            '--tags',
+            type=int,
+            default=len(STYLES),
+            help='Tags to create for each user',
+        )
+        parser.add_argument(
+            '--ingredients',
+            type=int,
+            default=50,
+            help='Ingredients to create for each user',
+        )
+        parser.add_argument(
+            '--tags-per-recipe',
+            type=count_range,
+            default=(1, 3),
+            help='Tags linked to each recipe, N or MIN-MAX',
+        )
+        parser.add_argument(
+            '--ingredients-per-recipe',
+            type=count_range,
+            default=(3, 8),
+            help='Ingredients linked to each recipe, N or MIN-MAX',
+        )
+        parser.add_argument(
+            '--distribution',
+            choices=['uniform', 'zipf'],
+            default='zipf',
+            help='How recipes are spread over users',
+        )
+        parser.add_argument(
+            '--exponent',
+            type=float,
+            default=1.1,
+            help='Skew of the zipf distribution',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count(),
+            help='Processes loading data in parallel',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=20000,
+            help='Recipes loaded per COPY transaction',
+        )
+        parser.add_argument(
+            '--password',
+            help='Password of every seeded user (default: unusable)',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Seed of the random data',
+        )
+        parser.add_argument(
+            '--skip-search-vectors',
+            action='store_true',
+            help='Leave recipe search vectors empty',
+        )
+
+    def seed_users(self, plan, password):
+        """Insert the users in one COPY and return the first user ID"""
+        plan['first_user'] = reserve_ids(get_user_model(), plan['users'])
+        password_hash = make_password(password)
+        with connection.cursor() as cursor:
+            return copy_rows(cursor, get_user_model()._meta.db_table, [
+                'id', 'password', 'is_superuser', 'email', 'name',
+                'is_active', 'is_staff',
+            ], (
+                [
+                    user_id, password_hash, 'f',
+                    f'seed-{user_id}@example.com', f'Seed user {user_id}',
+                    't', 'f',
+                ]
+                for user_id in range(
+                    plan['first_user'], plan['first_user'] + plan['users']
+                )
+            ))
+
+    def jobs(self, kind, plan, total, chunk_size):
+        return [
+            (kind, plan, start, min(start + chunk_size, total))
+            for start in range(0, total, chunk_size)
+        ]
+
+    def run_jobs(self, jobs, workers, label, total):
+        """Run jobs, in a pool of processes if there are several workers"""
+        if workers == 1:
+            return self.report(map(run_job, jobs), label, total)
+
+        # Forked workers must open their own connections
+        connections.close_all()
+        with multiprocessing.get_context('fork').Pool(workers) as pool:
+            return self.report(
+                pool.imap_unordered(run_job, jobs), label, total
+            )
+
+    def report(self, results, label, total):
+        rows = done = 0
+        for count, chunk_rows in results:
+            rows += chunk_rows
+            done += count
+            self.stdout.write(f'Seeded {label} {done}/{total}')
+        return rows
+
+    def handle(self, *args, **options):
+        if options['users'] < 1:
+            raise CommandError('Seed at least one user')
+        if options['tags'] < 1 or options['ingredients'] < 1:
+            raise CommandError('Seed at least one tag and ingredient per user')
+        workers = max(1, options['workers'])
+        if workers > 1 and connection.in_atomic_block:
+            raise CommandError('Cannot seed in parallel inside a transaction')
+
+        plan = {
+            'users': options['users'],
+            'tags': options['tags'],
+            'ingredients': options['ingredients'],
+            'tags_per_recipe': options['tags_per_recipe'],
+            'ingredients_per_recipe': options['ingredients_per_recipe'],
+            'distribution': options['distribution'],
+            'exponent': options['exponent'],
+            'seed': options['seed'],
+            'search_vectors': not options['skip_search_vectors'],
+        }
+        start = time.perf_counter()
+
+        with transaction.atomic():
+            rows = self.seed_users(plan, options['password'])
+        plan['first_tag'] = reserve_ids(Tag, plan['users'] * plan['tags'])
+        plan['first_ingredient'] = reserve_ids(
+            Ingredient, plan['users'] * plan['ingredients']
+        )
+        plan['first_recipe'] = reserve_ids(Recipe, options['recipes'])
+
+        # Tags and ingredients are committed before any recipe links them
+        users_per_job = max(
+            1, options['chunk_size'] // (plan['tags'] + plan['ingredients'])
+        )
+        for kind, total, chunk_size in (
+            ('attributes', plan['users'], users_per_job),
+            ('recipes', options['recipes'], options['chunk_size']),
+        ):
+            jobs = self.jobs(kind, plan, total, chunk_size)
+            rows += self.run_jobs(jobs, workers, kind, total)
+        # The recipes were copied in without signals
+        summary.rebuild()
+
+        with connection.cursor() as cursor:
+            if plan['search_vectors'] and options['recipes']:
+                cursor.execute(
+                    "SELECT gin_clean_pending_list('recipe_user_search_idx')"
+                )
+            for model in (
+                get_user_model(),
+                Tag,
+                Ingredient,
+                Recipe,
+                Recipe.tags.through,
+                Recipe.ingredients.through,
+                RecipeSummary,
+                TagSummary,
+                IngredientSummary,
+            ):
+                cursor.execute(f'ANALYZE {model._meta.db_table}')
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {rows} rows in {elapsed:.1f}s '
+            f'({rows / elapsed:.0f} rows/s)'
+        ))
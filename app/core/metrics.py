@@ -0,0 +1,189 @@
+"""
+Prometheus metrics of the API, its database connections and caches
+
+Served in the Prometheus text format by ``metrics_view``. Under uwsgi or
+gunicorn each worker is a separate process, so ``PROMETHEUS_MULTIPROC_DIR``
+must name an empty directory, set before the workers start (see
+scripts/run.sh). Every process then writes its values to memory-mapped
+files there and a scrape of any worker adds up all of them.
+
+Label values come from small fixed sets: routes are URL names, not
+paths, and a route label is capped at ``METRICS_MAX_ROUTES`` distinct
+values per process, so the metrics cannot grow without bound.
+"""
+import atexit
+import hmac
+import os
+import threading
+
+from django.conf import settings
+from django.db import connections
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+
+METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+OTHER = 'other'
+
+requests_total = Counter(
+    'recipe_api_requests_total',
+    'Requests served, by route, method and status class',
+    ['route', 'method', 'status'],
+)
+request_duration = Histogram(
+    'recipe_api_request_duration_seconds',
+    'Time to serve a request, by route and method',
+    ['route', 'method'],
+    buckets=(
+        0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+    ),
+)
+request_queries = Histogram(
+    'recipe_api_request_db_queries',
+    'Database queries per request, from requests sampled by '
+    'PERFORMANCE_SAMPLE_RATE',
+    ['route'],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100),
+)
+db_connections_opened = Counter(
+    'recipe_api_db_connections_opened_total',
+    'Database connections opened, by alias',
+    ['alias'],
+)
+db_connections_open = Gauge(
+    'recipe_api_db_connections_open',
+    'Database connections held by the workers serving requests',
+    ['alias'],
+    multiprocess_mode='livesum',
+)
+db_read_routes = Counter(
+    'recipe_api_db_read_routes_total',
+    'Safe-method requests of the replica-routed views, by the database '
+    'they read from and why',
+    ['alias', 'reason'],
+)
+async_db_threads_busy = Gauge(
+    'recipe_api_async_db_threads_busy',
+    'Async view database threads running a request',
+    multiprocess_mode='livesum',
+)
+cache_requests = Counter(
+    'recipe_api_cache_requests_total',
+    'Cache lookups, by cache and hit or miss',
+    ['cache', 'result'],
+)
+image_jobs_pending = Gauge(
+    'recipe_api_image_jobs_pending',
+    'Recipe image variant jobs queued or running',
+    multiprocess_mode='livesum',
+)
+image_jobs = Counter(
+    'recipe_api_image_jobs_total',
+    'Recipe image variant jobs finished, by result',
+    ['result'],
+)
+
+
+class BoundedLabel:
+    """Pass through at most ``limit`` distinct values, then ``other``"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._seen = set()
+        self._lock = threading.Lock()
+
+    def __call__(self, value):
+        if value in self._seen:
+            return value
+        with self._lock:
+            if len(self._seen) < self.limit:
+                self._seen.add(value)
+                return value
+        return OTHER
+
+
+route_label = BoundedLabel(settings.METRICS_MAX_ROUTES)
+
+
+def route_name(request):
+    """Return the URL name a request was routed to"""
+    match = getattr(request, 'resolver_match', None)
+    return route_label(match.view_name if match else 'unresolved')
+
+
+def observe_request(request, response, duration, queries=None):
+    """Record a served request, its duration in seconds and its queries"""
+    route = route_name(request)
+    method = request.method if request.method in METHODS else OTHER
+    requests_total.labels(
+        route, method, f'{response.status_code // 100}xx'
+    ).inc()
+    request_duration.labels(route, method).observe(duration)
+    if queries is not None:
+        request_queries.labels(route).observe(queries)
+
+
+def record_cache(cache, hit):
+    cache_requests.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+def record_read_route(alias, reason):
+    db_read_routes.labels(alias, reason).inc()
+
+
+def connection_opened(connection, **kwargs):
+    db_connections_opened.labels(connection.alias).inc()
+
+
+def update_open_connections(**kwargs):
+    """Record the connections this worker holds as a request finishes"""
+    for connection in connections.all():
+        db_connections_open.labels(connection.alias).set(
+            0 if connection.connection is None else 1
+        )
+
+
+def _registry():
+    if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+        return REGISTRY
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def metrics_view(request):
+    """Serve the metrics of all workers in the Prometheus text format
+
+    Disabled unless ``METRICS_TOKEN`` is set, which scrapers send as a
+    bearer token.
+    """
+    token = settings.METRICS_TOKEN
+    if not token:
+        raise Http404
+    expected = f'Bearer {token}'
+    if not hmac.compare_digest(
+        request.headers.get('Authorization', ''),
+        expected
+    ):
+        return HttpResponseForbidden()
+
+    return HttpResponse(
+        generate_latest(_registry()),
+        content_type=CONTENT_TYPE_LATEST
+    )
+
+
+if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+    # Drop the live gauges of a worker that exits; the pid is read at exit,
+    # so workers forked after this import mark their own files
+    atexit.register(lambda: multiprocess.mark_process_dead(os.getpid()))
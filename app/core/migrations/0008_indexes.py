@@ -0,0 +1,40 @@
+# Generated by Django 4.0.10 on 2026-10-18 02:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_recipe_image'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['user', '-name', 'id'], name='ingredient_user_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['user', '-id'], name='recipe_user_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', '-name', 'id'], name='tag_user_name_idx'),
+        ),
+        # The auto-created through tables index <target>_id on its own and
+        # (recipe_id, <target>_id) as a unique constraint. Filtering recipes
+        # by tag or ingredient starts from the links of the targets and
+        # needs their recipe_id: with it in the index that is an index-only
+        # scan instead of a table visit per link.
+        migrations.RunSQL(
+            sql='CREATE INDEX recipe_tags_tag_recipe_idx '
+                'ON core_recipe_tags (tag_id, recipe_id);',
+            reverse_sql='DROP INDEX recipe_tags_tag_recipe_idx;',
+        ),
+        migrations.RunSQL(
+            sql='CREATE INDEX recipe_ingr_ingr_recipe_idx '
+                'ON core_recipe_ingredients (ingredient_id, recipe_id);',
+            reverse_sql='DROP INDEX recipe_ingr_ingr_recipe_idx;',
+        ),
+    ]
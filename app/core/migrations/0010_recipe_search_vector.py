@@ -0,0 +1,49 @@
+# Generated by Django 4.0.10 on 2026-10-18 02:59
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+
+# Same document as recipe.search.search_document(), frozen in SQL
+BACKFILL_SQL = '''
+UPDATE core_recipe AS r SET search_vector =
+    setweight(to_tsvector(%(config)s::regconfig, r.title), 'A')
+    || setweight(to_tsvector(%(config)s::regconfig, COALESCE((
+        SELECT string_agg(t.name, ' ')
+        FROM core_recipe_tags rt JOIN core_tag t ON t.id = rt.tag_id
+        WHERE rt.recipe_id = r.id
+    ), '')), 'B')
+    || setweight(to_tsvector(%(config)s::regconfig, COALESCE((
+        SELECT string_agg(i.name, ' ')
+        FROM core_recipe_ingredients ri
+        JOIN core_ingredient i ON i.id = ri.ingredient_id
+        WHERE ri.recipe_id = r.id
+    ), '')), 'B')
+    || setweight(to_tsvector(%(config)s::regconfig, r.description), 'C');
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_recipe_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        # Fill the vectors before building the index, which is faster
+        migrations.RunSQL(
+            sql=[(BACKFILL_SQL, {'config': settings.RECIPE_SEARCH_CONFIG})],
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='recipe_search_idx'),
+        ),
+    ]
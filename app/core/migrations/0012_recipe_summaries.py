@@ -0,0 +1,61 @@
+# Generated by Django 4.0.10 on 2026-10-18 04:01
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Same summaries as recipe.summary.rebuild(), frozen in SQL
+BACKFILL_SQL = [
+    '''
+    INSERT INTO core_recipesummary
+        (user_id, recipe_count, total_time_minutes, total_price)
+    SELECT user_id, COUNT(*), SUM(time_minutes), SUM(price)
+    FROM core_recipe GROUP BY user_id;
+    ''',
+    '''
+    INSERT INTO core_tagsummary (tag_id, recipe_count)
+    SELECT tag_id, COUNT(*) FROM core_recipe_tags GROUP BY tag_id;
+    ''',
+    '''
+    INSERT INTO core_ingredientsummary (ingredient_id, recipe_count)
+    SELECT ingredient_id, COUNT(*) FROM core_recipe_ingredients
+    GROUP BY ingredient_id;
+    ''',
+]
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_name_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngredientSummary',
+            fields=[
+                ('ingredient', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='summary', serialize=False, to='core.ingredient')),
+                ('recipe_count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RecipeSummary',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='recipe_summary', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('recipe_count', models.IntegerField(default=0)),
+                ('total_time_minutes', models.BigIntegerField(default=0)),
+                ('total_price', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TagSummary',
+            fields=[
+                ('tag', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='summary', serialize=False, to='core.tag')),
+                ('recipe_count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunSQL(
+            sql=BACKFILL_SQL,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
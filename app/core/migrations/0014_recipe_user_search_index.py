@@ -0,0 +1,23 @@
+# Generated by Django 4.0.10 on 2026-10-18 04:56
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_recipe_range_indexes'),
+    ]
+
+    operations = [
+        # Built before the old index goes, so searches always have one
+        migrations.AddIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['user', 'search_vector'], name='recipe_user_search_idx', opclasses=['int8_ops', 'tsvector_ops']),
+        ),
+        migrations.RemoveIndex(
+            model_name='recipe',
+            name='recipe_search_idx',
+        ),
+    ]
@@ -8,6 +8,8 @@ from django.contrib.auth.models import (
     BaseUserManager,
     PermissionsMixin
 )
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 
 
 def recipe_image_file_path(instance, filename):
@@ -70,6 +72,29 @@ class Recipe(models.Model):
     tags = models.ManyToManyField('Tag')
     ingredients = models.ManyToManyField('Ingredient')
     image = models.ImageField(upload_to=recipe_image_file_path, null=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-id'], name='recipe_user_id_idx'),
+            # Range filters and orderings, with ties in id order
+            models.Index(
+                fields=['user', 'time_minutes', 'id'],
+                name='recipe_user_time_idx'
+            ),
+            models.Index(
+                fields=['user', 'price', 'id'],
+                name='recipe_user_price_idx'
+            ),
+            # Full-text search within a user's recipes, rather than
+            # across everyone's matches filtered by user afterwards
+            GinIndex(
+                fields=['user', 'search_vector'],
+                opclasses=['int8_ops', 'tsvector_ops'],
+                name='recipe_user_search_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.title
@@ -83,6 +108,20 @@ class Tag(models.Model):
         on_delete=models.CASCADE
     )
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', '-name', 'id'],
+                name='tag_user_name_idx'
+            ),
+            # Autocomplete: trigram matches on name within a user's rows
+            GinIndex(
+                fields=['user', 'name'],
+                opclasses=['int8_ops', 'gin_trgm_ops'],
+                name='tag_user_name_trgm_idx'
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -96,5 +135,58 @@ class Ingredient(models.Model):
     name = models.CharField(max_length=200)
     quantity = models.CharField(max_length=200, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', '-name', 'id'],
+                name='ingredient_user_name_idx'
+            ),
+            # Autocomplete: trigram matches on name within a user's rows
+            GinIndex(
+                fields=['user', 'name'],
+                opclasses=['int8_ops', 'gin_trgm_ops'],
+                name='ingredient_user_name_trgm_idx'
+            ),
+        ]
+
     def __str__(self) -> str:
         return self.name
+
+
+class RecipeSummary(models.Model):
+    """Running totals of a user's recipes, see recipe.summary"""
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='recipe_summary'
+    )
+    recipe_count = models.IntegerField(default=0)
+    total_time_minutes = models.BigIntegerField(default=0)
+    total_price = models.DecimalField(
+        max_digits=15,
+        decimal_places=2,
+        default=0
+    )
+
+
+class TagSummary(models.Model):
+    """Number of recipes linked to a tag, see recipe.summary"""
+    tag = models.OneToOneField(
+        Tag,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='summary'
+    )
+    recipe_count = models.IntegerField(default=0)
+
+
+class IngredientSummary(models.Model):
+    """Number of recipes linked to an ingredient, see recipe.summary"""
+    ingredient = models.OneToOneField(
+        Ingredient,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='summary'
+    )
+    recipe_count = models.IntegerField(default=0)
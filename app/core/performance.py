@@ -0,0 +1,243 @@
+"""
+Per-request performance metrics
+
+``PerformanceMiddleware`` records, for a sampled share of requests, the
+number and duration of database queries, the time spent building
+serializer data, the total time and the response size. They are sent back
+in a ``Server-Timing`` header, logged by the ``core.performance`` logger
+and added to in-memory histograms of each endpoint. Every request, sampled
+or not, is counted and timed in the Prometheus metrics of core.metrics.
+
+Requests left out of the sample only pay for that and the sampling
+decision: the query timer installed on every database connection does
+nothing unless the current request is being measured.
+"""
+import asyncio
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from rest_framework import serializers
+
+from core.metrics import observe_request
+
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the request duration histogram buckets, in ms
+BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, float('inf'))
+
+_current = ContextVar('performance_metrics', default=None)
+
+
+class RequestMetrics:
+    """What one request spent its time on"""
+    __slots__ = ('queries', 'db_time', 'serialize_time')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+
+
+def time_query(execute, sql, params, many, context):
+    """Database execute wrapper counting and timing the measured queries"""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_time += time.perf_counter() - start
+        metrics.queries += 1
+
+
+def install_query_timer(connection, **kwargs):
+    """Time the queries of every connection, on every thread"""
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+@contextmanager
+def timed_serialization():
+    """Add the time spent in the block to the request's serialize time"""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serialize_time += time.perf_counter() - start
+
+
+class TimedListSerializer(serializers.ListSerializer):
+    """List serializer recording the time it takes to build its data"""
+
+    @property
+    def data(self):
+        with timed_serialization():
+            return super().data
+
+
+class TimedSerializerMixin:
+    """Record the time a serializer takes to build its data
+
+    Set ``list_serializer_class = TimedListSerializer`` in ``Meta`` to
+    also time it with ``many=True``.
+    """
+
+    @property
+    def data(self):
+        with timed_serialization():
+            return super().data
+
+
+class EndpointHistograms:
+    """Thread-safe request duration histograms of each endpoint"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def observe(self, endpoint, duration, metrics, size):
+        with self._lock:
+            stats = self._endpoints.get(endpoint)
+            if stats is None:
+                stats = self._endpoints[endpoint] = {
+                    'count': 0,
+                    'sum': 0.0,
+                    'queries': 0,
+                    'db_time': 0.0,
+                    'size': 0,
+                    'buckets': [0] * len(BUCKETS),
+                }
+            stats['count'] += 1
+            stats['sum'] += duration
+            stats['queries'] += metrics.queries
+            stats['db_time'] += metrics.db_time * 1000
+            stats['size'] += size
+            for i, bound in enumerate(BUCKETS):
+                if duration <= bound:
+                    stats['buckets'][i] += 1
+                    break
+
+    def snapshot(self):
+        """Return a copy of the statistics of each endpoint"""
+        with self._lock:
+            return {
+                endpoint: {**stats, 'buckets': list(stats['buckets'])}
+                for endpoint, stats in self._endpoints.items()
+            }
+
+    def clear(self):
+        with self._lock:
+            self._endpoints.clear()
+
+
+histograms = EndpointHistograms()
+
+
+def endpoint_name(request):
+    """Return the method and URL name a request was routed to"""
+    match = getattr(request, 'resolver_match', None)
+    view_name = match.view_name if match else 'unresolved'
+    return f'{request.method} {view_name}'
+
+
+def response_size(response):
+    if response.streaming:
+        return 0
+    return len(response.content)
+
+
+class PerformanceMiddleware:
+    """Measure a sample of requests, see the module docstring"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Mark the instance as a coroutine function, as Django's
+            # MiddlewareMixin does, so it is called in async mode
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def _sampled(self):
+        rate = settings.PERFORMANCE_SAMPLE_RATE
+        return rate >= 1 or (rate > 0 and random.random() < rate)
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+
+        metrics = RequestMetrics() if self._sampled() else None
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, response, metrics, start)
+        return response
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics() if self._sampled() else None
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, response, metrics, start)
+        return response
+
+    def finish(self, request, response, metrics, start):
+        """Report the metrics of a request"""
+        duration = (time.perf_counter() - start) * 1000
+        queries = None if metrics is None else metrics.queries
+        observe_request(request, response, duration / 1000, queries)
+        if metrics is None:
+            return
+
+        db_time = metrics.db_time * 1000
+        serialize_time = metrics.serialize_time * 1000
+        endpoint = endpoint_name(request)
+        size = response_size(response)
+
+        if settings.PERFORMANCE_SERVER_TIMING:
+            response['Server-Timing'] = (
+                f'db;dur={db_time:.2f};desc="{metrics.queries} queries", '
+                f'serialize;dur={serialize_time:.2f}, '
+                f'total;dur={duration:.2f}'
+            )
+        histograms.observe(endpoint, duration, metrics, size)
+        logger.info(
+            'endpoint="%s" status=%d duration_ms=%.2f queries=%d '
+            'db_ms=%.2f serialize_ms=%.2f size=%d',
+            endpoint,
+            response.status_code,
+            duration,
+            metrics.queries,
+            db_time,
+            serialize_time,
+            size,
+            extra={
+                'endpoint': endpoint,
+                'path': request.path,
+                'status': response.status_code,
+                'duration_ms': duration,
+                'queries': metrics.queries,
+                'db_ms': db_time,
+                'serialize_ms': serialize_time,
+                'size': size,
+            }
+        )
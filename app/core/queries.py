@@ -0,0 +1,211 @@
+"""
+Slow query and N+1 detection
+
+``QueryInspectionMiddleware`` fingerprints the SQL each inspected request
+runs: literals and placeholders become ``?`` and lists of them ``...``,
+so one query run with other values keeps its fingerprint. A fingerprint
+seen ``QUERY_REPEAT_THRESHOLD`` times in one request is usually a query
+per row (N+1), and a query taking over ``QUERY_SLOW_MS`` is slow.
+
+``QUERY_INSPECTION`` picks what happens to requests running them:
+``raise`` fails the request with a ``QueryProblemError`` carrying a
+report, for the test suite; ``log`` inspects a
+``QUERY_INSPECTION_SAMPLE_RATE`` share of requests and logs the report
+to the ``core.queries`` logger; ``off`` inspects nothing.
+"""
+import asyncio
+import logging
+import os
+import random
+import re
+import sys
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar('query_log', default=None)
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_PLACEHOLDER_RE = re.compile(r'%s|%\(\w+\)s')
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_LIST_RE = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_ROWS_RE = re.compile(r'\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+')
+_SPACE_RE = re.compile(r'\s+')
+
+# Transaction bookkeeping repeats by design
+IGNORED = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')
+
+# The execute wrappers are not where a query comes from
+_WRAPPER_FILES = {
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), name)
+    for name in ('queries.py', 'performance.py')
+}
+
+
+class QueryProblemError(AssertionError):
+    """A request ran repeated or slow queries"""
+
+
+def fingerprint(sql):
+    """Return the SQL with its values and lists of values blanked out"""
+    sql = _STRING_RE.sub('?', sql)
+    sql = _PLACEHOLDER_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = _LIST_RE.sub('(...)', sql)
+    sql = _ROWS_RE.sub('(...)', sql)
+    return _SPACE_RE.sub(' ', sql).strip()
+
+
+def _caller():
+    """Return where in the project's own code the current query was run"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if (
+            filename.startswith(str(settings.BASE_DIR))
+            and filename not in _WRAPPER_FILES
+            and 'site-packages' not in filename
+        ):
+            path = os.path.relpath(filename, settings.BASE_DIR)
+            return f'{path}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return 'unknown'
+
+
+class QueryLog:
+    """The queries run while inspecting, by fingerprint"""
+
+    def __init__(self, repeat_threshold, slow_ms):
+        self.repeat_threshold = repeat_threshold
+        self.slow_ms = slow_ms
+        self.total = 0
+        self.counts = {}
+        self.callers = {}
+        self.slow = []
+
+    def record(self, sql, duration):
+        self.total += 1
+        key = fingerprint(sql)
+        if key.upper().startswith(IGNORED):
+            return
+
+        count = self.counts.get(key, 0)
+        self.counts[key] = count + 1
+        if not count:
+            self.callers[key] = _caller()
+        duration *= 1000
+        if duration > self.slow_ms:
+            self.slow.append((duration, key, _caller()))
+
+    def repeated(self):
+        """Return (count, fingerprint) of the queries run too often"""
+        return sorted(
+            (
+                (count, key) for key, count in self.counts.items()
+                if count >= self.repeat_threshold
+            ),
+            reverse=True
+        )
+
+    def report(self, title):
+        """Describe the repeated and slow queries, None if there are none"""
+        repeated = self.repeated()
+        if not repeated and not self.slow:
+            return None
+
+        lines = [f'{title} ran {self.total} queries:']
+        for count, key in repeated:
+            lines.append(f'  repeated {count}x: {key}')
+            lines.append(f'    first run at {self.callers[key]}')
+        for duration, key, caller in self.slow:
+            lines.append(f'  slow {duration:.1f}ms: {key}')
+            lines.append(f'    run at {caller}')
+        return '\n'.join(lines)
+
+
+def inspect_query(execute, sql, params, many, context):
+    """Database execute wrapper recording the inspected queries"""
+    log = _current.get()
+    if log is None:
+        return execute(sql, params, many, context)
+
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        log.record(sql, time.perf_counter() - start)
+
+
+def install_query_inspector(connection, **kwargs):
+    """Inspect the queries of every connection, on every thread"""
+    if inspect_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(inspect_query)
+
+
+@contextmanager
+def inspect_queries():
+    """Record the queries run in the block in the QueryLog it yields"""
+    log = QueryLog(settings.QUERY_REPEAT_THRESHOLD, settings.QUERY_SLOW_MS)
+    token = _current.set(log)
+    try:
+        yield log
+    finally:
+        _current.reset(token)
+
+
+class QueryInspectionMiddleware:
+    """Report requests running repeated or slow queries"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def _inspected(self):
+        mode = settings.QUERY_INSPECTION
+        if mode == 'raise':
+            return True
+        rate = settings.QUERY_INSPECTION_SAMPLE_RATE
+        return mode == 'log' and (
+            rate >= 1 or (rate > 0 and random.random() < rate)
+        )
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        if not self._inspected():
+            return self.get_response(request)
+
+        with inspect_queries() as log:
+            response = self.get_response(request)
+        self.finish(request, log)
+        return response
+
+    async def __acall__(self, request):
+        if not self._inspected():
+            return await self.get_response(request)
+
+        with inspect_queries() as log:
+            response = await self.get_response(request)
+        self.finish(request, log)
+        return response
+
+    def finish(self, request, log):
+        report = log.report(f'{request.method} {request.get_full_path()}')
+        if report is None:
+            return
+        if settings.QUERY_INSPECTION == 'raise':
+            raise QueryProblemError(report)
+        logger.warning(report, extra={
+            'path': request.path,
+            'queries': log.total,
+            'repeated': len(log.repeated()),
+            'slow': len(log.slow),
+        })
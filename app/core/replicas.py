@@ -0,0 +1,175 @@
+"""
+Routing the reads of safe-method API requests to read replicas
+
+``DB_REPLICA_HOSTS`` adds a ``replicaN`` database per hot standby of the
+primary (see app.settings). Views with ``ReplicaReadMixin`` pick one for
+each GET, HEAD or OPTIONS request once it is authenticated, and
+``ReplicaRouter`` sends the request's reads there; every other query, and
+every query of other views, goes to ``default``.
+
+A user's unsafe-method request pins them to the primary for
+``DB_REPLICA_STICKY_SECONDS``, so they read their own writes however far
+the replicas lag. The pin lives in the default cache, which must be
+shared by the workers (``REDIS_URL``). Each process checks a replica's
+replay lag at most every ``DB_REPLICA_CHECK_INTERVAL`` seconds and skips
+it while it lags more than ``DB_REPLICA_MAX_LAG`` seconds or is down; a
+request whose replica fails midway is served again from the primary.
+"""
+import contextvars
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import (
+    DEFAULT_DB_ALIAS,
+    DatabaseError,
+    InterfaceError,
+    OperationalError,
+    connections,
+)
+from rest_framework.permissions import SAFE_METHODS
+
+from core import metrics
+
+
+# Seconds the replica is behind the primary: none while it has replayed
+# all the WAL it received, even if nothing was committed for a while
+LAG_SQL = '''
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(
+        EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0
+    )
+END
+'''
+
+_read_alias = contextvars.ContextVar('read_alias', default=None)
+
+# Replica alias -> (monotonic time checked, lag in seconds or None if down)
+_health = {}
+_health_lock = threading.Lock()
+
+
+def replica_lag(alias):
+    """Return the replication lag of a replica, or None if it is down"""
+    connection = connections[alias]
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(LAG_SQL)
+            return float(cursor.fetchone()[0])
+    except (DatabaseError, InterfaceError):
+        connection.close()
+        return None
+
+
+def mark_down(alias):
+    """Skip a replica until its next check"""
+    with _health_lock:
+        _health[alias] = (time.monotonic(), None)
+
+
+def available_replicas():
+    """Return the replicas that are up and lag little enough"""
+    now = time.monotonic()
+    available = []
+    for alias in settings.DATABASE_REPLICAS:
+        with _health_lock:
+            checked, lag = _health.get(alias, (None, None))
+        if checked is None or (
+            now - checked >= settings.DB_REPLICA_CHECK_INTERVAL
+        ):
+            lag = replica_lag(alias)
+            with _health_lock:
+                _health[alias] = (now, lag)
+        if lag is not None and lag <= settings.DB_REPLICA_MAX_LAG:
+            available.append(alias)
+    return available
+
+
+def _pin_key(user):
+    return f'replica-pin:{user.pk}'
+
+
+def pin_to_primary(user):
+    """Read from the primary for the user's next requests"""
+    cache.set(_pin_key(user), 1, settings.DB_REPLICA_STICKY_SECONDS)
+
+
+def choose_read_alias(user):
+    """Return the replica to read from for a user, or None for the primary
+
+    Reads inside a transaction stay on its connection.
+    """
+    if not settings.DATABASE_REPLICAS:
+        return None
+    if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+        return None
+    if user.is_authenticated and cache.get(_pin_key(user)):
+        metrics.record_read_route(DEFAULT_DB_ALIAS, 'pinned')
+        return None
+
+    replicas = available_replicas()
+    if not replicas:
+        metrics.record_read_route(DEFAULT_DB_ALIAS, 'unavailable')
+        return None
+    alias = random.choice(replicas)
+    metrics.record_read_route(alias, 'replica')
+    return alias
+
+
+def read_alias():
+    """Return the database the current request reads from"""
+    return _read_alias.get() or DEFAULT_DB_ALIAS
+
+
+class ReplicaRouter:
+    """Send reads to the replica chosen for the request, if any"""
+
+    def db_for_read(self, model, **hints):
+        alias = _read_alias.get()
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class ReplicaReadMixin:
+    """Serve the reads of a view's safe-method requests from a replica"""
+
+    def dispatch(self, request, *args, **kwargs):
+        token = _read_alias.set(None)
+        try:
+            try:
+                return super().dispatch(request, *args, **kwargs)
+            except (InterfaceError, OperationalError):
+                alias = _read_alias.get()
+                if alias is None:
+                    raise
+                mark_down(alias)
+                metrics.record_read_route(DEFAULT_DB_ALIAS, 'retried')
+                _read_alias.set(None)
+                return super().dispatch(request, *args, **kwargs)
+        finally:
+            _read_alias.reset(token)
+
+    def initial(self, request, *args, **kwargs):
+        # Authenticated on the primary, which has tokens created just now
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS:
+            _read_alias.set(choose_read_alias(request.user))
+        elif request.user.is_authenticated:
+            pin_to_primary(request.user)
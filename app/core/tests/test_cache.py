@@ -0,0 +1,62 @@
+"""
+Tests for the in-process cache helpers
+"""
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from core.cache import TTLCache
+
+
+class TTLCacheTests(SimpleTestCase):
+    """Test the TTL LRU cache"""
+
+    def test_get_and_set(self):
+        cache = TTLCache(max_size=10, ttl=60)
+        cache.set('key', 'value')
+
+        self.assertEqual(cache.get('key'), 'value')
+        self.assertIsNone(cache.get('missing'))
+
+    @patch('core.cache.time.monotonic')
+    def test_entries_expire(self, patched_monotonic):
+        patched_monotonic.return_value = 100
+        cache = TTLCache(max_size=10, ttl=60)
+        cache.set('key', 'value')
+
+        patched_monotonic.return_value = 160
+
+        self.assertIsNone(cache.get('key'))
+        self.assertEqual(len(cache), 0)
+
+    def test_least_recently_used_evicted(self):
+        cache = TTLCache(max_size=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+
+    def test_disabled_when_empty(self):
+        cache = TTLCache(max_size=0, ttl=60)
+        cache.set('key', 'value')
+
+        self.assertIsNone(cache.get('key'))
+
+    def test_disabled_without_ttl(self):
+        cache = TTLCache(max_size=10, ttl=0)
+        cache.set('key', 'value')
+
+        self.assertIsNone(cache.get('key'))
+        self.assertEqual(len(cache), 0)
+
+    def test_delete(self):
+        cache = TTLCache(max_size=10, ttl=60)
+        cache.set('key', 'value')
+        cache.delete('key')
+        cache.delete('missing')
+
+        self.assertIsNone(cache.get('key'))
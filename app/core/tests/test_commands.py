@@ -1,8 +1,16 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
 from unittest.mock import patch
 from psycopg2 import OperationalError as Psycopg2Error
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.db.utils import OperationalError
-from django.test import SimpleTestCase
+from django.contrib.auth import get_user_model
+from django.db.models import Count
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+
+from core.models import Ingredient, Recipe, Tag
 
 
 @patch('core.management.commands.wait_for_db.Command.check')
@@ -23,3 +31,131 @@ class CommandTests(SimpleTestCase):
 
         self.assertEqual(patched_check.call_count, 6)
         patched_check.assert_called_with(databases=['default'])
+
+
+class OkHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        status = 200 if self.path == '/ok' else 500
+        self.send_response(status)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'{}')
+
+    def log_message(self, *args):
+        pass
+
+
+class BenchLoadCommandTests(SimpleTestCase):
+    """Test the bench_load command"""
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), OkHandler)
+        threading.Thread(target=self.server.serve_forever).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.base_url = f'http://127.0.0.1:{self.server.server_port}'
+
+    def test_bench_load(self):
+        """Test every request is sent and timed"""
+        out = StringIO()
+
+        call_command(
+            'bench_load',
+            f'{self.base_url}/ok',
+            concurrency=3,
+            requests=10,
+            stdout=out
+        )
+
+        self.assertIn('failed=0', out.getvalue())
+        self.assertIn('n=10', out.getvalue())
+
+    def test_bench_load_all_failed(self):
+        """Test an error is raised when no request succeeds"""
+        with self.assertRaises(CommandError):
+            call_command(
+                'bench_load',
+                f'{self.base_url}/missing',
+                concurrency=2,
+                requests=4,
+                stdout=StringIO()
+            )
+
+
+class SeedDataCommandTests(TestCase):
+    """Test the seed_data command"""
+
+    def seed(self, **options):
+        defaults = {
+            'users': 4,
+            'recipes': 30,
+            'tags': 3,
+            'ingredients': 5,
+            'workers': 1,
+            'chunk_size': 7,
+        }
+        call_command('seed_data', stdout=StringIO(), **defaults | options)
+
+    def test_seed_data(self):
+        """Test users, attributes, recipes and links are created"""
+        self.seed(tags_per_recipe=(1, 2), ingredients_per_recipe=(2, 2))
+
+        self.assertEqual(get_user_model().objects.count(), 4)
+        self.assertEqual(Tag.objects.count(), 4 * 3)
+        self.assertEqual(Ingredient.objects.count(), 4 * 5)
+        recipes = Recipe.objects.annotate(
+            tag_count=Count('tags', distinct=True),
+            ingredient_count=Count('ingredients', distinct=True),
+        )
+        self.assertEqual(len(recipes), 30)
+        for recipe in recipes:
+            self.assertIn(recipe.tag_count, (1, 2))
+            self.assertEqual(recipe.ingredient_count, 2)
+            self.assertIsNotNone(recipe.search_vector)
+            self.assertFalse(
+                recipe.tags.exclude(user=recipe.user_id).exists()
+            )
+
+    def test_seed_data_skip_search_vectors(self):
+        """Test search vectors can be left for later"""
+        self.seed(skip_search_vectors=True)
+
+        self.assertFalse(
+            Recipe.objects.filter(search_vector__isnull=False).exists()
+        )
+
+    def test_seed_data_password(self):
+        """Test seeded users can log in with the given password"""
+        self.seed(password='seedpass', recipes=0)
+
+        user = get_user_model().objects.first()
+        self.assertTrue(user.check_password('seedpass'))
+
+    def test_invalid_range(self):
+        """Test a malformed per recipe range is rejected"""
+        with self.assertRaises(CommandError):
+            call_command('seed_data', '--tags-per-recipe', '3-1')
+
+
+class SeedDataParallelCommandTests(TransactionTestCase):
+    """Test seed_data across worker processes"""
+
+    def test_seed_data_in_parallel(self):
+        """Test every chunk is loaded by the worker pool"""
+        call_command(
+            'seed_data',
+            users=3,
+            recipes=40,
+            workers=2,
+            chunk_size=10,
+            distribution='uniform',
+            stdout=StringIO()
+        )
+
+        self.assertEqual(Recipe.objects.count(), 40)
+        self.assertEqual(
+            Recipe.objects.filter(search_vector__isnull=True).count(),
+            0
+        )
@@ -0,0 +1,103 @@
+"""
+Tests for the persistent database connection handling
+"""
+import threading
+import time
+from io import StringIO
+from unittest.mock import Mock, patch
+
+from asgiref.sync import async_to_sync
+from django.core.management import call_command
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+
+from core import db
+
+
+def fake_connection(max_age=600, last_request_at=None, usable=True):
+    connection = Mock(
+        connection=object(),
+        in_atomic_block=False,
+        settings_dict={'CONN_MAX_AGE': max_age},
+        last_request_at=last_request_at,
+    )
+    connection.is_usable.return_value = usable
+    return connection
+
+
+@override_settings(DB_HEALTH_CHECK_IDLE=10)
+class ConnectionHealthCheckTests(SimpleTestCase):
+    """Test persistent connections are checked before reuse"""
+
+    def check(self, connection):
+        with patch('core.db.connections') as connections:
+            connections.all.return_value = [connection]
+            db.check_connections()
+
+    def test_broken_idle_connection_closed(self):
+        """Test an idle connection that does not answer is replaced"""
+        connection = fake_connection(usable=False)
+
+        self.check(connection)
+
+        connection.close.assert_called_once()
+
+    def test_healthy_idle_connection_kept(self):
+        """Test an idle connection that answers is reused"""
+        connection = fake_connection(last_request_at=time.monotonic() - 60)
+
+        self.check(connection)
+
+        connection.is_usable.assert_called_once()
+        connection.close.assert_not_called()
+
+    def test_recently_used_connection_not_checked(self):
+        """Test a connection used moments ago is reused without a ping"""
+        connection = fake_connection(last_request_at=time.monotonic())
+
+        self.check(connection)
+
+        connection.is_usable.assert_not_called()
+
+    def test_non_persistent_connection_not_checked(self):
+        """Test connections closed after each request are left alone"""
+        connection = fake_connection(max_age=0, usable=False)
+
+        self.check(connection)
+
+        connection.is_usable.assert_not_called()
+        connection.close.assert_not_called()
+
+
+class RunInDbThreadTests(SimpleTestCase):
+    """Test running blocking code from async views"""
+
+    @override_settings(ASYNC_DB_THREADS=2)
+    def test_runs_on_pool_thread(self):
+        """Test the code runs on the database thread pool"""
+        name = async_to_sync(db.run_in_db_thread)(
+            lambda: threading.current_thread().name
+        )
+
+        self.assertTrue(name.startswith('async-db'))
+
+    @override_settings(ASYNC_DB_THREADS=0)
+    def test_runs_on_request_thread(self):
+        """Test the pool can be disabled"""
+        name = async_to_sync(db.run_in_db_thread)(
+            lambda: threading.current_thread().name
+        )
+
+        self.assertEqual(name, threading.current_thread().name)
+
+
+class BenchDbCommandTests(TransactionTestCase):
+    """Test the bench_db command"""
+
+    def test_bench_db(self):
+        """Test both connection modes are timed"""
+        out = StringIO()
+
+        call_command('bench_db', requests=3, stdout=out)
+
+        self.assertIn('new connection per request: n=3', out.getvalue())
+        self.assertIn('persistent connection: n=3', out.getvalue())
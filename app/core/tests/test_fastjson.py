@@ -0,0 +1,101 @@
+"""
+Tests for the fast JSON renderer and parser
+"""
+import datetime
+import io
+import uuid
+from collections import OrderedDict
+from decimal import Decimal
+from unittest import skipIf
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.serializer_helpers import ReturnList
+
+from core import fastjson
+
+
+DATA = ReturnList([
+    OrderedDict([
+        ('id', 1),
+        ('title', 'Crème brûlée\u2028'),
+        ('price', Decimal('20.06')),
+        ('created', datetime.datetime(
+            2022, 5, 1, 12, 30, 15, 123456, tzinfo=datetime.timezone.utc
+        )),
+        ('day', datetime.date(2022, 5, 1)),
+        ('key', uuid.UUID(int=1)),
+        ('label', gettext_lazy('Name')),
+        ('tags', [OrderedDict([('id', 2), ('name', 'Vegan')])]),
+        ('variants', {300: {'webp': 'a.webp'}}),
+    ]),
+], serializer=None)
+
+
+class FastJSONRendererTests(SimpleTestCase):
+    """Test the renderer produces what DRF's renders"""
+
+    def assertSameAsDRF(self, accepted_media_type=None):
+        self.assertEqual(
+            fastjson.FastJSONRenderer().render(DATA, accepted_media_type),
+            JSONRenderer().render(DATA, accepted_media_type)
+        )
+
+    @skipIf(fastjson.orjson is None, 'orjson is not installed')
+    def test_orjson_output(self):
+        """Test orjson output matches DRF's"""
+        self.assertSameAsDRF()
+
+    def test_fallback_output(self):
+        """Test the stdlib fallback output matches DRF's"""
+        with patch.object(fastjson, 'orjson', None):
+            self.assertSameAsDRF()
+
+    def test_indented_output(self):
+        """Test indented output is left to DRF"""
+        self.assertSameAsDRF('application/json; indent=4')
+
+    def test_none(self):
+        """Test no data renders an empty body"""
+        self.assertEqual(fastjson.FastJSONRenderer().render(None), b'')
+
+
+class FastJSONParserTests(SimpleTestCase):
+    """Test the parser reads what DRF's reads"""
+
+    def parse(self, body, encoding='utf-8'):
+        return fastjson.FastJSONParser().parse(
+            io.BytesIO(body),
+            parser_context={'encoding': encoding}
+        )
+
+    def test_parse(self):
+        """Test a UTF-8 body is parsed"""
+        body = '{"title": "Crème", "tags": [{"name": "Vegan"}]}'.encode()
+
+        self.assertEqual(
+            self.parse(body),
+            JSONParser().parse(io.BytesIO(body))
+        )
+
+    def test_fallback_parse(self):
+        """Test bodies are parsed without orjson"""
+        with patch.object(fastjson, 'orjson', None):
+            self.assertEqual(self.parse(b'{"id": 1}'), {'id': 1})
+
+    def test_other_encoding(self):
+        """Test bodies in other encodings are decoded first"""
+        body = '{"title": "Crème"}'.encode('latin-1')
+
+        self.assertEqual(self.parse(body, 'latin-1'), {'title': 'Crème'})
+
+    def test_invalid_json(self):
+        """Test invalid bodies are a parse error"""
+        for body in (b'{"id": ', b'{"id": NaN}'):
+            with self.subTest(body=body):
+                with self.assertRaisesMessage(ParseError, 'JSON parse error'):
+                    self.parse(body)
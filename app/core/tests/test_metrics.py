@@ -0,0 +1,140 @@
+"""
+Tests for the Prometheus metrics
+"""
+import os
+import subprocess
+import sys
+import tempfile
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from prometheus_client import REGISTRY
+
+from rest_framework.test import APIClient
+
+from core import metrics
+from core.cache import TTLCache
+
+
+METRICS_URL = reverse('metrics')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+@override_settings(METRICS_TOKEN='secret')
+class MetricsViewTests(TestCase):
+    """Test the metrics endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_requests_counted_by_route(self):
+        """Test requests are counted under their URL name"""
+        user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='goodpass'
+        )
+        self.client.force_authenticate(user)
+        labels = {'route': 'recipe:tag-list', 'method': 'GET'}
+        before = sample('recipe_api_requests_total', status='2xx', **labels)
+
+        self.client.get(TAGS_URL)
+        self.client.force_authenticate(None)
+        res = self.client.get(
+            METRICS_URL,
+            HTTP_AUTHORIZATION='Bearer secret'
+        )
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res['Content-Type'].startswith('text/plain'))
+        self.assertEqual(
+            sample('recipe_api_requests_total', status='2xx', **labels),
+            before + 1
+        )
+        self.assertIn(
+            b'recipe_api_request_duration_seconds_bucket{le="0.005",'
+            b'method="GET",route="recipe:tag-list"}',
+            res.content
+        )
+
+    def test_wrong_token_rejected(self):
+        """Test scrapes need the metrics token"""
+        res = self.client.get(METRICS_URL, HTTP_AUTHORIZATION='Bearer no')
+
+        self.assertEqual(res.status_code, 403)
+
+    @override_settings(METRICS_TOKEN='')
+    def test_disabled_without_token(self):
+        """Test the endpoint does not exist until a token is set"""
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, 404)
+
+    def test_workers_aggregated(self):
+        """Test the metrics of every worker process are added up"""
+        script = (
+            'from prometheus_client import Counter\n'
+            "Counter('recipe_api_requests_total', '', "
+            "['route', 'method', 'status'])"
+            ".labels('recipe:tag-list', 'GET', '2xx').inc()\n"
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            env = {**os.environ, 'PROMETHEUS_MULTIPROC_DIR': directory}
+            for _ in range(2):
+                subprocess.run(
+                    [sys.executable, '-c', script],
+                    env=env,
+                    check=True
+                )
+
+            with patch.dict(os.environ, PROMETHEUS_MULTIPROC_DIR=directory):
+                res = self.client.get(
+                    METRICS_URL,
+                    HTTP_AUTHORIZATION='Bearer secret'
+                )
+
+        self.assertIn(
+            b'recipe_api_requests_total{method="GET",'
+            b'route="recipe:tag-list",status="2xx"} 2.0',
+            res.content
+        )
+
+
+class MetricsTests(SimpleTestCase):
+    """Test the metric helpers"""
+
+    def test_bounded_label(self):
+        """Test label values past the limit are grouped together"""
+        label = metrics.BoundedLabel(2)
+
+        values = [label(value) for value in ('a', 'b', 'c', 'a', 'd')]
+
+        self.assertEqual(values, ['a', 'b', 'other', 'a', 'other'])
+
+    def test_named_cache_counted(self):
+        """Test hits and misses of named caches are counted"""
+        cache = TTLCache(10, 60, name='test')
+        hits = sample('recipe_api_cache_requests_total', cache='test',
+                      result='hit')
+        misses = sample('recipe_api_cache_requests_total', cache='test',
+                        result='miss')
+
+        cache.get('key')
+        cache.set('key', 'value')
+        cache.get('key')
+
+        self.assertEqual(
+            sample('recipe_api_cache_requests_total', cache='test',
+                   result='hit'),
+            hits + 1
+        )
+        self.assertEqual(
+            sample('recipe_api_cache_requests_total', cache='test',
+                   result='miss'),
+            misses + 1
+        )
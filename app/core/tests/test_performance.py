@@ -0,0 +1,125 @@
+"""
+Tests for the per-request performance metrics
+"""
+import re
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import performance
+from core.models import Recipe
+from user import authentication
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+SERVER_TIMING_RE = re.compile(
+    r'db;dur=(?P<db>[\d.]+);desc="(?P<queries>\d+) queries", '
+    r'serialize;dur=(?P<serialize>[\d.]+), '
+    r'total;dur=(?P<total>[\d.]+)'
+)
+
+
+def detail_url(recipe_id):
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+@override_settings(PERFORMANCE_SAMPLE_RATE=1, PERFORMANCE_SERVER_TIMING=True)
+class PerformanceMiddlewareTests(TestCase):
+    """Test requests are measured and reported"""
+
+    def setUp(self):
+        cache.clear()
+        authentication.local_cache.clear()
+        performance.histograms.clear()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='goodpass'
+        )
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title='Recipe',
+            time_minutes=10,
+            price=Decimal('5.00')
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_server_timing_header(self):
+        """Test queries, serializer and total time are sent back"""
+        with self.assertNumQueries(3) as context:
+            res = self.client.get(detail_url(self.recipe.id))
+
+        timing = SERVER_TIMING_RE.fullmatch(res['Server-Timing'])
+        self.assertIsNotNone(timing)
+        self.assertEqual(
+            int(timing['queries']),
+            len(context.captured_queries)
+        )
+        self.assertGreater(float(timing['serialize']), 0)
+        self.assertGreaterEqual(
+            float(timing['total']),
+            float(timing['db']) + float(timing['serialize'])
+        )
+
+    def test_list_serialization_timed(self):
+        """Test list serializers are timed"""
+        res = self.client.get(RECIPES_URL)
+
+        timing = SERVER_TIMING_RE.fullmatch(res['Server-Timing'])
+        self.assertGreater(float(timing['serialize']), 0)
+
+    def test_endpoint_histogram(self):
+        """Test requests are counted per endpoint"""
+        self.client.get(detail_url(self.recipe.id))
+        res = self.client.get(detail_url(self.recipe.id))
+
+        stats = performance.histograms.snapshot()[
+            'GET recipe:recipe-detail'
+        ]
+        self.assertEqual(stats['count'], 2)
+        self.assertEqual(sum(stats['buckets']), 2)
+        self.assertGreaterEqual(stats['size'], len(res.content))
+
+    def test_log_line(self):
+        """Test each measured request is logged with its metrics"""
+        with self.assertLogs('core.performance', 'INFO') as logs:
+            self.client.get(detail_url(self.recipe.id))
+
+        record = logs.records[0]
+        self.assertEqual(record.endpoint, 'GET recipe:recipe-detail')
+        self.assertEqual(record.status, 200)
+        self.assertIn('endpoint="GET recipe:recipe-detail"', logs.output[0])
+
+    @override_settings(PERFORMANCE_SAMPLE_RATE=0)
+    def test_unsampled_request(self):
+        """Test requests left out of the sample are not measured"""
+        res = self.client.get(detail_url(self.recipe.id))
+
+        self.assertNotIn('Server-Timing', res)
+        self.assertEqual(performance.histograms.snapshot(), {})
+
+    @override_settings(PERFORMANCE_SERVER_TIMING=False)
+    def test_server_timing_disabled(self):
+        """Test the header can be left out while still measuring"""
+        res = self.client.get(detail_url(self.recipe.id))
+
+        self.assertNotIn('Server-Timing', res)
+        self.assertIn(
+            'GET recipe:recipe-detail',
+            performance.histograms.snapshot()
+        )
+
+    async def test_async_request(self):
+        """Test requests served by the async handler are measured"""
+        res = await self.async_client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, 401)
+        self.assertIsNotNone(
+            SERVER_TIMING_RE.fullmatch(res['Server-Timing'])
+        )
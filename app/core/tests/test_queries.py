@@ -0,0 +1,120 @@
+"""
+Tests for the slow query and N+1 detector
+"""
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import queries
+from core.models import Tag
+
+
+TAGS_URL = reverse('recipe:tag-list')
+
+
+class FingerprintTests(SimpleTestCase):
+    """Test queries differing only in their values match"""
+
+    def test_values_blanked(self):
+        """Test literals, placeholders and lists become placeholders"""
+        self.assertEqual(
+            queries.fingerprint(
+                "SELECT  * FROM t WHERE a = %s AND b = 'x''y'\n"
+                'AND c IN (%s, %s, %s) LIMIT 21'
+            ),
+            'SELECT * FROM t WHERE a = ? AND b = ? AND c IN (...) LIMIT ?'
+        )
+
+    def test_rows_blanked(self):
+        """Test inserts of any number of rows match"""
+        self.assertEqual(
+            queries.fingerprint('INSERT INTO t VALUES (%s, %s), (%s, %s)'),
+            queries.fingerprint('INSERT INTO t VALUES (1, 2)')
+        )
+
+    def test_identifiers_kept(self):
+        """Test digits inside names are not values"""
+        self.assertEqual(
+            queries.fingerprint('SELECT "U0"."id" FROM t2 U0'),
+            'SELECT "U0"."id" FROM t2 U0'
+        )
+
+
+class QueryInspectionTests(TestCase):
+    """Test repeated and slow queries are reported"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='goodpass'
+        )
+        self.tags = [
+            Tag.objects.create(user=self.user, name=name)
+            for name in ('Vegan', 'Dessert', 'Quick')
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    @override_settings(QUERY_REPEAT_THRESHOLD=3)
+    def test_repeated_queries_reported(self):
+        """Test a query run once per row is reported with its caller"""
+        with queries.inspect_queries() as log:
+            for tag in self.tags:
+                Tag.objects.get(pk=tag.pk)
+
+        report = log.report('loop')
+        self.assertIn('loop ran 3 queries:', report)
+        self.assertIn('repeated 3x: SELECT', report)
+        self.assertIn('"core_tag"."id" = ?', report)
+        self.assertIn('core/tests/test_queries.py', report)
+
+    @override_settings(QUERY_REPEAT_THRESHOLD=4)
+    def test_below_threshold_not_reported(self):
+        """Test queries repeated less than the threshold are fine"""
+        with queries.inspect_queries() as log:
+            for tag in self.tags:
+                Tag.objects.get(pk=tag.pk)
+
+        self.assertIsNone(log.report('loop'))
+
+    @override_settings(QUERY_SLOW_MS=0)
+    def test_slow_queries_reported(self):
+        """Test queries slower than the threshold are reported"""
+        with queries.inspect_queries() as log:
+            Tag.objects.count()
+
+        self.assertIn('slow ', log.report('count'))
+
+    @override_settings(QUERY_INSPECTION='raise', QUERY_REPEAT_THRESHOLD=1)
+    def test_raise_mode(self):
+        """Test requests with repeated queries fail in raise mode"""
+        with self.assertRaisesMessage(
+            queries.QueryProblemError,
+            f'GET {TAGS_URL} ran'
+        ):
+            self.client.get(TAGS_URL)
+
+    @override_settings(
+        QUERY_INSPECTION='log',
+        QUERY_INSPECTION_SAMPLE_RATE=1,
+        QUERY_REPEAT_THRESHOLD=1
+    )
+    def test_log_mode(self):
+        """Test requests with repeated queries are logged in log mode"""
+        with self.assertLogs('core.queries', 'WARNING') as logs:
+            res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(logs.records[0].path, TAGS_URL)
+
+    @override_settings(
+        QUERY_INSPECTION='log',
+        QUERY_INSPECTION_SAMPLE_RATE=0,
+        QUERY_REPEAT_THRESHOLD=1
+    )
+    def test_unsampled_request(self):
+        """Test requests left out of the sample are not inspected"""
+        with self.assertNoLogs('core.queries'):
+            self.client.get(TAGS_URL)
@@ -0,0 +1,104 @@
+"""
+Tests for the read replica routing
+"""
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import OperationalError
+from django.test import SimpleTestCase, override_settings
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory, force_authenticate
+from rest_framework.views import APIView
+
+from core import replicas
+from core.models import Recipe
+
+
+class ReadAliasView(replicas.ReplicaReadMixin, APIView):
+    """Return the database a request reads from, failing on replicas"""
+    fail_on_replica = False
+
+    def get(self, request):
+        alias = replicas.read_alias()
+        if self.fail_on_replica and alias != 'default':
+            raise OperationalError('replica went away')
+        return Response({'alias': alias})
+
+    def post(self, request):
+        return Response({'alias': replicas.read_alias()})
+
+
+@override_settings(
+    DATABASE_REPLICAS=['replica1', 'replica2'],
+    DB_REPLICA_MAX_LAG=5,
+    DB_REPLICA_CHECK_INTERVAL=60,
+)
+class ReplicaRoutingTests(SimpleTestCase):
+    """Test safe-method requests read from replicas that keep up"""
+
+    def setUp(self):
+        replicas._health.clear()
+        cache.clear()
+        self.user = get_user_model()(pk=1, email='user@example.com')
+        self.lags = {'replica1': 0.0, 'replica2': 0.0}
+        patcher = patch.object(
+            replicas, 'replica_lag', side_effect=self.lags.get
+        )
+        self.replica_lag = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def request(self, method='get', **initkwargs):
+        request = getattr(APIRequestFactory(), method)('/')
+        force_authenticate(request, self.user)
+        return ReadAliasView.as_view(**initkwargs)(request).data['alias']
+
+    def test_reads_from_replica(self):
+        """Test a GET reads from one of the replicas"""
+        self.assertIn(self.request(), ['replica1', 'replica2'])
+
+    def test_router_follows_request(self):
+        """Test the router sends reads to the request's replica only"""
+        router = replicas.ReplicaRouter()
+        token = replicas._read_alias.set('replica2')
+        try:
+            self.assertEqual(router.db_for_read(Recipe), 'replica2')
+            self.assertEqual(router.db_for_write(Recipe), 'default')
+        finally:
+            replicas._read_alias.reset(token)
+
+        self.assertIsNone(router.db_for_read(Recipe))
+        self.assertFalse(router.allow_migrate('replica1', 'core'))
+
+    def test_write_pins_user_to_primary(self):
+        """Test a user reads from the primary for a while after writing"""
+        self.assertEqual(self.request('post'), 'default')
+
+        self.assertEqual(self.request(), 'default')
+        cache.clear()
+        self.assertNotEqual(self.request(), 'default')
+
+    def test_lagging_and_down_replicas_skipped(self):
+        """Test replicas lagging more than the max lag or down are not used"""
+        self.lags.update(replica1=30.0, replica2=None)
+
+        self.assertEqual(self.request(), 'default')
+
+        self.lags['replica2'] = 1.0
+        replicas._health.clear()
+        self.assertEqual(self.request(), 'replica2')
+
+    def test_lag_checked_once_per_interval(self):
+        """Test a worker checks each replica at most once per interval"""
+        for _ in range(3):
+            self.request()
+
+        self.assertEqual(self.replica_lag.call_count, 2)
+
+    def test_failed_replica_retried_on_primary(self):
+        """Test a request whose replica fails is served from the primary"""
+        self.lags['replica2'] = None
+
+        self.assertEqual(self.request(fail_on_replica=True), 'default')
+        self.assertEqual(self.request(), 'default')
+        self.assertEqual(replicas.available_replicas(), [])
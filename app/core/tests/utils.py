@@ -0,0 +1,17 @@
+"""
+Helpers shared by the test suites
+"""
+from django.test.utils import override_settings
+
+
+def strict_queries(test):
+    """Fail the requests of a test case or test running repeated or slow
+    queries
+
+    Test data holds a few rows, so a query run twice is already one per
+    row.
+    """
+    return override_settings(
+        QUERY_INSPECTION='raise',
+        QUERY_REPEAT_THRESHOLD=2
+    )(test)
@@ -0,0 +1,108 @@
+"""
+Async variants of the recipe, tag and ingredient read endpoints
+
+Served in place of the router's views when ``RECIPE_ASYNC_VIEWS`` is set,
+which the ASGI entry point does. Django 4.0's ORM is synchronous, so each
+GET runs its DRF view on the database thread pool from ``core.db`` while
+the event loop goes on serving other connections: a slow client or a slow
+query holds a coroutine rather than a whole worker process. This is not
+faster: the thread hop makes CPU-bound requests slower than under WSGI.
+
+Writes to the same URLs are served by the sync views, the way Django runs
+any sync view under ASGI, and so are the recipe actions such as export.
+"""
+import re
+
+from asgiref.sync import sync_to_async
+from django.urls import re_path
+from rest_framework.permissions import SAFE_METHODS
+
+from core.db import run_in_db_thread
+from recipe import views
+
+
+def _render(view, request, *args, **kwargs):
+    response = view(request, *args, **kwargs)
+    # Render while still on the database thread
+    if hasattr(response, 'render'):
+        response.render()
+    return response
+
+
+def async_view(viewset, actions, sync_actions=None, **initkwargs):
+    """Return an async view serving the read ``actions`` of a viewset
+
+    Requests for ``sync_actions`` run the sync view instead.
+    """
+    view = viewset.as_view(actions, **initkwargs)
+    sync_view = viewset.as_view(sync_actions or actions, **initkwargs)
+
+    async def async_viewset_view(request, *args, **kwargs):
+        if request.method in SAFE_METHODS:
+            return await run_in_db_thread(
+                _render, view, request, *args, **kwargs
+            )
+        return await sync_to_async(_render, thread_sensitive=True)(
+            sync_view, request, *args, **kwargs
+        )
+
+    async_viewset_view.csrf_exempt = True
+    return async_viewset_view
+
+
+def detail_route(prefix, viewset):
+    """Return the regex of a viewset's detail route
+
+    The paths of the viewset's list actions, such as ``recipes/stats/``,
+    are left out so they still reach the router's views.
+    """
+    actions = '|'.join(
+        re.escape(action.url_path)
+        for action in viewset.get_extra_actions()
+        if not action.detail
+    )
+    return rf'^{prefix}/(?!(?:{actions})/$)(?P<pk>[^/.]+)/$'
+
+
+recipe_list = async_view(
+    views.RecipeViewSet,
+    {'get': 'list'},
+    {'post': 'create'},
+    basename='recipe',
+    detail=False,
+)
+recipe_detail = async_view(
+    views.RecipeViewSet,
+    {'get': 'retrieve'},
+    {
+        'put': 'update',
+        'patch': 'partial_update',
+        'delete': 'destroy',
+    },
+    basename='recipe',
+    detail=True,
+)
+tag_list = async_view(
+    views.TagViewSet,
+    {'get': 'list'},
+    basename='tag',
+    detail=False,
+)
+ingredient_list = async_view(
+    views.IngredientViewSet,
+    {'get': 'list'},
+    basename='ingredient',
+    detail=False,
+)
+
+# Same paths and names as the router's, so they take over those routes
+urlpatterns = [
+    re_path(r'^recipes/$', recipe_list, name='recipe-list'),
+    re_path(
+        detail_route('recipes', views.RecipeViewSet),
+        recipe_detail,
+        name='recipe-detail'
+    ),
+    re_path(r'^tags/$', tag_list, name='tag-list'),
+    re_path(r'^ingredients/$', ingredient_list, name='ingredient-list'),
+]
@@ -0,0 +1,41 @@
+"""
+Autocomplete of tag and ingredient names
+
+Names are matched with pg_trgm word similarity, so ``tom`` finds
+``Cherry tomatoes`` and small typos still match, using the GIN index on
+``(user, name)``. Inputs too short to make trigrams fall back to a prefix
+match over the user's names. Results of hot prefixes are kept in an
+in-process cache keyed by the user's catalog version, which is off
+unless the version is shared between workers (REDIS_URL).
+"""
+from django.conf import settings
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db.models import BooleanField, ExpressionWrapper, Q
+
+from core.cache import TTLCache
+
+
+local_cache = TTLCache(
+    settings.RECIPE_AUTOCOMPLETE_CACHE_SIZE,
+    settings.RECIPE_AUTOCOMPLETE_CACHE_TTL,
+    name='autocomplete'
+)
+
+
+def suggest(queryset, terms, limit):
+    """Return the ``limit`` names of ``queryset`` best matching ``terms``
+
+    Names starting with ``terms`` come first, then the closest matches.
+    """
+    if len(terms) < settings.RECIPE_AUTOCOMPLETE_TRIGRAM_MIN_LENGTH:
+        queryset = queryset.filter(name__istartswith=terms)
+    else:
+        queryset = queryset.filter(name__trigram_word_similar=terms)
+
+    return queryset.annotate(
+        is_prefix=ExpressionWrapper(
+            Q(name__istartswith=terms),
+            output_field=BooleanField()
+        ),
+        similarity=TrigramWordSimilarity(terms, 'name'),
+    ).order_by('-is_prefix', '-similarity', 'name', 'id')[:limit]
@@ -0,0 +1,128 @@
+"""
+Bulk import and export of recipes as newline delimited JSON
+"""
+import tempfile
+from itertools import islice
+
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+
+from core import fastjson
+from core.models import Recipe, Tag, Ingredient
+from recipe import summary
+from recipe.cache import catalog_changed
+from recipe.search import update_search_vectors
+from recipe.serializers import RecipeDetailSerializer, bulk_get_or_create
+
+
+# Exports spooled to a temporary file stay in memory up to this size
+SPOOL_MAX_SIZE = 1024 * 1024
+
+
+class ImportRejected(Exception):
+    """Raised with per-line errors when imported rows are invalid"""
+
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def chunked(iterable, size):
+    """Yield lists of up to ``size`` items from ``iterable``"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _link_related(recipes, field, model, user, nested):
+    """Insert the through rows linking ``recipes`` to their nested items"""
+    m2m = Recipe._meta.get_field(field)
+    through = m2m.remote_field.through
+    related = iter(bulk_get_or_create(
+        model, user, [item for items in nested for item in items]
+    ))
+
+    links = set()
+    for recipe, items in zip(recipes, nested):
+        for _ in items:
+            links.add((recipe.id, next(related).id))
+
+    through.objects.bulk_create(
+        through(**{
+            m2m.m2m_column_name(): recipe_id,
+            m2m.m2m_reverse_name(): target_id,
+        })
+        for recipe_id, target_id in links
+    )
+    summary.change_links(field, [target_id for _, target_id in links])
+
+
+def _insert_chunk(user, items):
+    """Insert validated recipes and their relations with batched queries"""
+    tags, ingredients, recipes = [], [], []
+    for item in items:
+        tags.append(item.pop('tags', []))
+        ingredients.append(item.pop('ingredients', []))
+        recipes.append(Recipe(user=user, **item))
+
+    Recipe.objects.bulk_create(recipes)
+    summary.change_recipes(added=map(summary.recipe_totals, recipes))
+    _link_related(recipes, 'tags', Tag, user, tags)
+    _link_related(recipes, 'ingredients', Ingredient, user, ingredients)
+    update_search_vectors(recipe.id for recipe in recipes)
+
+    return recipes
+
+
+@transaction.atomic
+def import_recipes(rows, user, context, chunk_size):
+    """Validate and insert ``(line number, data)`` rows chunk by chunk
+
+    Each chunk is validated with ``RecipeDetailSerializer``. The whole
+    import runs in one transaction and is rolled back, raising
+    ``ImportRejected``, on the first invalid chunk. Returns the number of
+    recipes created.
+    """
+    created = 0
+    for chunk in chunked(rows, chunk_size):
+        serializer = RecipeDetailSerializer(
+            data=[data for _, data in chunk],
+            many=True,
+            context=context
+        )
+        if not serializer.is_valid():
+            raise ImportRejected([
+                {'line': line, 'errors': errors}
+                for (line, _), errors in zip(chunk, serializer.errors)
+                if errors
+            ])
+        created += len(_insert_chunk(user, serializer.validated_data))
+
+    # Bulk inserts send no model signals
+    catalog_changed(user.id)
+    return created
+
+
+def export_recipes(queryset, prefetches, context, chunk_size):
+    """Yield the recipes of ``queryset`` as NDJSON lines
+
+    Rows are read through a server-side cursor and relations are prefetched
+    one chunk at a time, so memory use does not depend on the number of
+    recipes exported.
+    """
+    for chunk in chunked(queryset.iterator(chunk_size=chunk_size), chunk_size):
+        prefetch_related_objects(chunk, *prefetches)
+        serializer = RecipeDetailSerializer(chunk, many=True, context=context)
+        for data in serializer.data:
+            yield fastjson.dumps(data) + b'\n'
+
+
+def spool_lines(lines):
+    """Write ``lines`` to a temporary file and return it, rewound"""
+    spooled = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    spooled.writelines(lines)
+    spooled.seek(0)
+    return spooled
@@ -0,0 +1,108 @@
+"""
+Per-user response caching for the recipe APIs
+
+Every user has a catalog version, stored in the default cache and bumped
+whenever one of their recipes, tags or ingredients (or the links between
+them) changes. Cached responses and ETags are keyed by that version, so a
+write invalidates all of the user's cached responses at once without
+having to find them.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from rest_framework import status
+from rest_framework.response import Response
+
+from core.metrics import record_cache
+
+
+def _version_key(user_id):
+    return f'catalog-version:{user_id}'
+
+
+def catalog_version(user_id):
+    """Return the current catalog version of a user"""
+    # A version that was evicted restarts from the clock rather than from
+    # 1, so it never repeats a version that may still have cached responses
+    return cache.get_or_set(_version_key(user_id), time.time_ns(), None)
+
+
+def bump_catalog_version(user_id):
+    try:
+        cache.incr(_version_key(user_id))
+    except ValueError:
+        cache.set(_version_key(user_id), time.time_ns(), None)
+
+
+def catalog_changed(user_id):
+    """Invalidate the cached responses of a user
+
+    The version is bumped right away and, inside a transaction, again once
+    it commits, so a response computed from data read before the commit
+    cannot stay cached under the new version.
+    """
+    bump_catalog_version(user_id)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: bump_catalog_version(user_id))
+
+
+def response_cache_key(request):
+    """Return the cache key of a GET request's response"""
+    params = sorted(request.query_params.lists())
+    fingerprint = hashlib.sha256(repr((
+        request.build_absolute_uri(request.path),
+        params,
+        request.accepted_renderer.format,
+    )).encode()).hexdigest()
+    version = catalog_version(request.user.id)
+
+    return f'recipe-response:{request.user.id}:{version}:{fingerprint}'
+
+
+def _etag_matches(request, etag):
+    header = request.headers.get('If-None-Match', '')
+    return any(
+        value.strip() in (etag, '*', f'W/{etag}')
+        for value in header.split(',')
+    )
+
+
+class CachedResponseMixin:
+    """Serve list and retrieve responses from the per-user cache
+
+    Responses carry an ETag derived from the cache key, so a client sending
+    it back in ``If-None-Match`` gets a 304 without any serialization.
+    """
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        timeout = settings.RECIPE_RESPONSE_CACHE_TTL
+        if not timeout:
+            return handler(request, *args, **kwargs)
+
+        key = response_cache_key(request)
+        etag = '"{}"'.format(hashlib.md5(key.encode()).hexdigest())
+        if _etag_matches(request, etag):
+            record_cache('recipe_response', True)
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            data = cache.get(key)
+            record_cache('recipe_response', data is not None)
+            if data is None:
+                response = handler(request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                cache.set(key, response.data, timeout)
+            else:
+                response = Response(data)
+
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ['Authorization'])
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
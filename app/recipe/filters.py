@@ -0,0 +1,156 @@
+"""
+Semi-join filters for the recipe APIs
+
+Filtering through the recipe M2M tables is done with correlated EXISTS
+subqueries, so a recipe linked to several matching rows is still returned
+once and no ``DISTINCT`` is needed.
+
+Range filters and orderings on recipe columns are plain comparisons, each
+backed by an index on the user and the column, ending with ``id`` so the
+pagination can seek to any page with a keyset.
+
+Rows are scoped to their owner with ``filter_owned()``, which the GIN
+indexes leading with the user can match.
+"""
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import BigIntegerField, Exists, OuterRef, Value
+from django.db.models.functions import Cast
+from rest_framework.exceptions import ValidationError
+
+from core.models import Recipe
+
+
+MATCH_ANY = 'any'
+MATCH_ALL = 'all'
+MATCH_CHOICES = [MATCH_ANY, MATCH_ALL]
+
+# Range query params: (param, lookup, converter of the bound). Bounds are
+# at most the largest integer column value, so they compare as integers.
+MAX_BOUND = 2 ** 31 - 1
+RECIPE_RANGES = [
+    ('min_time', 'time_minutes__gte', int),
+    ('max_time', 'time_minutes__lte', int),
+    ('min_price', 'price__gte', Decimal),
+    ('max_price', 'price__lte', Decimal),
+]
+
+# The ``ordering`` choices and the ordering each paginates by. Ties are
+# broken by id in the same direction, so an index scans them in order.
+RECIPE_ORDERINGS = {
+    '-id': ('-id',),
+    'id': ('id',),
+    'time_minutes': ('time_minutes', 'id'),
+    '-time_minutes': ('-time_minutes', '-id'),
+    'price': ('price', 'id'),
+    '-price': ('-price', '-id'),
+}
+
+
+def parse_ids(value, param):
+    """Convert a comma separated string of ids to a list of integers"""
+    try:
+        return sorted({int(str_id) for str_id in value.split(',')})
+    except ValueError:
+        raise ValidationError(
+            {param: 'Expected a comma separated list of ids.'}
+        )
+
+
+def parse_match(value, param):
+    """Validate a match mode, defaulting to ``any``"""
+    if value is None:
+        return MATCH_ANY
+    if value not in MATCH_CHOICES:
+        raise ValidationError(
+            {param: f'Expected one of: {", ".join(MATCH_CHOICES)}.'}
+        )
+    return value
+
+
+def parse_bound(value, param, convert):
+    """Convert a range bound to a number from 0 to ``MAX_BOUND``"""
+    try:
+        bound = convert(value)
+        if not 0 <= bound <= MAX_BOUND:
+            raise ValueError(value)
+    except (ValueError, InvalidOperation):
+        raise ValidationError(
+            {param: f'Expected a number from 0 to {MAX_BOUND}.'}
+        )
+    return bound
+
+
+def parse_ordering(value):
+    """Validate an ordering choice, defaulting to newest first"""
+    if value is None:
+        return RECIPE_ORDERINGS['-id']
+    if value not in RECIPE_ORDERINGS:
+        raise ValidationError(
+            {'ordering': f'Expected one of: {", ".join(RECIPE_ORDERINGS)}.'}
+        )
+    return RECIPE_ORDERINGS[value]
+
+
+def filter_recipes_by_range(queryset, params):
+    """Apply the ``RECIPE_RANGES`` query params present in ``params``"""
+    bounds = {}
+    for param, lookup, convert in RECIPE_RANGES:
+        value = params.get(param)
+        if value:
+            bounds[lookup] = parse_bound(value, param, convert)
+
+    for field in ('time_minutes', 'price'):
+        low = bounds.get(f'{field}__gte')
+        high = bounds.get(f'{field}__lte')
+        if low is not None and high is not None and low > high:
+            raise ValidationError(
+                {field: 'The minimum is greater than the maximum.'}
+            )
+    return queryset.filter(**bounds)
+
+
+def _through_links(field):
+    """Return the through model and its recipe/target columns"""
+    m2m = Recipe._meta.get_field(field)
+    return (
+        m2m.remote_field.through,
+        m2m.m2m_column_name(),
+        m2m.m2m_reverse_name(),
+    )
+
+
+def filter_recipes_by_related(queryset, field, ids, match=MATCH_ANY):
+    """Filter recipes linked to any or all of ``ids`` through ``field``"""
+    through, recipe_col, target_col = _through_links(field)
+    links = through.objects.filter(**{recipe_col: OuterRef('pk')})
+
+    if match == MATCH_ALL:
+        for target_id in ids:
+            queryset = queryset.filter(
+                Exists(links.filter(**{target_col: target_id}))
+            )
+        return queryset
+
+    return queryset.filter(
+        Exists(links.filter(**{f'{target_col}__in': ids}))
+    )
+
+
+def filter_assigned(queryset, field):
+    """Filter tags or ingredients linked to at least one recipe"""
+    through, _, target_col = _through_links(field)
+
+    return queryset.filter(
+        Exists(through.objects.filter(**{target_col: OuterRef('pk')}))
+    )
+
+
+def filter_owned(queryset, user):
+    """Filter recipes, tags or ingredients to those of ``user``
+
+    The ID is compared as a bigint, like the column. An integer parameter
+    compares as an int4, which btree_gin's ``int8_ops`` cannot match, so
+    the GIN indexes on ``(user, ...)`` would return every user's matches.
+    """
+    return queryset.filter(user_id=Cast(Value(user.pk), BigIntegerField()))
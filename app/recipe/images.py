@@ -0,0 +1,183 @@
+"""
+Background generation of resized recipe image variants
+
+Uploads are stored as-is and return immediately. Once the upload commits,
+resized WebP (where Pillow supports it) and JPEG copies are rendered in a
+pool of worker threads and recorded on ``Recipe.image_variants``, which
+the detail serializer exposes. Re-encoding the pixels leaves the EXIF
+metadata behind.
+"""
+import logging
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from PIL import Image, ImageOps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+
+from core import metrics
+from core.models import Recipe
+from recipe.cache import catalog_changed
+
+
+logger = logging.getLogger(__name__)
+
+VARIANT_FORMATS = {
+    'webp': 'WEBP',
+    'jpeg': 'JPEG',
+}
+
+# EXIF orientations that turn the image a quarter, swapping its sides
+ORIENTATION_TAG = 0x0112
+QUARTER_TURNS = (5, 6, 7, 8)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    """Return the worker pool, created lazily in each process"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.RECIPE_IMAGE_WORKERS,
+                thread_name_prefix='recipe-image',
+            )
+    return _executor
+
+
+def supported_formats():
+    """Return the variant formats this Pillow build can encode"""
+    Image.init()
+    return {
+        ext: image_format
+        for ext, image_format in VARIANT_FORMATS.items()
+        if image_format in Image.SAVE
+    }
+
+
+def variant_name(image_name, width, ext):
+    """Return the storage name of an image variant"""
+    stem = os.path.splitext(os.path.basename(image_name))[0]
+    return os.path.join(
+        'uploads', 'recipe', 'variants', f'{stem}-{width}.{ext}'
+    )
+
+
+def render_variants(image_name):
+    """Render and store the variants of a stored image
+
+    Widths wider than the original are skipped rather than upscaled; an
+    image narrower than every width gets one variant at its own width.
+    Formats the Pillow build cannot encode are skipped. Returns
+    ``{width: {ext: storage name}}``.
+
+    The image is reduced to the widest variant as it is decoded, which
+    JPEG decoders do at a fraction of the full size, rather than holding
+    up to ``RECIPE_IMAGE_MAX_PIXELS`` pixels in each worker thread.
+    """
+    with default_storage.open(image_name) as image_file:
+        with Image.open(image_file) as original:
+            turned = original.getexif().get(ORIENTATION_TAG) in QUARTER_TURNS
+            width, height = original.size
+            if turned:
+                width, height = height, width
+
+            widths = [
+                variant_width
+                for variant_width in settings.RECIPE_IMAGE_VARIANT_WIDTHS
+                if variant_width < width
+            ] or [width]
+            size = (max(widths), math.ceil(height * max(widths) / width))
+            original.thumbnail(
+                size[::-1] if turned else size,
+                Image.LANCZOS
+            )
+            image = ImageOps.exif_transpose(original).convert('RGB')
+
+    formats = supported_formats()
+    variants = {}
+    for width in widths:
+        height = max(1, round(image.height * width / image.width))
+        resized = image.resize((width, height), Image.LANCZOS)
+        variants[str(width)] = {}
+        for ext, image_format in formats.items():
+            buffer = BytesIO()
+            resized.save(
+                buffer,
+                format=image_format,
+                quality=settings.RECIPE_IMAGE_QUALITY,
+            )
+            variants[str(width)][ext] = default_storage.save(
+                variant_name(image_name, width, ext),
+                ContentFile(buffer.getvalue()),
+            )
+
+    return variants
+
+
+def process_recipe_image(recipe_id, user_id, image_name):
+    """Render the variants of a recipe image and record them"""
+    try:
+        variants = render_variants(image_name)
+    except Exception:
+        logger.exception('Could not render variants of %s', image_name)
+        metrics.image_jobs.labels('error').inc()
+        return
+
+    updated = Recipe.objects.filter(
+        pk=recipe_id,
+        image=image_name
+    ).update(image_variants=variants)
+
+    metrics.image_jobs.labels('done' if updated else 'discarded').inc()
+    if updated:
+        # ``update()`` sends no signals
+        catalog_changed(user_id)
+    else:
+        # The image was replaced or the recipe deleted meanwhile
+        delete_variants(variants)
+
+
+def delete_variants(variants):
+    """Delete the stored files of ``{width: {ext: storage name}}``"""
+    for formats in variants.values():
+        for name in formats.values():
+            default_storage.delete(name)
+
+
+def _run_in_worker(*args):
+    try:
+        process_recipe_image(*args)
+    finally:
+        metrics.image_jobs_pending.dec()
+        connection.close()
+
+
+def _submit(*args):
+    metrics.image_jobs_pending.inc()
+    _get_executor().submit(_run_in_worker, *args)
+
+
+def schedule_variants(recipe, replaced=None):
+    """Render the variants of a recipe's image in the background
+
+    Jobs are queued once the current transaction commits, when the
+    ``replaced`` variants of the previous image are deleted. With
+    ``RECIPE_IMAGE_WORKERS`` set to 0 jobs run inline instead.
+    """
+    if replaced:
+        transaction.on_commit(lambda: delete_variants(replaced))
+
+    args = (recipe.id, recipe.user_id, recipe.image.name)
+    if not settings.RECIPE_IMAGE_WORKERS:
+        process_recipe_image(*args)
+        return
+
+    transaction.on_commit(lambda: _submit(*args))
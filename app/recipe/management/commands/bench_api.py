@@ -0,0 +1,351 @@
+"""
+    Django command to benchmark the REST API endpoints
+"""
+import io
+import json
+import random
+import tempfile
+import time
+from contextlib import ExitStack
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.benchmark import compare_results, format_summary, summarize
+from core.models import Ingredient, Recipe, Tag
+from recipe.seeding import STYLES, WORDS, seed_recipes
+
+
+BENCH_EMAIL = 'bench-api-{}@example.com'
+BENCH_PASSWORD = 'bench-password'
+SCENARIOS = (
+    'token',
+    'recipe-list',
+    'recipe-filter',
+    'recipe-search',
+    'recipe-detail',
+    'recipe-create',
+    'image-upload',
+    'tag-list',
+    'ingredient-list',
+    'recipe-list-cached',
+)
+# Scenarios served from the per-user response cache. The others run with
+# it off, so they time the queries and serialization of every request.
+CACHED_SCENARIOS = {'recipe-list-cached': 300}
+
+
+def jpeg_bytes(width=640, height=480):
+    """Return a JPEG image to upload"""
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), (200, 120, 40)).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+class BenchUser:
+    """A seeded user with an authenticated client and their object IDs"""
+
+    def __init__(self, user):
+        self.user = user
+        self.client = APIClient()
+        token = Token.objects.create(user=user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.recipe_ids = list(
+            Recipe.objects.filter(user=user)
+            .order_by('id')
+            .values_list('id', flat=True)[:1000]
+        )
+        self.tags = list(
+            Tag.objects.filter(user=user).values_list('id', 'name')
+        )
+        self.ingredients = list(
+            Ingredient.objects.filter(user=user).values_list('id', 'name')
+        )
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed users, recipes, tags and ingredients, then time requests to '
+        'the API endpoints, reporting latency, requests per second and '
+        'queries per request'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=5,
+            help='Users to seed',
+        )
+        parser.add_argument(
+            '--recipes',
+            type=int,
+            default=1000,
+            help='Recipes to seed for each user',
+        )
+        parser.add_argument(
+            '--tags',
+            type=int,
+            default=len(STYLES),
+            help='Tags to seed for each user',
+        )
+        parser.add_argument(
+            '--ingredients',
+            type=int,
+            default=len(WORDS),
+            help='Ingredients to seed for each user',
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=200,
+            help='Requests to time for each scenario',
+        )
+        parser.add_argument(
+            '--warmup',
+            type=int,
+            default=10,
+            help='Untimed requests sent before each scenario',
+        )
+        parser.add_argument(
+            '--scenario',
+            action='append',
+            choices=SCENARIOS,
+            help='Scenario to run, may be repeated (default: all)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Recipes inserted per batch while seeding',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Seed of the random data and requests',
+        )
+        parser.add_argument(
+            '--label',
+            default='',
+            help='Label saved with the results, e.g. a commit hash',
+        )
+        parser.add_argument(
+            '--output',
+            help='Save the results as JSON to this path',
+        )
+        parser.add_argument(
+            '--compare',
+            help='JSON results of an earlier run to compare against',
+        )
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=10,
+            help='Percent p95 slowdown reported as a regression',
+        )
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Commit the seeded data instead of rolling it back',
+        )
+
+    def seed(self, rng, options):
+        users = []
+        for i in range(options['users']):
+            user = get_user_model().objects.create_user(
+                email=BENCH_EMAIL.format(i),
+                password=BENCH_PASSWORD,
+            )
+            seed_recipes(
+                rng,
+                user,
+                options['recipes'],
+                options['batch_size'],
+                tags=options['tags'],
+                ingredients=options['ingredients'],
+            )
+            users.append(BenchUser(user))
+            self.stdout.write(f'Seeded user {i + 1}/{options["users"]}')
+        return users
+
+    def build_request(self, scenario, rng, bench_user):
+        """Return the client method, path and payload of a request"""
+        recipes_url = reverse('recipe:recipe-list')
+
+        if scenario == 'token':
+            return 'post', reverse('user:token'), {
+                'email': bench_user.user.email,
+                'password': BENCH_PASSWORD,
+            }
+        if scenario in ('recipe-list', 'recipe-list-cached'):
+            return 'get', recipes_url, None
+        if scenario == 'recipe-filter':
+            tags = rng.sample(bench_user.tags, min(2, len(bench_user.tags)))
+            ingredient = rng.choice(bench_user.ingredients)
+            return 'get', recipes_url, {
+                'tags': ','.join(str(tag_id) for tag_id, _ in tags),
+                'ingredients': str(ingredient[0]),
+            }
+        if scenario == 'recipe-search':
+            return 'get', recipes_url, {'search': rng.choice(WORDS)}
+        if scenario == 'recipe-detail':
+            url = reverse(
+                'recipe:recipe-detail',
+                args=[rng.choice(bench_user.recipe_ids)]
+            )
+            return 'get', url, None
+        if scenario == 'recipe-create':
+            tags = rng.sample(bench_user.tags, min(2, len(bench_user.tags)))
+            ingredients = rng.sample(
+                bench_user.ingredients,
+                min(3, len(bench_user.ingredients))
+            )
+            return 'post', recipes_url, {
+                'title': ' '.join(rng.sample(WORDS, 2)).capitalize(),
+                'time_minutes': rng.randint(5, 240),
+                'price': '9.99',
+                'tags': [{'name': name} for _, name in tags] + [
+                    {'name': f'new {rng.choice(STYLES)}'}
+                ],
+                'ingredients': [{'name': name} for _, name in ingredients],
+            }
+        if scenario == 'image-upload':
+            url = reverse(
+                'recipe:recipe-upload-image',
+                args=[rng.choice(bench_user.recipe_ids)]
+            )
+            return 'post', url, {
+                'image': SimpleUploadedFile(
+                    'bench.jpg',
+                    self.image,
+                    content_type='image/jpeg'
+                ),
+            }
+        if scenario == 'tag-list':
+            return 'get', reverse('recipe:tag-list'), None
+        return 'get', reverse('recipe:ingredient-list'), None
+
+    def send(self, scenario, bench_user, method, path, data):
+        client = bench_user.client
+        if method == 'get':
+            return client.get(path, data)
+        if scenario == 'image-upload':
+            return client.post(path, data, format='multipart')
+        return client.post(path, data, format='json')
+
+    def run_scenario(self, scenario, rng, users, options):
+        """Time a scenario, returning its summary"""
+        timings, queries = [], []
+        for i in range(options['warmup'] + options['requests']):
+            bench_user = rng.choice(users)
+            method, path, data = self.build_request(scenario, rng, bench_user)
+
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                response = self.send(
+                    scenario, bench_user, method, path, data
+                )
+                elapsed = (time.perf_counter() - start) * 1000
+
+            if response.status_code >= 400:
+                raise CommandError(
+                    f'{scenario}: {method.upper()} {path} returned '
+                    f'{response.status_code} {response.content[:200]!r}'
+                )
+            if i >= options['warmup']:
+                timings.append(elapsed)
+                queries.append(len(context.captured_queries))
+
+        summary = summarize(timings)
+        summary['requests_per_second'] = 1000 / summary['mean']
+        summary['queries'] = sum(queries) / len(queries)
+        summary['queries_max'] = max(queries)
+        return summary
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['recipes'] < 1:
+            raise CommandError('Seed at least one user and one recipe')
+        if options['requests'] < 1:
+            raise CommandError('Time at least one request')
+
+        rng = random.Random(options['seed'])
+        self.image = jpeg_bytes()
+        scenarios = options['scenario'] or SCENARIOS
+        results = {}
+
+        with ExitStack() as stack:
+            stack.enter_context(override_settings(
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+                RECIPE_IMAGE_UPLOAD_RATE=None,
+            ))
+            if not options['keep']:
+                # Uploaded images go away with the rolled back recipes
+                stack.enter_context(override_settings(
+                    MEDIA_ROOT=stack.enter_context(
+                        tempfile.TemporaryDirectory()
+                    )
+                ))
+
+            with transaction.atomic():
+                users = self.seed(rng, options)
+                for scenario in scenarios:
+                    with override_settings(RECIPE_RESPONSE_CACHE_TTL=(
+                        CACHED_SCENARIOS.get(scenario, 0)
+                    )):
+                        summary = self.run_scenario(
+                            scenario, rng, users, options
+                        )
+                    results[scenario] = summary
+                    self.stdout.write(
+                        f'{format_summary(scenario, summary)} '
+                        f'{summary["requests_per_second"]:.1f} req/s '
+                        f'queries={summary["queries"]:.1f}'
+                    )
+
+                if not options['keep']:
+                    transaction.set_rollback(True)
+
+        report = {
+            'label': options['label'],
+            'created': datetime.now(timezone.utc).isoformat(),
+            'dataset': {
+                key: options[key]
+                for key in ('users', 'recipes', 'tags', 'ingredients', 'seed')
+            },
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2, sort_keys=True)
+            self.stdout.write(f'Saved results to {options["output"]}')
+
+        if options['compare']:
+            with open(options['compare']) as baseline_file:
+                baseline = json.load(baseline_file)
+            if baseline.get('dataset') != report['dataset']:
+                self.stdout.write(self.style.WARNING(
+                    'The baseline was run against a different dataset'
+                ))
+
+            lines, regressions = compare_results(
+                baseline['results'],
+                results,
+                options['threshold']
+            )
+            for line in lines:
+                self.stdout.write(line)
+            if regressions:
+                raise CommandError(
+                    f'Regressed against {options["compare"]}: '
+                    f'{", ".join(regressions)}'
+                )
@@ -0,0 +1,139 @@
+"""
+    Django command to benchmark the recipe full-text search
+"""
+import random
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.benchmark import format_summary, summarize, time_calls
+from core.models import Recipe
+from recipe import views
+from recipe.management.commands.explain_queries import (
+    INDEX_RE,
+    first_page_queryset,
+)
+from recipe.seeding import STYLES, WORDS, seed_recipes
+
+
+BENCH_EMAIL = 'bench-search-{}@example.com'
+
+
+class Command(BaseCommand):
+    help = 'Seed recipes and time full-text searches against them'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recipes',
+            type=int,
+            default=100000,
+            help='Recipes to seed, spread evenly over the users',
+        )
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=10,
+            help=(
+                'Users to seed; searches run as the first, among the '
+                "other users' recipes"
+            ),
+        )
+        parser.add_argument(
+            '--queries',
+            type=int,
+            default=200,
+            help='Searches to time',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Recipes inserted per batch while seeding',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Seed of the random data and queries',
+        )
+        parser.add_argument(
+            '--email',
+            help='Search the recipes of an existing user instead of seeding',
+        )
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Commit the seeded recipes instead of rolling them back',
+        )
+
+    def get_user(self, options, rng):
+        if options['email']:
+            user = get_user_model().objects.filter(
+                email=options['email']
+            ).first()
+            if user is None:
+                raise CommandError(f'No user {options["email"]}')
+            return user
+
+        users = options['users']
+        for i in range(users):
+            user = get_user_model().objects.create_user(
+                email=BENCH_EMAIL.format(i)
+            )
+            seed_recipes(
+                rng,
+                user,
+                options['recipes'] // users + (i < options['recipes'] % users),
+                options['batch_size'],
+                progress=self.progress
+            )
+        return get_user_model().objects.get(email=BENCH_EMAIL.format(0))
+
+    def progress(self, done, count):
+        self.stdout.write(f'Seeded {done}/{count}')
+
+    def handle(self, *args, **options):
+        if options['users'] < 1:
+            raise CommandError('Seed at least one user')
+        rng = random.Random(options['seed'])
+
+        with transaction.atomic():
+            user = self.get_user(options, rng)
+            terms = [
+                rng.choice([
+                    rng.choice(WORDS),
+                    f'{rng.choice(WORDS)} {rng.choice(STYLES)}',
+                    f'{rng.choice(WORDS)} or {rng.choice(WORDS)}',
+                ])
+                for _ in range(options['queries'])
+            ]
+            queries = iter(terms * 2)
+
+            def search():
+                list(first_page_queryset(
+                    views.RecipeViewSet,
+                    user,
+                    {'search': next(queries)}
+                ))
+
+            timings = time_calls(search, len(terms), warmup=len(terms))
+            plan = first_page_queryset(
+                views.RecipeViewSet,
+                user,
+                {'search': terms[0]}
+            ).explain(analyze=True)
+
+            recipes = Recipe.objects.filter(user=user).count()
+            total = Recipe.objects.count()
+            self.stdout.write(format_summary(
+                f'search over {recipes} of {total} recipes',
+                summarize(timings)
+            ))
+            used = INDEX_RE.findall(plan)
+            self.stdout.write(f'Indexes used: {", ".join(used) or "none"}')
+            if options['verbosity'] > 1:
+                self.stdout.write(plan)
+
+            if not options['email'] and not options['keep']:
+                transaction.set_rollback(True)
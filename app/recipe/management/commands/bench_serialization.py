@@ -0,0 +1,136 @@
+"""
+    Django command to benchmark serializing and rendering recipe lists
+"""
+import io
+import random
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from core import fastjson
+from core.benchmark import format_summary, summarize, time_calls
+from core.models import Recipe
+from recipe import readers, sparse, views
+from recipe.seeding import seed_recipes
+from recipe.serializers import (
+    IngredientSerializer,
+    RecipeSerializer,
+    TagSerializer,
+)
+
+
+BENCH_EMAIL = 'bench-serialization@example.com'
+
+
+class Command(BaseCommand):
+    help = (
+        'Time serializing a list of recipes with the serializers and the '
+        "row readers, and rendering and parsing it with DRF's JSON classes "
+        'and core.fastjson'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recipes',
+            type=int,
+            default=1000,
+            help='Recipes in the serialized list',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=50,
+            help='Timed runs of each stage',
+        )
+        parser.add_argument(
+            '--warmup',
+            type=int,
+            default=5,
+            help='Untimed runs of each stage',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Seed of the random data',
+        )
+
+    def stages(self, user):
+        """Return the timed stages, over the recipes of ``user``"""
+        fieldset = sparse.Fieldset(RecipeSerializer.Meta.fields)
+        queryset = Recipe.objects.filter(user=user).order_by('-id')
+
+        def load_models():
+            return list(queryset.only(*fieldset.columns()).prefetch_related(
+                *views.recipe_prefetches()
+            ))
+
+        def load_rows():
+            return list(queryset.values(*fieldset.columns()))
+
+        recipes = load_models()
+        rows = load_rows()
+        ids = [row['id'] for row in rows]
+        related = {
+            'tags': readers.related_rows('tags', ids, TagSerializer),
+            'ingredients': readers.related_rows(
+                'ingredients', ids, IngredientSerializer
+            ),
+        }
+        data = RecipeSerializer(recipes, many=True).data
+        body = JSONRenderer().render(data)
+
+        return len(body), {
+            'serialize': lambda: RecipeSerializer(recipes, many=True).data,
+            'read rows': lambda: readers.read_rows(
+                rows, RecipeSerializer, RecipeSerializer.Meta.fields, related
+            ),
+            'list models': lambda: RecipeSerializer(
+                load_models(), many=True
+            ).data,
+            'list rows': lambda: readers.read_recipes(
+                load_rows(), RecipeSerializer, fieldset
+            ),
+            'render drf': lambda: JSONRenderer().render(data),
+            'render fast': lambda: fastjson.FastJSONRenderer().render(data),
+            'parse drf': lambda: JSONParser().parse(io.BytesIO(body)),
+            'parse fast': lambda: fastjson.FastJSONParser().parse(
+                io.BytesIO(body)
+            ),
+        }
+
+    def handle(self, *args, **options):
+        count = options['recipes']
+        with transaction.atomic():
+            user = get_user_model().objects.create_user(email=BENCH_EMAIL)
+            seed_recipes(
+                random.Random(options['seed']), user, count, batch_size=1000
+            )
+            size, stages = self.stages(user)
+
+            self.stdout.write(
+                f'{count} recipes, {size} bytes, orjson '
+                f'{"installed" if fastjson.orjson else "not installed"}'
+            )
+            means = {}
+            for name, stage in stages.items():
+                summary = summarize(
+                    time_calls(stage, options['repeat'], options['warmup'])
+                )
+                means[name] = summary['mean']
+                self.stdout.write(format_summary(name, summary))
+            transaction.set_rollback(True)
+
+        for slow, fast in (
+            ('serialize', 'read rows'),
+            ('list models', 'list rows'),
+            ('render drf', 'render fast'),
+            ('parse drf', 'parse fast'),
+        ):
+            self.stdout.write(
+                f'{fast}: {means[slow] / means[fast]:.1f}x faster than '
+                f'{slow}, {means[fast] * 1000 / count:.1f}us per recipe'
+            )
@@ -0,0 +1,216 @@
+"""
+    Django command to EXPLAIN the queries behind the recipe API endpoints
+"""
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory
+from rest_framework.request import Request
+
+from core.models import Recipe, Tag, Ingredient
+from recipe import views
+
+
+INDEX_RE = re.compile(
+    r'(?:Index(?: Only)? Scan(?: Backward)? using|Bitmap Index Scan on) (\w+)'
+)
+
+
+def leading_indexes(model, column):
+    """Return the names of a model's indexes leading with ``column``"""
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(
+            cursor, model._meta.db_table
+        )
+    return tuple(sorted(
+        name for name, constraint in constraints.items()
+        if constraint['index'] and constraint['columns'][:1] == [column]
+    ))
+
+
+def user_indexes(model):
+    """Return the names of a model's indexes leading with its user"""
+    return leading_indexes(model, 'user_id')
+
+
+def endpoints(user):
+    """Return (name, viewset, query params, expected index) for each query
+
+    The expected index may be a tuple of indexes, any of which is fine.
+    """
+    tag_id = Tag.objects.filter(user=user).values_list('id', flat=True).first()
+    ingredient_id = Ingredient.objects.filter(
+        user=user
+    ).values_list('id', flat=True).first()
+    title = Recipe.objects.filter(
+        user=user
+    ).values_list('title', flat=True).first()
+    search_term = title.split()[0] if title else 'recipe'
+
+    return [
+        ('recipe-list', views.RecipeViewSet, {}, 'recipe_user_id_idx'),
+        # The recipes linked to the tags, read from the links alone
+        (
+            'recipe-list?tags',
+            views.RecipeViewSet,
+            {'tags': str(tag_id or 0)},
+            'recipe_tags_tag_recipe_idx'
+        ),
+        (
+            'recipe-list?ingredients',
+            views.RecipeViewSet,
+            {'ingredients': str(ingredient_id or 0)},
+            'recipe_ingr_ingr_recipe_idx'
+        ),
+        # The search index leads with the user; scanning the user's
+        # recipes through another such index is cheaper while they have few
+        (
+            'recipe-list?search',
+            views.RecipeViewSet,
+            {'search': search_term},
+            user_indexes(Recipe)
+        ),
+        (
+            'recipe-list?ordering=price',
+            views.RecipeViewSet,
+            {'ordering': 'price'},
+            'recipe_user_price_idx'
+        ),
+        (
+            'recipe-list?ordering=-time_minutes',
+            views.RecipeViewSet,
+            {'ordering': '-time_minutes'},
+            'recipe_user_time_idx'
+        ),
+        # Either the range or the order can be read from an index
+        (
+            'recipe-list?max_time&ordering=price',
+            views.RecipeViewSet,
+            {'max_time': '30', 'ordering': 'price'},
+            ('recipe_user_price_idx', 'recipe_user_time_idx')
+        ),
+        (
+            'recipe-list?max_price',
+            views.RecipeViewSet,
+            {'max_price': '10'},
+            ('recipe_user_id_idx', 'recipe_user_price_idx')
+        ),
+        ('tag-list', views.TagViewSet, {}, 'tag_user_name_idx'),
+        (
+            'tag-list?assigned_only',
+            views.TagViewSet,
+            {'assigned_only': '1'},
+            'tag_user_name_idx'
+        ),
+        # Whether each tag has a recipe, probed by the tag
+        (
+            'tag-list?assigned_only links',
+            views.TagViewSet,
+            {'assigned_only': '1'},
+            leading_indexes(Recipe.tags.through, 'tag_id')
+        ),
+        (
+            'ingredient-list',
+            views.IngredientViewSet,
+            {},
+            'ingredient_user_name_idx'
+        ),
+        (
+            'ingredient-list?assigned_only',
+            views.IngredientViewSet,
+            {'assigned_only': '1'},
+            'ingredient_user_name_idx'
+        ),
+        (
+            'ingredient-list?assigned_only links',
+            views.IngredientViewSet,
+            {'assigned_only': '1'},
+            leading_indexes(Recipe.ingredients.through, 'ingredient_id')
+        ),
+    ]
+
+
+def first_page_queryset(viewset, user, params):
+    """Return the queryset a list request reads for its first page"""
+    request = Request(RequestFactory().get('/', params))
+    request.user = user
+    view = viewset(
+        request=request,
+        action='list',
+        format_kwarg=None,
+        kwargs={}
+    )
+    queryset = view.get_queryset()
+    paginator = view.paginator
+    ordering = paginator.get_ordering(request, queryset, view)
+
+    return queryset.order_by(*ordering)[:paginator.page_size + 1]
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN the recipe API list queries and check index usage'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--email',
+            help='User whose data the queries run against '
+                 '(defaults to the first user)',
+        )
+        parser.add_argument(
+            '--analyze',
+            action='store_true',
+            help='Run EXPLAIN ANALYZE instead of a plain EXPLAIN',
+        )
+        parser.add_argument(
+            '--no-seqscan',
+            action='store_true',
+            help='Discourage sequential scans, useful on small databases',
+        )
+        parser.add_argument(
+            '--strict',
+            action='store_true',
+            help='Fail if any query does not use its expected index',
+        )
+
+    def get_user(self, email):
+        users = get_user_model().objects.order_by('id')
+        user = users.filter(email=email).first() if email else users.first()
+        if user is None:
+            raise CommandError('No user to run the queries against')
+        return user
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['email'])
+        missing = []
+
+        with transaction.atomic():
+            if options['no_seqscan']:
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+
+            for name, viewset, params, index in endpoints(user):
+                plan = first_page_queryset(viewset, user, params).explain(
+                    analyze=options['analyze']
+                )
+                used = INDEX_RE.findall(plan)
+                expected = (index,) if isinstance(index, str) else index
+                found = [index for index in expected if index in used]
+                if found:
+                    self.stdout.write(
+                        self.style.SUCCESS(f'{name}: uses {found[0]}')
+                    )
+                else:
+                    missing.append(name)
+                    self.stdout.write(self.style.ERROR(
+                        f'{name}: does not use {" or ".join(expected)} '
+                        f'(uses: {", ".join(used) or "no index"})'
+                    ))
+                if options['verbosity'] > 1:
+                    self.stdout.write(plan)
+
+        if missing and options['strict']:
+            raise CommandError(
+                f'Expected index not used by: {", ".join(missing)}'
+            )
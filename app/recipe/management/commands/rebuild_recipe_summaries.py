@@ -0,0 +1,42 @@
+"""
+    Django command to rebuild the per-user recipe summaries
+"""
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from recipe import summary
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the recipe summaries behind the stats endpoint from the '
+        'recipes, of the given users or of everyone'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--email',
+            action='append',
+            default=[],
+            help='Rebuild the summaries of this user only; repeatable',
+        )
+
+    def handle(self, *args, **options):
+        user_ids = None
+        if options['email']:
+            users = dict(get_user_model().objects.filter(
+                email__in=options['email']
+            ).values_list('email', 'id'))
+            missing = set(options['email']) - set(users)
+            if missing:
+                raise CommandError(f'No user {", ".join(sorted(missing))}')
+            user_ids = list(users.values())
+
+        start = time.perf_counter()
+        rows = summary.rebuild(user_ids)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {rows} summary rows in {elapsed:.1f}s'
+        ))
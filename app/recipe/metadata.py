@@ -0,0 +1,231 @@
+"""
+Removing the metadata of uploaded recipe images
+
+EXIF, XMP and IPTC blocks can carry where a photo was taken, the serial
+number of the camera and the like, and the original upload is served as
+stored. They are dropped by rewriting the segments or chunks of the file
+without decoding it, so the image data stays byte for byte the same and
+only a chunk is held in memory at a time. The EXIF orientation is kept,
+in an EXIF block holding nothing else, so the image still displays the
+right way up. GIFs carry no EXIF and are stored as uploaded.
+"""
+import struct
+import tempfile
+import zlib
+
+from PIL import Image
+from django.core.files import File
+from django.utils.translation import gettext_lazy as _
+
+from recipe.images import ORIENTATION_TAG
+
+
+CHUNK_SIZE = 64 * 1024
+EXIF_HEADER = b'Exif\x00\x00'
+
+# JPEG markers: APP0 (JFIF), APP1 (EXIF, XMP), APP2 (ICC profile, MPF),
+# APP14 (Adobe colour transform), start of scan, end of image
+APP0, APP1, APP2, APP14 = 0xE0, 0xE1, 0xE2, 0xEE
+SOS, EOI = 0xDA, 0xD9
+ICC_PROFILE = b'ICC_PROFILE\x00'
+# PNG text and timestamp chunks; eXIf is rewritten instead
+PNG_DROPPED = {b'tEXt', b'zTXt', b'iTXt', b'tIME'}
+# VP8X flags of WebP files with EXIF and XMP chunks
+WEBP_EXIF_FLAG, WEBP_XMP_FLAG = 0x08, 0x04
+
+
+def orientation_exif(data):
+    """Return EXIF holding only the orientation of ``data``, or None
+
+    None when the orientation is missing, the default or unreadable.
+    """
+    exif = Image.Exif()
+    try:
+        exif.load(data)
+        orientation = exif.get(ORIENTATION_TAG)
+    except Exception:
+        return None
+    if orientation in (None, 1):
+        return None
+
+    kept = Image.Exif()
+    kept[ORIENTATION_TAG] = orientation
+    return kept.tobytes()
+
+
+def _read(src, size):
+    data = src.read(size)
+    if len(data) != size:
+        raise ValueError('Truncated image')
+    return data
+
+
+def _copy(src, dst, size):
+    while size:
+        chunk = _read(src, min(size, CHUNK_SIZE))
+        dst.write(chunk)
+        size -= len(chunk)
+
+
+def _copy_until_eoi(src, dst):
+    """Copy the scans of a JPEG up to its end, leaving what follows
+
+    0xFF is always followed by 0x00 inside entropy-coded data, so the
+    first end of image marker is the end of the image. Data after it,
+    such as the previews of a multi-picture file, is left behind.
+    """
+    pending = b''
+    while True:
+        chunk = src.read(CHUNK_SIZE)
+        if not chunk:
+            dst.write(pending)
+            return
+        data = pending + chunk
+        end = data.find(bytes([0xFF, EOI]))
+        if end != -1:
+            dst.write(data[:end + 2])
+            return
+        dst.write(data[:-1])
+        pending = data[-1:]
+
+
+def _strip_jpeg(src, dst):
+    dst.write(_read(src, 2))
+    while True:
+        if _read(src, 1) != b'\xff':
+            raise ValueError('Invalid JPEG marker')
+        marker = _read(src, 1)[0]
+        while marker == 0xFF:
+            marker = _read(src, 1)[0]
+        if marker == EOI or 0xD0 <= marker <= 0xD7 or marker == 0x01:
+            dst.write(bytes([0xFF, marker]))
+            if marker == EOI:
+                return
+            continue
+
+        length = _read(src, 2)
+        size = struct.unpack('>H', length)[0] - 2
+        if marker == SOS:
+            dst.write(bytes([0xFF, marker]) + length)
+            _copy(src, dst, size)
+            _copy_until_eoi(src, dst)
+            return
+        if not (APP0 <= marker <= 0xEF or marker == 0xFE):
+            dst.write(bytes([0xFF, marker]) + length)
+            _copy(src, dst, size)
+            continue
+
+        payload = _read(src, size)
+        if marker == APP1 and payload.startswith(EXIF_HEADER):
+            payload = orientation_exif(payload)
+        elif not (
+            marker in (APP0, APP14)
+            or marker == APP2 and payload.startswith(ICC_PROFILE)
+        ):
+            payload = None
+        if payload is not None:
+            dst.write(
+                bytes([0xFF, marker]) + struct.pack('>H', len(payload) + 2)
+            )
+            dst.write(payload)
+
+
+def _png_chunk(chunk_type, data):
+    return b''.join([
+        struct.pack('>I', len(data)),
+        chunk_type,
+        data,
+        struct.pack('>I', zlib.crc32(chunk_type + data)),
+    ])
+
+
+def _strip_png(src, dst):
+    dst.write(_read(src, 8))
+    while True:
+        header = src.read(8)
+        if len(header) < 8:
+            return
+        size, chunk_type = struct.unpack('>I4s', header)
+        if chunk_type in PNG_DROPPED:
+            _read(src, size + 4)
+        elif chunk_type == b'eXIf':
+            exif = orientation_exif(_read(src, size))
+            _read(src, 4)
+            if exif:
+                dst.write(_png_chunk(b'eXIf', exif[len(EXIF_HEADER):]))
+        else:
+            dst.write(header)
+            _copy(src, dst, size + 4)
+        if chunk_type == b'IEND':
+            return
+
+
+def _strip_webp(src, dst):
+    riff_size = struct.unpack('<I', _read(src, 12)[4:8])[0]
+    dst.write(b'RIFF\x00\x00\x00\x00WEBP')
+    flags_at = None
+    flags = 0
+    has_exif = False
+    remaining = riff_size - 4
+    while remaining >= 8:
+        header = _read(src, 8)
+        fourcc, size = struct.unpack('<4sI', header)
+        padded = size + size % 2
+        remaining -= 8 + padded
+        if fourcc == b'EXIF':
+            exif = orientation_exif(_read(src, padded)[:size])
+            if exif:
+                data = exif[len(EXIF_HEADER):]
+                dst.write(b'EXIF' + struct.pack('<I', len(data)))
+                dst.write(data + b'\x00' * (len(data) % 2))
+                has_exif = True
+        elif fourcc == b'XMP ':
+            _read(src, padded)
+        else:
+            if fourcc == b'VP8X':
+                flags_at = dst.tell() + 8
+                flags = _read(src, 1)[0]
+                dst.write(header + bytes([flags]))
+                _copy(src, dst, padded - 1)
+            else:
+                dst.write(header)
+                _copy(src, dst, padded)
+
+    end = dst.tell()
+    dst.seek(4)
+    dst.write(struct.pack('<I', end - 8))
+    if flags_at is not None:
+        flags &= ~(WEBP_EXIF_FLAG | WEBP_XMP_FLAG)
+        dst.seek(flags_at)
+        dst.write(bytes([flags | (WEBP_EXIF_FLAG if has_exif else 0)]))
+    dst.seek(end)
+
+
+STRIPPERS = {
+    'JPEG': _strip_jpeg,
+    'PNG': _strip_png,
+    'WEBP': _strip_webp,
+}
+
+
+def strip_metadata(file, image_format):
+    """Return a copy of an uploaded image without its metadata
+
+    ``image_format`` is the Pillow name of the format, as identified from
+    the file's header. Raises ValueError if the file is malformed.
+    """
+    strip = STRIPPERS.get(image_format)
+    if strip is None:
+        return file
+
+    stripped = tempfile.TemporaryFile()
+    file.seek(0)
+    try:
+        strip(file, stripped)
+    except (ValueError, struct.error):
+        stripped.close()
+        raise ValueError(_('Upload a valid image.'))
+    finally:
+        file.seek(0)
+    stripped.seek(0)
+    return File(stripped, name=file.name)
@@ -0,0 +1,145 @@
+"""
+Pagination for the recipe APIs
+"""
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, _reverse_ordering
+
+
+def keyset_after(ordering, values):
+    """Return a filter for the rows after ``values`` in ``ordering``
+
+    With several fields the rows after ``(a, b)`` are those with a
+    greater ``a``, or an equal ``a`` and a greater ``b``. The redundant
+    bound on the first field lets an index on the ordering start its scan
+    at the position.
+    """
+    fields = [(name.lstrip('-'), name.startswith('-')) for name in ordering]
+    after = None
+    for (name, descending), value in reversed(list(zip(fields, values))):
+        beyond = Q(**{f'{name}__{"lt" if descending else "gt"}': value})
+        after = beyond if after is None else (
+            beyond | Q(**{name: value}) & after
+        )
+    if len(fields) == 1:
+        return after
+
+    name, descending = fields[0]
+    start = Q(**{f'{name}__{"lte" if descending else "gte"}': values[0]})
+    return start & after
+
+
+class RecipeCursorPagination(CursorPagination):
+    """Keyset pagination over recipes, newest first
+
+    DRF's cursor holds the first ordering field of the last row and skips
+    rows sharing it with an offset, which grows with every page inside a
+    run of equal values. With several ordering fields, ending with a
+    unique one, the cursor here holds all of them instead, so every page
+    starts where the previous ended.
+    """
+    ordering = '-id'
+    page_size = settings.API_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.API_MAX_PAGE_SIZE
+
+    def get_ordering(self, request, queryset, view):
+        """Use the view's ``get_pagination_ordering()`` when it returns one"""
+        get_view_ordering = getattr(view, 'get_pagination_ordering', None)
+        ordering = get_view_ordering() if get_view_ordering else None
+        if ordering:
+            return tuple(ordering)
+
+        return super().get_ordering(request, queryset, view)
+
+    def _get_position_from_instance(self, instance, ordering):
+        if len(ordering) == 1:
+            return super()._get_position_from_instance(instance, ordering)
+
+        return json.dumps([
+            str(
+                instance[name] if isinstance(instance, dict)
+                else getattr(instance, name)
+            )
+            for name in (field.lstrip('-') for field in ordering)
+        ])
+
+    def _position_values(self, position):
+        """Return the ordering field values a cursor position holds"""
+        if len(self.ordering) == 1:
+            return [position]
+        try:
+            values = json.loads(position)
+        except ValueError:
+            values = None
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return values
+
+    def paginate_queryset(self, queryset, request, view=None):
+        # DRF's, filtering by the whole position
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            (offset, reverse, current_position) = (0, False, None)
+        else:
+            (offset, reverse, current_position) = self.cursor
+
+        ordering = (
+            _reverse_ordering(self.ordering) if reverse else self.ordering
+        )
+        queryset = queryset.order_by(*ordering)
+        if current_position is not None:
+            try:
+                queryset = queryset.filter(keyset_after(
+                    ordering, self._position_values(current_position)
+                ))
+            except (TypeError, ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = list(results[:self.page_size])
+
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(
+                results[-1], self.ordering
+            )
+        else:
+            has_following_position = False
+            following_position = None
+
+        if reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = (current_position is not None) or (offset > 0)
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = (current_position is not None) or (offset > 0)
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+
+class RecipeAttrCursorPagination(RecipeCursorPagination):
+    """Keyset pagination over tags and ingredients, by name"""
+    ordering = ('-name', 'id')
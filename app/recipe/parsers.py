@@ -0,0 +1,34 @@
+"""
+Parsers for the recipe APIs
+"""
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+from core import fastjson
+
+
+class NDJSONParser(BaseParser):
+    """Parse newline delimited JSON lazily, one object per line
+
+    The parsed data is a generator of ``(line number, object)`` pairs, so
+    the body is read from the stream as it is consumed and never held in
+    memory as a whole. Blank lines are skipped.
+    """
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+
+        return self._iter_lines(stream, encoding)
+
+    def _iter_lines(self, stream, encoding):
+        for number, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield number, fastjson.loads(line.decode(encoding))
+            except ValueError as exc:
+                raise ParseError(f'Line {number}: JSON parse error - {exc}')
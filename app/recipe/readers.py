@@ -0,0 +1,148 @@
+"""
+Read-only row readers for the list endpoints
+
+List responses need no validation, so instead of running a serializer
+field per attribute per row they are built from ``values()`` rows, plus
+one query per relation mapping recipe IDs to their linked rows, straight
+into plain dicts. The output is the same as the serializers', which still
+describe the endpoints in the OpenAPI schema and serve the other actions.
+"""
+import functools
+from collections import defaultdict
+
+from rest_framework import serializers
+from rest_framework.response import Response
+
+from core.models import Recipe
+from core.performance import timed_serialization
+from recipe.sparse import RELATIONS
+
+
+# Fields whose representation of a database value is the value itself
+PLAIN_FIELDS = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.IntegerField,
+)
+
+
+@functools.lru_cache(maxsize=None)
+def _converters(serializer_class):
+    """Return the fields of a serializer whose values need converting"""
+    return {
+        name: field.to_representation
+        for name, field in serializer_class().fields.items()
+        if not isinstance(field, PLAIN_FIELDS + (serializers.BaseSerializer,))
+    }
+
+
+def read_rows(rows, serializer_class, names, related=None):
+    """Return the data ``serializer_class`` would return for ``rows``
+
+    ``names`` are the fields to return, in order, and ``related`` maps a
+    relation field to the linked rows of each row's ID.
+    """
+    related = related or {}
+    converters = _converters(serializer_class)
+    plan = [
+        (name, related.get(name), converters.get(name)) for name in names
+    ]
+
+    data = []
+    for row in rows:
+        item = {}
+        for name, links, convert in plan:
+            if links is not None:
+                item[name] = links.get(row['id'], [])
+                continue
+            value = row[name]
+            if convert is not None and value is not None:
+                value = convert(value)
+            item[name] = value
+        data.append(item)
+    return data
+
+
+def related_rows(field, recipe_ids, serializer_class=None):
+    """Map recipe IDs to what they link to through ``field``
+
+    With the serializer of the linked model the rows are the data it would
+    return, otherwise the linked IDs.
+    """
+    m2m = Recipe._meta.get_field(field)
+    recipe_column = m2m.m2m_column_name()
+    links = m2m.remote_field.through.objects.filter(
+        **{f'{recipe_column}__in': recipe_ids}
+    ).order_by('pk')
+
+    related = defaultdict(list)
+    if serializer_class is None:
+        for recipe_id, target_id in links.values_list(
+            recipe_column, m2m.m2m_reverse_name()
+        ):
+            related[recipe_id].append(target_id)
+        return related
+
+    names = list(serializer_class.Meta.fields)
+    target = m2m.m2m_reverse_field_name()
+    rows = list(links.values_list(
+        recipe_column, *(f'{target}__{name}' for name in names)
+    ))
+    items = read_rows(
+        (dict(zip(names, row[1:])) for row in rows),
+        serializer_class,
+        names
+    )
+    for row, item in zip(rows, items):
+        related[row[0]].append(item)
+    return related
+
+
+def read_recipes(rows, serializer_class, fieldset):
+    """Return the data ``serializer_class`` would return for recipe rows"""
+    names = [
+        name for name in serializer_class.Meta.fields
+        if fieldset.includes(name)
+    ]
+    ids = [row['id'] for row in rows]
+    declared = serializer_class._declared_fields
+    related = {
+        field: related_rows(
+            field,
+            ids,
+            type(declared[field].child) if fieldset.expands(field) else None
+        )
+        for field in RELATIONS if fieldset.includes(field)
+    }
+    return read_rows(rows, serializer_class, names, related)
+
+
+class RowListMixin:
+    """List with ``values()`` rows and ``read_rows()``, not the serializer
+
+    Override ``get_row_columns()`` and ``read_page()`` to read more than
+    the serializer's own columns.
+    """
+
+    def get_row_columns(self):
+        return list(self.get_serializer_class().Meta.fields)
+
+    def read_page(self, rows):
+        return read_rows(
+            rows,
+            self.get_serializer_class(),
+            self.get_serializer_class().Meta.fields
+        )
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = queryset.prefetch_related(None).values(
+            *self.get_row_columns()
+        )
+        page = self.paginate_queryset(rows)
+        with timed_serialization():
+            data = self.read_page(list(rows) if page is None else page)
+
+        if page is None:
+            return Response(data)
+        return self.get_paginated_response(data)
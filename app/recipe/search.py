@@ -0,0 +1,111 @@
+"""
+Full-text search over recipes
+
+Each recipe stores a weighted ``tsvector`` of its title (A), tag and
+ingredient names (B) and description (C) in ``Recipe.search_vector``,
+indexed with GIN. The vector is rebuilt in SQL, for a whole set of recipes
+at once, whenever a recipe, one of its tags or ingredients, or the links
+between them change. Inside ``deferred_search_updates()`` those rebuilds
+are collected and run once, when the block ends.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+)
+from django.db.models import F, FloatField, OuterRef, QuerySet, Subquery
+from django.db.models.functions import Cast
+
+from core.models import Recipe
+
+
+_deferred = ContextVar('deferred_search_updates', default=None)
+
+
+def _related_names(field):
+    """Return a subquery of the names related to a recipe through ``field``"""
+    m2m = Recipe._meta.get_field(field)
+    through = m2m.remote_field.through
+    recipe_column = m2m.m2m_field_name()
+    target_column = m2m.m2m_reverse_field_name()
+
+    return Subquery(
+        through.objects.filter(
+            **{recipe_column: OuterRef('pk')}
+        ).values(recipe_column).annotate(
+            names=StringAgg(f'{target_column}__name', ' ')
+        ).values('names')
+    )
+
+
+def search_document():
+    """Return the expression computing the search vector of a recipe"""
+    config = settings.RECIPE_SEARCH_CONFIG
+    return (
+        SearchVector('title', config=config, weight='A')
+        + SearchVector(_related_names('tags'), config=config, weight='B')
+        + SearchVector(
+            _related_names('ingredients'), config=config, weight='B'
+        )
+        + SearchVector('description', config=config, weight='C')
+    )
+
+
+def update_search_vectors(recipes):
+    """Rebuild the search vectors of a queryset or iterable of recipe IDs
+
+    Runs as a single UPDATE, so no model signals are sent. Recipe IDs
+    given inside ``deferred_search_updates()`` are only collected.
+    """
+    if not isinstance(recipes, QuerySet):
+        pending = _deferred.get()
+        if pending is not None:
+            pending.update(recipes)
+            return None
+        recipes = Recipe.objects.filter(pk__in=list(recipes))
+
+    return recipes.update(search_vector=search_document())
+
+
+@contextmanager
+def deferred_search_updates():
+    """Rebuild the search vectors changed in the block in one UPDATE
+
+    Saving a recipe and setting its tags and ingredients each change its
+    vector; this rebuilds it once at the end instead of three times.
+    """
+    if _deferred.get() is not None:
+        yield
+        return
+
+    pending = set()
+    token = _deferred.set(pending)
+    try:
+        yield
+    finally:
+        _deferred.reset(token)
+    if pending:
+        update_search_vectors(pending)
+
+
+def search_recipes(queryset, terms):
+    """Filter ``queryset`` to recipes matching ``terms``, annotating rank
+
+    ``terms`` use the web search syntax: quoted phrases, ``or`` and ``-``
+    to exclude a word.
+    """
+    query = SearchQuery(
+        terms,
+        config=settings.RECIPE_SEARCH_CONFIG,
+        search_type='websearch'
+    )
+    # ts_rank returns a real; as a double precision the value survives the
+    # round trip through the pagination cursor unchanged
+    rank = Cast(SearchRank(F('search_vector'), query), FloatField())
+
+    return queryset.filter(search_vector=query).annotate(search_rank=rank)
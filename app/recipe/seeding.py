@@ -0,0 +1,92 @@
+"""
+Random recipes, tags and ingredients for benchmarks and capacity planning
+"""
+from django.db import connection
+
+from core.models import Recipe, Tag, Ingredient
+from recipe import summary
+from recipe.search import update_search_vectors
+
+
+WORDS = (
+    'apple apricot asparagus avocado bacon banana basil bean beef berry '
+    'bread broccoli butter cabbage carrot cauliflower celery cheese cherry '
+    'chicken chickpea chili chocolate cinnamon coconut cod corn crab cream '
+    'cucumber curry date duck egg eggplant fennel fig garlic ginger grape '
+    'ham honey kale lamb leek lemon lentil lime mango maple melon mint '
+    'mushroom mustard noodle nutmeg oat olive onion orange oyster paprika '
+    'parsley pasta pea peach peanut pear pepper pineapple plum pork potato '
+    'prawn pumpkin quinoa radish raisin rice rosemary saffron sage salmon '
+    'sausage sesame shrimp spinach squash strawberry sugar thyme tofu '
+    'tomato tuna turkey vanilla walnut yogurt zucchini'
+).split()
+STYLES = (
+    'baked braised fried grilled roasted smoked steamed stewed '
+    'soup salad pie tart curry stew bowl'
+).split()
+
+
+def names(words, count):
+    """Return ``count`` distinct names made from ``words``"""
+    result = words[:count]
+    for i in range(len(words), count):
+        result.append(f'{words[i % len(words)]} {i // len(words)}')
+    return result
+
+
+def seed_recipes(rng, user, count, batch_size, tags=None, ingredients=None,
+                 progress=None):
+    """Insert ``count`` random recipes with tags and ingredients for a user
+
+    ``tags`` and ``ingredients`` are the number of each the user gets,
+    by default one per style and word.
+    """
+    tags = Tag.objects.bulk_create(
+        Tag(user=user, name=name)
+        for name in names(STYLES, tags or len(STYLES))
+    )
+    ingredients = Ingredient.objects.bulk_create(
+        Ingredient(user=user, name=name)
+        for name in names(WORDS, ingredients or len(WORDS))
+    )
+    tag_links = Recipe.tags.through
+    ingredient_links = Recipe.ingredients.through
+
+    for start in range(0, count, batch_size):
+        recipes = Recipe.objects.bulk_create(
+            Recipe(
+                user=user,
+                title=' '.join(
+                    rng.sample(WORDS, 2) + rng.sample(STYLES, 1)
+                ).capitalize(),
+                description=' '.join(rng.choices(WORDS, k=12)),
+                time_minutes=rng.randint(5, 240),
+                price=rng.randint(100, 9999) / 100,
+            )
+            for _ in range(min(batch_size, count - start))
+        )
+        tag_links.objects.bulk_create(
+            tag_links(recipe_id=recipe.id, tag_id=tag.id)
+            for recipe in recipes
+            for tag in rng.sample(tags, min(2, len(tags)))
+        )
+        ingredient_links.objects.bulk_create(
+            ingredient_links(
+                recipe_id=recipe.id,
+                ingredient_id=ingredient.id
+            )
+            for recipe in recipes
+            for ingredient in rng.sample(ingredients, min(4, len(ingredients)))
+        )
+        update_search_vectors(recipe.id for recipe in recipes)
+        if progress:
+            progress(start + len(recipes), count)
+    summary.rebuild([user.id])
+
+    with connection.cursor() as cursor:
+        # Move fresh entries out of the GIN pending list, as autovacuum
+        # would, and refresh the planner statistics
+        cursor.execute(
+            "SELECT gin_clean_pending_list('recipe_user_search_idx')"
+        )
+        cursor.execute('ANALYZE core_recipe')
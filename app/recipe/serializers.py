@@ -1,93 +1,184 @@
+from django.core.files.storage import default_storage
+from django.db import transaction
 from rest_framework import serializers
 from core.models import Recipe, Tag, Ingredient
+from core.performance import TimedListSerializer, TimedSerializerMixin
+from recipe import metadata, uploads
+from recipe.search import deferred_search_updates
+from recipe.sparse import SparseFieldsMixin
 
 
-class TagSerializer(serializers.ModelSerializer):
+def bulk_get_or_create(model, user, items):
+    """Return the user's objects matching ``items``, creating missing ones
+
+    Each item is a dict of field values and is matched on all of its
+    fields, like ``get_or_create``. Lookups take one query and all missing
+    objects are inserted with a single ``bulk_create``.
+    """
+    if not items:
+        return []
+
+    by_name = {}
+    for obj in model.objects.filter(
+        user=user,
+        name__in={item['name'] for item in items}
+    ).order_by('id'):
+        by_name.setdefault(obj.name, []).append(obj)
+
+    def find(item):
+        for obj in by_name.get(item['name'], []):
+            if all(getattr(obj, k) == v for k, v in item.items()):
+                return obj
+        return None
+
+    missing = {}
+    for item in items:
+        if find(item) is None:
+            missing.setdefault(tuple(sorted(item.items())), item)
+
+    for obj in model.objects.bulk_create(
+        model(user=user, **item) for item in missing.values()
+    ):
+        by_name.setdefault(obj.name, []).append(obj)
+
+    return [find(item) for item in items]
+
+
+class TagSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Tag
+        list_serializer_class = TimedListSerializer
         fields = ['id', 'name']
         read_only_fields = ['id']
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Ingredient
+        list_serializer_class = TimedListSerializer
         fields = ['id', 'name', 'quantity']
         read_only_fields = ['id']
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(SparseFieldsMixin, TimedSerializerMixin,
+                       serializers.ModelSerializer):
     tags = TagSerializer(many=True, required=False)
     ingredients = IngredientSerializer(many=True, required=False)
 
     class Meta:
         model = Recipe
+        list_serializer_class = TimedListSerializer
         fields = ['id', 'title', 'time_minutes',
                   'price', 'link', 'tags', 'ingredients']
         read_only_fields = ['id']
 
     def _get_or_create_tags(self, recipe, tags):
-        """Handle getting or creating tags as needed"""
+        """Link the recipe to exactly ``tags``, creating missing ones"""
         auth_user = self.context['request'].user
-        for tag in tags:
-            tag_obj, created = Tag.objects.get_or_create(
-                user=auth_user,
-                **tag
-            )
-            recipe.tags.add(tag_obj)
+        recipe.tags.set(bulk_get_or_create(Tag, auth_user, tags))
 
     def _get_or_create_ingredients(self, recipe, ingredients):
-        """Handle getting or creating ingredients as needed"""
+        """Link the recipe to exactly ``ingredients``, creating missing ones"""
         auth_user = self.context['request'].user
-        for ingredient in ingredients:
-            ingredient_obj, created = Ingredient.objects.get_or_create(
-                user=auth_user,
-                **ingredient
-            )
-            recipe.ingredients.add(ingredient_obj)
+        recipe.ingredients.set(
+            bulk_get_or_create(Ingredient, auth_user, ingredients)
+        )
 
+    @transaction.atomic
     def create(self, validated_data):
         """create a new Recipe"""
         tags = validated_data.pop('tags', [])
         ingredients = validated_data.pop('ingredients', [])
-        recipe = Recipe.objects.create(**validated_data)
-        self._get_or_create_tags(recipe, tags)
-        self._get_or_create_ingredients(recipe, ingredients)
+        with deferred_search_updates():
+            recipe = Recipe.objects.create(**validated_data)
+            self._get_or_create_tags(recipe, tags)
+            self._get_or_create_ingredients(recipe, ingredients)
 
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         """update a Recipe"""
         tags = validated_data.pop('tags', None)
         ingredients = validated_data.pop('ingredients', None)
 
-        if tags is not None:
-            instance.tags.clear()
-            self._get_or_create_tags(instance, tags)
+        with deferred_search_updates():
+            if tags is not None:
+                self._get_or_create_tags(instance, tags)
 
-        if ingredients is not None:
-            instance.ingredients.clear()
-            self._get_or_create_ingredients(instance, ingredients)
+            if ingredients is not None:
+                self._get_or_create_ingredients(instance, ingredients)
 
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
 
-        instance.save()
+            instance.save()
         return instance
 
 
 class RecipeDetailSerializer(RecipeSerializer):
+    image_variants = serializers.SerializerMethodField()
 
     class Meta(RecipeSerializer.Meta):
-        fields = RecipeSerializer.Meta.fields + ['description', 'image']
-
-
-class RecipeImageSerializer(serializers.ModelSerializer):
+        fields = RecipeSerializer.Meta.fields + [
+            'description', 'image', 'image_variants'
+        ]
+
+    def get_image_variants(self, recipe) -> dict:
+        """Return the URLs of the resized images that are ready"""
+        request = self.context.get('request')
+        variants = {}
+        for width, formats in recipe.image_variants.items():
+            variants[width] = {}
+            for ext, name in formats.items():
+                url = default_storage.url(name)
+                if request is not None:
+                    url = request.build_absolute_uri(url)
+                variants[width][ext] = url
+        return variants
+
+
+class RecipeImageField(serializers.FileField):
+    """Image field validated from the file header, without decoding it
+
+    The file is stored without its EXIF, XMP and IPTC metadata.
+    """
+
+    def to_internal_value(self, data):
+        file = super().to_internal_value(data)
+        try:
+            image_format, _ = uploads.inspect_image(file)
+            return metadata.strip_metadata(file, image_format)
+        except ValueError as exc:
+            raise serializers.ValidationError(str(exc), code='invalid_image')
+
+
+class RecipeImageSerializer(TimedSerializerMixin,
+                            serializers.ModelSerializer):
     """Serializer for uploading recipe images"""
+    image = RecipeImageField(required=True)
+
     class Meta:
         model = Recipe
         fields = ['image', 'id']
         read_only_fields = ['id']
-        extra_kwargs = {
-            'image': {'required': True}
-        }
+
+
+class RecipeUsageSerializer(serializers.Serializer):
+    """Serializer for the number of recipes linked to a tag or ingredient"""
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    recipes = serializers.IntegerField()
+
+
+class RecipeStatsSerializer(serializers.Serializer):
+    """Serializer for a user's recipe statistics"""
+    recipes = serializers.IntegerField()
+    average_time_minutes = serializers.FloatField(allow_null=True)
+    average_price = serializers.DecimalField(
+        max_digits=15,
+        decimal_places=2,
+        allow_null=True
+    )
+    tags = RecipeUsageSerializer(many=True)
+    ingredients = RecipeUsageSerializer(many=True)
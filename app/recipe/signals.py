@@ -0,0 +1,154 @@
+"""
+Signal handlers for the recipe APIs
+"""
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from core.models import Recipe, Tag, Ingredient
+from recipe import images, summary
+from recipe.cache import catalog_changed
+from recipe.search import update_search_vectors
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_catalog(sender, instance, **kwargs):
+    catalog_changed(instance.user_id)
+
+
+@receiver(post_delete, sender=Recipe)
+def delete_recipe_images(sender, instance, **kwargs):
+    # Files are kept if the deletion is rolled back
+    image, variants = instance.image, instance.image_variants
+
+    def delete():
+        images.delete_variants(variants)
+        if image:
+            image.delete(save=False)
+    transaction.on_commit(delete)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def invalidate_catalog_links(sender, instance, action, **kwargs):
+    if action.startswith('post_'):
+        catalog_changed(instance.user_id)
+
+
+def linked_recipes(instance):
+    """Return the IDs of the recipes linked to a tag or ingredient"""
+    field = 'tags' if isinstance(instance, Tag) else 'ingredients'
+    return list(
+        Recipe.objects.filter(**{field: instance}).values_list('pk', flat=True)
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_search(sender, instance, **kwargs):
+    update_search_vectors([instance.pk])
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def update_renamed_search(sender, instance, created, **kwargs):
+    if not created:
+        update_search_vectors(linked_recipes(instance))
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def collect_deleted_search(sender, instance, **kwargs):
+    # The links are gone by post_delete
+    instance._search_recipe_ids = linked_recipes(instance)
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def update_deleted_search(sender, instance, **kwargs):
+    update_search_vectors(getattr(instance, '_search_recipe_ids', []))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def update_linked_search(sender, instance, action, reverse, pk_set,
+                         **kwargs):
+    if not reverse:
+        if action.startswith('post_'):
+            update_search_vectors([instance.pk])
+    elif action == 'pre_clear':
+        instance._search_recipe_ids = linked_recipes(instance)
+    elif action == 'post_clear':
+        update_search_vectors(instance._search_recipe_ids)
+    elif action.startswith('post_'):
+        update_search_vectors(pk_set)
+
+
+SUMMARY_FIELDS = {
+    Recipe.tags.through: 'tags',
+    Recipe.ingredients.through: 'ingredients',
+}
+
+
+@receiver(pre_save, sender=Recipe)
+def collect_recipe_totals(sender, instance, update_fields, **kwargs):
+    # What the saved recipe adds to its summary until now
+    instance._summary_totals = None
+    if instance._state.adding or (
+        update_fields is not None
+        and not {'user', 'time_minutes', 'price'} & set(update_fields)
+    ):
+        return
+    instance._summary_totals = Recipe.objects.filter(
+        pk=instance.pk
+    ).values_list('user_id', 'time_minutes', 'price').first()
+
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_summary(sender, instance, created, update_fields,
+                          **kwargs):
+    if created:
+        summary.change_recipes(added=[summary.recipe_totals(instance)])
+    elif getattr(instance, '_summary_totals', None):
+        summary.change_recipes(
+            removed=[instance._summary_totals],
+            added=[summary.recipe_totals(instance)]
+        )
+
+
+@receiver(pre_delete, sender=Recipe)
+def update_deleted_summary(sender, instance, **kwargs):
+    # The links are deleted without m2m_changed signals
+    for field in SUMMARY_FIELDS.values():
+        summary.change_links(
+            field, summary.linked_targets(field, instance, False), -1
+        )
+    summary.change_recipes(removed=[summary.recipe_totals(instance)])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def update_linked_summary(sender, instance, action, reverse, pk_set,
+                          **kwargs):
+    field = SUMMARY_FIELDS[sender]
+    if action == 'post_add':
+        summary.change_links(
+            field, [instance.pk] * len(pk_set) if reverse else pk_set
+        )
+    elif action in ('pre_remove', 'pre_clear'):
+        # Only the links that exist are removed
+        instance._summary_targets = summary.linked_targets(
+            field, instance, reverse, pk_set
+        )
+    elif action in ('post_remove', 'post_clear'):
+        summary.change_links(field, instance._summary_targets, -1)
@@ -0,0 +1,80 @@
+"""
+Sparse fieldsets for the recipe APIs
+
+``?fields=id,title`` limits each recipe to the listed fields and
+``?expand=tags`` embeds only the listed relations as full objects, the
+others being returned as lists of IDs. Without ``expand`` every relation
+is embedded, as it is without either parameter. The recipe views read
+the same ``Fieldset`` to load only the columns and relations it needs.
+"""
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+
+# Recipe relations serialized as nested objects
+RELATIONS = ('tags', 'ingredients')
+
+
+def parse_names(value, allowed, param):
+    """Convert a comma separated string of field names to a set"""
+    names = {name.strip() for name in value.split(',')} - {''}
+    unknown = names.difference(allowed)
+    if unknown:
+        raise ValidationError({
+            param: f'Unknown fields: {", ".join(sorted(unknown))}. '
+                   f'Expected any of: {", ".join(allowed)}.'
+        })
+    return names
+
+
+class Fieldset:
+    """The recipe fields a request includes and the relations it expands"""
+
+    def __init__(self, fields, expand=RELATIONS):
+        self.fields = set(fields)
+        self.expand = set(expand)
+
+    @classmethod
+    def from_request(cls, request, serializer_class):
+        """Parse the ``fields`` and ``expand`` query params"""
+        params = request.query_params
+        allowed = list(serializer_class.Meta.fields)
+        fields = allowed
+        if params.get('fields'):
+            fields = parse_names(params['fields'], allowed, 'fields')
+        expand = RELATIONS
+        if 'expand' in params:
+            expand = parse_names(params['expand'], RELATIONS, 'expand')
+        return cls(fields, expand)
+
+    def includes(self, name):
+        return name in self.fields
+
+    def expands(self, name):
+        return name in self.fields and name in self.expand
+
+    def columns(self):
+        """Return the recipe columns the included fields are read from"""
+        return ['id', *sorted(self.fields - {'id', *RELATIONS})]
+
+
+class SparseFieldsMixin:
+    """Serialize only the fields of the ``fieldset`` in the context
+
+    Relations it does not expand are serialized as lists of IDs.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fieldset = self.context.get('fieldset')
+        if fieldset is None:
+            return
+
+        for name in list(self.fields):
+            if not fieldset.includes(name):
+                del self.fields[name]
+            elif name in RELATIONS and not fieldset.expands(name):
+                self.fields[name] = serializers.PrimaryKeyRelatedField(
+                    many=True,
+                    read_only=True
+                )
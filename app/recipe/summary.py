@@ -0,0 +1,209 @@
+"""
+Per-user recipe summaries
+
+``RecipeSummary`` holds the number of recipes of a user and the totals of
+their ``time_minutes`` and ``price``; ``TagSummary`` and
+``IngredientSummary`` the number of recipes linked to each tag and
+ingredient. The signal handlers in recipe.signals add every change to
+them as it is saved, so reading a user's statistics never scans their
+recipes. Bulk inserts send no signals and add their changes themselves.
+
+Only changes that add a recipe or link create missing rows: a user or tag
+being deleted may still lose recipes first. ``rebuild()`` recomputes the
+summaries from the recipes, to repair them.
+"""
+from collections import Counter, defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+
+from core.models import (
+    IngredientSummary,
+    Recipe,
+    RecipeSummary,
+    TagSummary,
+)
+
+
+SUMMARIES = {'tags': TagSummary, 'ingredients': IngredientSummary}
+CENT = Decimal('0.01')
+
+
+def _columns(model):
+    """Return the quoted table, key column and counter columns of a model"""
+    quote = connection.ops.quote_name
+    key, *counters = (quote(f.column) for f in model._meta.concrete_fields)
+    return quote(model._meta.db_table), key, counters
+
+
+def _add(model, deltas):
+    """Add ``deltas``, tuples of amounts by primary key, to the counters
+
+    Rows gaining a recipe are created when missing; the others are only
+    updated. Rows are written in key order, so concurrent writers lock
+    them in the same order.
+    """
+    table, key, counters = _columns(model)
+    upserts, updates = [], []
+    for pk, delta in sorted(deltas.items()):
+        if any(delta):
+            (upserts if delta[0] > 0 else updates).append((pk, *delta))
+
+    row = f'({", ".join(["%s"] * (len(counters) + 1))})'
+    with connection.cursor() as cursor:
+        if upserts:
+            cursor.execute(
+                f'INSERT INTO {table} ({key}, {", ".join(counters)}) '
+                f'VALUES {", ".join([row] * len(upserts))} '
+                f'ON CONFLICT ({key}) DO UPDATE SET '
+                + ', '.join(f'{c} = {table}.{c} + EXCLUDED.{c}'
+                            for c in counters),
+                [value for values in upserts for value in values]
+            )
+        if updates:
+            cursor.execute(
+                f'UPDATE {table} SET '
+                + ', '.join(f'{c} = {table}.{c} + delta.{c}'
+                            for c in counters)
+                + f' FROM (VALUES {", ".join([row] * len(updates))}) '
+                f'AS delta ({key}, {", ".join(counters)}) '
+                f'WHERE {table}.{key} = delta.{key}',
+                [value for values in updates for value in values]
+            )
+
+
+def recipe_totals(recipe):
+    """Return what a recipe adds to its user's summary"""
+    return (
+        recipe.user_id,
+        recipe.time_minutes,
+        Decimal(str(recipe.price)).quantize(CENT),
+    )
+
+
+def change_recipes(removed=(), added=()):
+    """Move the ``recipe_totals()`` of recipes out of and into summaries"""
+    deltas = defaultdict(lambda: [0, 0, Decimal(0)])
+    for sign, totals in ((-1, removed), (1, added)):
+        for user_id, time_minutes, price in totals:
+            delta = deltas[user_id]
+            delta[0] += sign
+            delta[1] += sign * time_minutes
+            delta[2] += sign * price
+    _add(RecipeSummary, deltas)
+
+
+def change_links(field, target_ids, sign=1):
+    """Add recipes linked through ``field`` to the summaries of targets
+
+    ``target_ids`` holds a target ID for every link added, or removed
+    with ``sign=-1``.
+    """
+    _add(SUMMARIES[field], {
+        target_id: (sign * count,)
+        for target_id, count in Counter(target_ids).items()
+    })
+
+
+def linked_targets(field, instance, reverse, pk_set=None):
+    """Return a target ID for each link of ``instance`` through ``field``
+
+    ``instance`` is a recipe, or a target when ``reverse`` is set, and
+    ``pk_set`` limits the links to those with the given recipes or
+    targets. The links are locked until the transaction ends, so a link
+    removed by two transactions at once is only counted out once.
+    """
+    m2m = Recipe._meta.get_field(field)
+    recipe_column = m2m.m2m_column_name()
+    target_column = m2m.m2m_reverse_name()
+    own, other = (
+        (target_column, recipe_column) if reverse
+        else (recipe_column, target_column)
+    )
+
+    links = m2m.remote_field.through.objects.select_for_update().filter(
+        **{own: instance.pk}
+    )
+    if pk_set is not None:
+        links = links.filter(**{f'{other}__in': pk_set})
+    return list(links.values_list(target_column, flat=True))
+
+
+def user_stats(user):
+    """Return the recipe statistics of a user, read from the summaries"""
+    summary = RecipeSummary.objects.filter(user=user).first()
+    count = summary.recipe_count if summary else 0
+    stats = {
+        'recipes': count,
+        'average_time_minutes': None,
+        'average_price': None,
+    }
+    if count > 0:
+        stats['average_time_minutes'] = round(
+            summary.total_time_minutes / count, 2
+        )
+        stats['average_price'] = (summary.total_price / count).quantize(CENT)
+
+    for field, model, target in (
+        ('tags', TagSummary, 'tag'),
+        ('ingredients', IngredientSummary, 'ingredient'),
+    ):
+        stats[field] = list(model.objects.filter(
+            **{f'{target}__user': user},
+            recipe_count__gt=0
+        ).order_by('-recipe_count', f'{target}__name').values(
+            id=F(f'{target}_id'),
+            name=F(f'{target}__name'),
+            recipes=F('recipe_count'),
+        )[:settings.RECIPE_STATS_LIMIT])
+    return stats
+
+
+def rebuild(user_ids=None):
+    """Recompute the summaries of ``user_ids``, or of everyone, from scratch
+
+    Changes made to the recipes of those users while it runs may be lost.
+    Returns the number of summary rows written.
+    """
+    scope, params = '', []
+    if user_ids is not None:
+        scope, params = 'WHERE r.user_id = ANY(%s)', [list(user_ids)]
+    recipes = Recipe._meta.db_table
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        summaries = RecipeSummary.objects.all()
+        tags = TagSummary.objects.all()
+        ingredients = IngredientSummary.objects.all()
+        if user_ids is not None:
+            summaries = summaries.filter(user_id__in=user_ids)
+            tags = tags.filter(tag__user_id__in=user_ids)
+            ingredients = ingredients.filter(
+                ingredient__user_id__in=user_ids
+            )
+        for queryset in (summaries, tags, ingredients):
+            queryset.delete()
+
+        table, key, counters = _columns(RecipeSummary)
+        cursor.execute(
+            f'INSERT INTO {table} ({key}, {", ".join(counters)}) '
+            'SELECT r.user_id, COUNT(*), SUM(r.time_minutes), SUM(r.price) '
+            f'FROM {recipes} r {scope} GROUP BY r.user_id',
+            params
+        )
+        rows = cursor.rowcount
+
+        for field in ('tags', 'ingredients'):
+            m2m = Recipe._meta.get_field(field)
+            table, key, counters = _columns(SUMMARIES[field])
+            cursor.execute(
+                f'INSERT INTO {table} ({key}, {", ".join(counters)}) '
+                f'SELECT l.{m2m.m2m_reverse_name()}, COUNT(*) '
+                f'FROM {m2m.remote_field.through._meta.db_table} l '
+                f'JOIN {recipes} r ON r.id = l.{m2m.m2m_column_name()} '
+                f'{scope} GROUP BY l.{m2m.m2m_reverse_name()}',
+                params
+            )
+            rows += cursor.rowcount
+    return rows
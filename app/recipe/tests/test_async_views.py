@@ -0,0 +1,144 @@
+"""
+Tests for the async variants of the recipe endpoints
+"""
+import importlib.util
+import json
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import (
+    AsyncRequestFactory,
+    SimpleTestCase,
+    TestCase,
+    override_settings,
+)
+from django.urls import resolve, reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+
+from core.models import Recipe, Tag
+from recipe import async_views
+from user import authentication
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+def detail_url(recipe_id):
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+# Run the views on the test's thread, which holds its transaction
+@override_settings(ASYNC_DB_THREADS=0)
+class AsyncViewTests(TestCase):
+    """Test the async views serve the same responses as the sync ones"""
+    def setUp(self):
+        cache.clear()
+        authentication.local_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='goodpass'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title='Recipe',
+            time_minutes=10,
+            price=Decimal('5.00')
+        )
+        Tag.objects.create(user=self.user, name='Vegan')
+        self.factory = AsyncRequestFactory()
+
+    def get(self, path):
+        """Build an authenticated GET request"""
+        return self.factory.get(
+            path,
+            authorization=f'Token {self.token.key}'
+        )
+
+    async def test_recipe_list(self):
+        """Test listing recipes"""
+        response = await async_views.recipe_list(
+            self.get(RECIPES_URL)
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = json.loads(response.content)['results']
+        self.assertEqual([r['id'] for r in results], [self.recipe.id])
+
+    async def test_recipe_retrieve(self):
+        """Test retrieving a recipe"""
+        response = await async_views.recipe_detail(
+            self.get(detail_url(self.recipe.id)),
+            pk=str(self.recipe.id)
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(response.content)['title'], 'Recipe')
+
+    async def test_tag_list(self):
+        """Test listing tags"""
+        response = await async_views.tag_list(self.get(TAGS_URL))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = json.loads(response.content)['results']
+        self.assertEqual([t['name'] for t in results], ['Vegan'])
+
+    async def test_unauthenticated_rejected(self):
+        """Test the async views still require authentication"""
+        response = await async_views.recipe_list(
+            self.factory.get(RECIPES_URL)
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_writes_served_by_sync_view(self):
+        """Test writes run the sync view, not on the database threads"""
+        request = self.factory.patch(
+            detail_url(self.recipe.id),
+            {'title': 'Renamed'},
+            content_type='application/json',
+            authorization=f'Token {self.token.key}'
+        )
+
+        with patch.object(async_views, 'run_in_db_thread') as run:
+            response = await async_views.recipe_detail(
+                request,
+                pk=str(self.recipe.id)
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(response.content)['title'], 'Renamed')
+        run.assert_not_called()
+
+
+@override_settings(RECIPE_ASYNC_VIEWS=True)
+class AsyncURLTests(SimpleTestCase):
+    """Test the routes of the recipe URLs with the async views"""
+    def setUp(self):
+        # A fresh copy of recipe.urls, built with the async views
+        spec = importlib.util.find_spec('recipe.urls')
+        self.urlconf = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(self.urlconf)
+
+    def test_reads_served_by_async_views(self):
+        """Test the list and detail routes resolve to the async views"""
+        self.assertIs(
+            resolve('/recipes/', self.urlconf).func,
+            async_views.recipe_list
+        )
+        self.assertIs(
+            resolve('/recipes/1/', self.urlconf).func,
+            async_views.recipe_detail
+        )
+
+    def test_list_actions_not_shadowed(self):
+        """Test the recipe list actions still reach the router's views"""
+        for action in ('stats', 'export', 'import'):
+            with self.subTest(action):
+                match = resolve(f'/recipes/{action}/', self.urlconf)
+                self.assertEqual(match.url_name, f'recipe-{action}')
@@ -0,0 +1,126 @@
+"""
+Tests for the tag and ingredient autocomplete
+"""
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Tag, Ingredient
+from recipe import autocomplete
+from recipe.cache import bump_catalog_version
+
+
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+
+
+def create_user(email='user@example.com', password='goodpass'):
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+class AutocompleteTests(TestCase):
+    """Test the ``q`` parameter of the tag and ingredient lists"""
+    def setUp(self):
+        cache.clear()
+        autocomplete.local_cache.clear()
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def suggest(self, url, terms, **params):
+        """Return the names suggested for ``terms``"""
+        res = self.client.get(url, {'q': terms, **params})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [item['name'] for item in res.data]
+
+    def test_prefix_matches_first(self):
+        """Test names starting with the input rank above other matches"""
+        for name in ['Cherry tomatoes', 'Tomato', 'Potato', 'Tofu']:
+            Tag.objects.create(user=self.user, name=name)
+
+        self.assertEqual(
+            self.suggest(TAGS_URL, 'tom'),
+            ['Tomato', 'Cherry tomatoes']
+        )
+
+    def test_fuzzy_match(self):
+        """Test misspelled input still finds the name"""
+        Ingredient.objects.create(user=self.user, name='Cinnamon')
+        Ingredient.objects.create(user=self.user, name='Salt')
+
+        self.assertEqual(
+            self.suggest(INGREDIENTS_URL, 'cinamon'),
+            ['Cinnamon']
+        )
+
+    def test_short_input_prefix_only(self):
+        """Test input too short for trigrams matches by prefix"""
+        Tag.objects.create(user=self.user, name='Vegan')
+        Tag.objects.create(user=self.user, name='Lunch')
+
+        self.assertEqual(self.suggest(TAGS_URL, 'v'), ['Vegan'])
+
+    def test_top_matches_unpaginated(self):
+        """Test only the best matches are returned, as a plain list"""
+        for number in range(15):
+            Tag.objects.create(user=self.user, name=f'Dinner {number}')
+
+        with self.settings(RECIPE_AUTOCOMPLETE_LIMIT=5):
+            names = self.suggest(TAGS_URL, 'dinner')
+
+        self.assertEqual(len(names), 5)
+
+    def test_limited_to_user(self):
+        """Test other users' names are never suggested"""
+        Tag.objects.create(
+            user=create_user(email='other@example.com'),
+            name='Breakfast'
+        )
+
+        self.assertEqual(self.suggest(TAGS_URL, 'breakfast'), [])
+
+    def test_assigned_only(self):
+        """Test autocomplete respects ``assigned_only``"""
+        Tag.objects.create(user=self.user, name='Dessert')
+
+        self.assertEqual(
+            self.suggest(TAGS_URL, 'dessert', assigned_only=1),
+            []
+        )
+
+    @patch.object(autocomplete.local_cache, 'ttl', 60)
+    def test_hot_prefix_cached(self):
+        """Test repeated input is served from memory until data changes"""
+        Tag.objects.create(user=self.user, name='Spicy')
+        self.suggest(TAGS_URL, 'spi')
+
+        with CaptureQueriesContext(connection) as ctx:
+            names = self.suggest(TAGS_URL, 'spi')
+
+        self.assertEqual(names, ['Spicy'])
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+        Tag.objects.create(user=self.user, name='Spinach')
+        self.assertEqual(self.suggest(TAGS_URL, 'spi'), ['Spicy', 'Spinach'])
+
+    @patch.object(autocomplete.local_cache, 'ttl', 60)
+    def test_cached_until_shared_version_bumped(self):
+        """Test a version bumped by another worker refreshes the results"""
+        Tag.objects.create(user=self.user, name='Spicy')
+        self.suggest(TAGS_URL, 'spi')
+        # Written without signals, as if by another worker, which bumps
+        # the version in the shared cache only
+        Tag.objects.bulk_create([Tag(user=self.user, name='Spinach')])
+        self.assertEqual(self.suggest(TAGS_URL, 'spi'), ['Spicy'])
+
+        bump_catalog_version(self.user.id)
+
+        self.assertEqual(self.suggest(TAGS_URL, 'spi'), ['Spicy', 'Spinach'])
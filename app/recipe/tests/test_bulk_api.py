@@ -0,0 +1,184 @@
+"""
+Tests for the bulk recipe import and export APIs
+"""
+import json
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+
+from recipe.serializers import RecipeDetailSerializer
+
+
+IMPORT_URL = reverse('recipe:recipe-import')
+EXPORT_URL = reverse('recipe:recipe-export')
+
+
+def create_user(email='user@example.com', password='goodpass'):
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def to_ndjson(rows):
+    """Encode a list of objects as newline delimited JSON"""
+    return '\n'.join(json.dumps(row) for row in rows) + '\n'
+
+
+def recipe_payload(index, **params):
+    payload = {
+        'title': f'Recipe {index}',
+        'time_minutes': 10,
+        'price': '5.50',
+        'tags': [{'name': 'Dinner'}, {'name': f'Tag {index}'}],
+        'ingredients': [{'name': 'Salt'}],
+    }
+    payload.update(params)
+    return payload
+
+
+class PublicBulkAPITests(TestCase):
+    """Test unauthenticated bulk requests"""
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_auth_required(self):
+        res = self.client.get(EXPORT_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateBulkAPITests(TestCase):
+    """Test authorized bulk requests"""
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(self.user)
+
+    def post_ndjson(self, body):
+        return self.client.post(
+            IMPORT_URL,
+            body,
+            content_type='application/x-ndjson'
+        )
+
+    def test_import_recipes(self):
+        """Test importing recipes with nested tags and ingredients"""
+        salt = Ingredient.objects.create(user=self.user, name='Salt')
+        rows = [recipe_payload(i) for i in range(3)]
+
+        res = self.post_ndjson(to_ndjson(rows))
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data, {'created': 3})
+        recipes = Recipe.objects.filter(user=self.user)
+        self.assertEqual(recipes.count(), 3)
+        self.assertEqual(Tag.objects.filter(name='Dinner').count(), 1)
+        self.assertEqual(Ingredient.objects.filter(name='Salt').count(), 1)
+        for recipe in recipes:
+            self.assertEqual(recipe.tags.count(), 2)
+            self.assertEqual(list(recipe.ingredients.all()), [salt])
+
+    def test_import_query_count_constant(self):
+        """Test a chunk is inserted with a fixed number of queries"""
+        def count(rows):
+            with CaptureQueriesContext(connection) as ctx:
+                self.post_ndjson(to_ndjson(rows))
+            return len(ctx.captured_queries)
+
+        def rows(indexes):
+            return [
+                recipe_payload(i, ingredients=[{'name': f'Ing {i}'}])
+                for i in indexes
+            ]
+
+        small = count(rows([0]))
+        large = count(rows(range(1, 40)))
+
+        self.assertEqual(small, large)
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 40)
+
+    def test_import_invalid_row_rolls_back(self):
+        """Test an invalid row reports its line and creates nothing"""
+        rows = [recipe_payload(0), recipe_payload(1, time_minutes='soon')]
+
+        res = self.post_ndjson(to_ndjson(rows))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data['errors'][0]['line'], 2)
+        self.assertIn('time_minutes', res.data['errors'][0]['errors'])
+        self.assertFalse(Recipe.objects.exists())
+        self.assertFalse(Tag.objects.exists())
+
+    def test_import_malformed_json(self):
+        """Test a line that is not JSON is rejected"""
+        body = to_ndjson([recipe_payload(0)]) + '{not json\n'
+
+        res = self.post_ndjson(body)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_export_recipes(self):
+        """Test exporting streams the user's recipes one per line"""
+        other_user = create_user(email='other@example.com')
+        Recipe.objects.create(
+            user=other_user,
+            title='Other',
+            time_minutes=5,
+            price=Decimal('1.00')
+        )
+        recipes = [
+            Recipe.objects.create(
+                user=self.user,
+                title=f'Recipe {i}',
+                time_minutes=5,
+                price=Decimal('1.00')
+            )
+            for i in range(2)
+        ]
+        recipes[0].tags.add(Tag.objects.create(user=self.user, name='Tag'))
+
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(res.streaming_content).decode().splitlines()
+        expected = RecipeDetailSerializer(
+            reversed(recipes),
+            many=True,
+            context={'request': res.wsgi_request}
+        ).data
+        self.assertEqual([json.loads(line) for line in lines], [
+            json.loads(json.dumps(data)) for data in expected
+        ])
+
+    def test_export_read_in_view_with_async_views(self):
+        """Test the export is read before the view returns under ASGI"""
+        self.post_ndjson(to_ndjson([recipe_payload(i) for i in range(2)]))
+
+        with override_settings(RECIPE_ASYNC_VIEWS=True):
+            res = self.client.get(EXPORT_URL)
+        with self.assertNumQueries(0):
+            lines = b''.join(res.streaming_content).decode().splitlines()
+
+        self.assertEqual(
+            [json.loads(line)['title'] for line in lines],
+            ['Recipe 1', 'Recipe 0']
+        )
+
+    def test_export_then_import_round_trip(self):
+        """Test exported recipes can be imported again"""
+        self.post_ndjson(to_ndjson([recipe_payload(i) for i in range(2)]))
+        res = self.client.get(EXPORT_URL)
+        body = b''.join(res.streaming_content).decode()
+
+        res = self.post_ndjson(body)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 4)
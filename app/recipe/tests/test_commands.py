@@ -0,0 +1,246 @@
+"""
+Tests for the recipe management commands
+"""
+import json
+import os
+import tempfile
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase
+
+from core.models import Recipe, RecipeSummary, Tag, Ingredient
+
+
+class ExplainQueriesCommandTests(TestCase):
+    """Test the explain_queries command"""
+
+    def test_explain_queries_uses_indexes(self):
+        """Test every list query uses its expected index"""
+        user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='goodpass'
+        )
+        recipe = Recipe.objects.create(
+            user=user,
+            title='Recipe',
+            time_minutes=10,
+            price=Decimal('5.00')
+        )
+        recipe.tags.add(Tag.objects.create(user=user, name='Tag'))
+        recipe.ingredients.add(
+            Ingredient.objects.create(user=user, name='Ingredient')
+        )
+        # Enough rows that reading them in order beats sorting them, planned
+        # from this data rather than statistics left by other tests
+        recipe.tags.add(*Tag.objects.bulk_create(
+            Tag(user=user, name=f'Tag {i}') for i in range(300)
+        ))
+        recipe.ingredients.add(*Ingredient.objects.bulk_create(
+            Ingredient(user=user, name=f'Ingredient {i}') for i in range(300)
+        ))
+        other = get_user_model().objects.create_user(email='o@example.com')
+        Recipe.objects.bulk_create(
+            Recipe(
+                user=user if i % 10 == 0 else other,
+                title=f'Recipe {i}',
+                time_minutes=i % 240,
+                price=Decimal(i % 100)
+            )
+            for i in range(3000)
+        )
+        with connection.cursor() as cursor:
+            for model in (
+                Recipe,
+                Tag,
+                Ingredient,
+                Recipe.tags.through,
+                Recipe.ingredients.through,
+            ):
+                cursor.execute(f'ANALYZE {model._meta.db_table}')
+        out = StringIO()
+
+        call_command(
+            'explain_queries',
+            '--no-seqscan',
+            '--strict',
+            email=user.email,
+            stdout=out
+        )
+
+        self.assertIn('recipe-list: uses recipe_user_id_idx', out.getvalue())
+        self.assertIn('tag-list: uses tag_user_name_idx', out.getvalue())
+        self.assertIn('recipe-list?search: uses', out.getvalue())
+        self.assertIn(
+            'recipe-list?tags: uses recipe_tags_tag_recipe_idx',
+            out.getvalue()
+        )
+        self.assertIn(
+            'recipe-list?ingredients: uses recipe_ingr_ingr_recipe_idx',
+            out.getvalue()
+        )
+        self.assertIn('tag-list?assigned_only links: uses', out.getvalue())
+
+    def test_explain_queries_without_users(self):
+        """Test the command fails when there is no user"""
+        with self.assertRaises(CommandError):
+            call_command('explain_queries', stdout=StringIO())
+
+
+class BenchSearchCommandTests(TestCase):
+    """Test the bench_search command"""
+
+    def test_bench_search_rolls_back(self):
+        """Test the benchmark reports timings and removes its data"""
+        out = StringIO()
+
+        call_command(
+            'bench_search',
+            recipes=50,
+            users=3,
+            queries=5,
+            stdout=out
+        )
+
+        self.assertIn('search over 17 of 50 recipes: n=5', out.getvalue())
+        self.assertFalse(Recipe.objects.exists())
+        self.assertFalse(get_user_model().objects.exists())
+
+
+class BenchSerializationCommandTests(TestCase):
+    """Test the bench_serialization command"""
+
+    def test_bench_serialization_rolls_back(self):
+        """Test every stage is timed and the recipes are removed"""
+        out = StringIO()
+
+        call_command(
+            'bench_serialization',
+            recipes=20,
+            repeat=2,
+            warmup=0,
+            stdout=out
+        )
+
+        output = out.getvalue()
+        self.assertIn('20 recipes', output)
+        for stage in ('serialize', 'read rows', 'list models', 'list rows',
+                      'render drf', 'render fast', 'parse drf', 'parse fast'):
+            self.assertIn(f'{stage}: n=2', output)
+        self.assertFalse(Recipe.objects.exists())
+
+
+class RebuildRecipeSummariesCommandTests(TestCase):
+    """Test the rebuild_recipe_summaries command"""
+
+    def test_rebuild_repairs_summaries(self):
+        """Test drifted summaries are recomputed from the recipes"""
+        user = get_user_model().objects.create_user(email='user@example.com')
+        Recipe.objects.create(
+            user=user,
+            title='Recipe',
+            time_minutes=10,
+            price=Decimal('5.00')
+        )
+        RecipeSummary.objects.update(recipe_count=7, total_time_minutes=0)
+        out = StringIO()
+
+        call_command(
+            'rebuild_recipe_summaries',
+            email=['user@example.com'],
+            stdout=out
+        )
+
+        self.assertIn('Rebuilt 1 summary rows', out.getvalue())
+        self.assertEqual(
+            RecipeSummary.objects.values_list(
+                'recipe_count', 'total_time_minutes', 'total_price'
+            ).get(user=user),
+            (1, 10, Decimal('5.00'))
+        )
+
+    def test_unknown_user(self):
+        """Test an unknown email is an error"""
+        with self.assertRaisesMessage(CommandError, 'No user x@example.com'):
+            call_command('rebuild_recipe_summaries', email=['x@example.com'])
+
+
+class BenchApiCommandTests(TestCase):
+    """Test the bench_api command"""
+
+    def bench(self, **options):
+        out = StringIO()
+        call_command(
+            'bench_api',
+            users=2,
+            recipes=5,
+            tags=3,
+            ingredients=4,
+            requests=3,
+            warmup=1,
+            stdout=out,
+            **options
+        )
+        return out.getvalue()
+
+    def test_bench_api_saves_results(self):
+        """Test every scenario is timed, saved and rolled back"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'results.json')
+
+            out = self.bench(output=path, label='abc123')
+
+            with open(path) as results_file:
+                report = json.load(results_file)
+
+        self.assertEqual(report['label'], 'abc123')
+        self.assertEqual(report['dataset']['users'], 2)
+        for scenario in ('token', 'recipe-create', 'image-upload'):
+            self.assertIn(f'{scenario}: n=3', out)
+            self.assertEqual(report['results'][scenario]['count'], 3)
+            self.assertIn('queries', report['results'][scenario])
+        self.assertFalse(Recipe.objects.exists())
+        self.assertFalse(get_user_model().objects.exists())
+
+    def test_bench_api_bypasses_response_cache(self):
+        """Test only the cached scenario is served from the response cache"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'results.json')
+
+            out = self.bench(
+                scenario=['recipe-list', 'recipe-list-cached'],
+                output=path
+            )
+
+            with open(path) as results_file:
+                results = json.load(results_file)['results']
+
+        self.assertIn('recipe-list-cached: n=3', out)
+        # Every list request queries the recipes, cached ones only when
+        # they are the first of their user
+        self.assertGreaterEqual(results['recipe-list']['queries'], 3)
+        self.assertLess(
+            results['recipe-list-cached']['queries'],
+            results['recipe-list']['queries']
+        )
+
+    def test_bench_api_reports_regressions(self):
+        """Test a slower run than the baseline fails the comparison"""
+        baseline = {
+            'dataset': {},
+            'results': {
+                'tag-list': {
+                    'p50': 0.001, 'p95': 0.001, 'queries': 0,
+                },
+            },
+        }
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as file:
+            json.dump(baseline, file)
+            file.flush()
+
+            with self.assertRaisesMessage(CommandError, 'tag-list'):
+                self.bench(scenario=['tag-list'], compare=file.name)
@@ -9,6 +9,7 @@ from rest_framework.test import APIClient
 
 
 from core.models import Ingredient, Recipe
+from core.tests.utils import strict_queries
 from recipe.serializers import IngredientSerializer
 
 INGREDIENTS_URL = reverse('recipe:ingredient-list')
@@ -43,6 +44,7 @@ class PublicIngredientAPITest(TestCase):
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
+@strict_queries
 class PrivateIngredientAPITest(TestCase):
     """Test priviate available ingredient api"""
     def setUp(self):
@@ -60,7 +62,7 @@ class PrivateIngredientAPITest(TestCase):
         serializer = IngredientSerializer(ingredients, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_ingredient_limited_to_user(self):
         """Test retrieving a list of ingredients of a given user"""
@@ -72,9 +74,9 @@ class PrivateIngredientAPITest(TestCase):
         res = self.client.get(INGREDIENTS_URL)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]['name'], ingredient.name)
-        self.assertEqual(res.data[0]['id'], ingredient.id)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['name'], ingredient.name)
+        self.assertEqual(res.data['results'][0]['id'], ingredient.id)
 
     def test_update_ingredient(self):
         """Test updating an existing ingredient."""
@@ -123,8 +125,8 @@ class PrivateIngredientAPITest(TestCase):
         s2 = IngredientSerializer(ing2)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertIn(s1.data, res.data)
-        self.assertNotIn(s2.data, res.data)
+        self.assertIn(s1.data, res.data['results'])
+        self.assertNotIn(s2.data, res.data['results'])
 
     def test_filterd_ingredients_unique(self):
         """Test filtred ingredients return unique list"""
@@ -153,4 +155,4 @@ class PrivateIngredientAPITest(TestCase):
             'assigned_only': 1
         })
 
-        self.assertEqual(len(res.data), 1)
+        self.assertEqual(len(res.data['results']), 1)
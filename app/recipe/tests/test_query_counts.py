@@ -0,0 +1,165 @@
+"""
+Query count regression tests for the recipe API
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+from core.tests.utils import strict_queries
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+
+
+def detail_url(recipe_id):
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def create_user(email='user@example.com', password='goodpass'):
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+@strict_queries
+class QueryCountTests(TestCase):
+    """Test the number of queries does not grow with the number of rows"""
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='Shared tag')
+        self.ingredient = Ingredient.objects.create(
+            user=self.user,
+            name='Shared ingredient'
+        )
+
+    def add_recipes(self, count):
+        """Create recipes linked to their own and to shared tags/ingredients"""
+        recipes = []
+        for i in range(count):
+            recipe = Recipe.objects.create(
+                user=self.user,
+                title=f'Recipe {i}',
+                time_minutes=10,
+                price=Decimal('5.50'),
+            )
+            recipe.tags.add(
+                self.tag,
+                Tag.objects.create(user=self.user, name=f'Tag {i}')
+            )
+            recipe.ingredients.add(
+                self.ingredient,
+                Ingredient.objects.create(user=self.user, name=f'Ing {i}')
+            )
+            recipes.append(recipe)
+        return recipes
+
+    def count_queries(self, method, url, *args, **kwargs):
+        """Return the number of queries used by a request"""
+        with CaptureQueriesContext(connection) as ctx:
+            res = getattr(self.client, method)(url, *args, **kwargs)
+        self.assertLess(res.status_code, 400)
+        return len(ctx.captured_queries)
+
+    def assertStableQueryCount(self, url, params=None):
+        """Assert a GET uses the same number of queries for 1 and 10 rows"""
+        self.add_recipes(1)
+        small = self.count_queries('get', url, params)
+        self.add_recipes(9)
+        large = self.count_queries('get', url, params)
+
+        self.assertEqual(small, large)
+
+    def test_recipe_list_query_count(self):
+        """Test listing recipes prefetches tags and ingredients"""
+        self.assertStableQueryCount(RECIPES_URL)
+
+    def test_recipe_list_filtered_query_count(self):
+        """Test filtering recipes does not add queries per row"""
+        self.assertStableQueryCount(RECIPES_URL, {
+            'tags': str(self.tag.id),
+            'ingredients': str(self.ingredient.id),
+        })
+
+    def test_recipe_detail_query_count(self):
+        """Test retrieving a recipe does not grow with its relations"""
+        recipe = self.add_recipes(1)[0]
+        small = self.count_queries('get', detail_url(recipe.id))
+        recipe.tags.add(*[
+            Tag.objects.create(user=self.user, name=f'Extra {i}')
+            for i in range(5)
+        ])
+        large = self.count_queries('get', detail_url(recipe.id))
+
+        self.assertEqual(small, large)
+
+    def test_recipe_update_query_count(self):
+        """Test updating a recipe does not add queries per relation"""
+        recipe = self.add_recipes(1)[0]
+        small = self.count_queries(
+            'patch', detail_url(recipe.id), {'title': 'New'}, format='json'
+        )
+        recipe.ingredients.add(*[
+            Ingredient.objects.create(user=self.user, name=f'Extra {i}')
+            for i in range(5)
+        ])
+        large = self.count_queries(
+            'patch', detail_url(recipe.id), {'title': 'New'}, format='json'
+        )
+
+        self.assertEqual(small, large)
+
+    def test_recipe_create_query_count(self):
+        """Test creating a recipe batches its nested tags and ingredients"""
+        def payload(count):
+            return {
+                'title': 'Recipe',
+                'time_minutes': 10,
+                'price': Decimal('5.50'),
+                'tags': [{'name': f'Tag {i}'} for i in range(count)],
+                'ingredients': [{'name': f'Ing {i}'} for i in range(count)],
+            }
+
+        small = self.count_queries(
+            'post', RECIPES_URL, payload(1), format='json'
+        )
+        large = self.count_queries(
+            'post', RECIPES_URL, payload(30), format='json'
+        )
+
+        self.assertEqual(small, large)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 31)
+
+    def test_recipe_update_nested_query_count(self):
+        """Test replacing nested tags writes only the difference"""
+        recipe = self.add_recipes(1)[0]
+        small = self.count_queries('patch', detail_url(recipe.id), {
+            'tags': [{'name': 'Shared tag'}, {'name': 'New 0'}],
+        }, format='json')
+        large = self.count_queries('patch', detail_url(recipe.id), {
+            'tags': [{'name': f'New {i}'} for i in range(20)],
+        }, format='json')
+
+        self.assertEqual(small, large)
+        self.assertEqual(
+            set(recipe.tags.values_list('name', flat=True)),
+            {f'New {i}' for i in range(20)}
+        )
+
+    def test_tag_list_query_count(self):
+        """Test listing tags uses a fixed number of queries"""
+        self.assertStableQueryCount(TAGS_URL)
+        self.assertStableQueryCount(TAGS_URL, {'assigned_only': 1})
+
+    def test_ingredient_list_query_count(self):
+        """Test listing ingredients uses a fixed number of queries"""
+        self.assertStableQueryCount(INGREDIENTS_URL)
+        self.assertStableQueryCount(INGREDIENTS_URL, {'assigned_only': 1})
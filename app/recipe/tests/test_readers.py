@@ -0,0 +1,132 @@
+"""
+Tests for the row readers of the list endpoints
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import fastjson
+from core.models import Recipe, Tag, Ingredient
+from core.tests.utils import strict_queries
+from recipe import readers, views
+from recipe.serializers import (
+    IngredientSerializer,
+    RecipeSerializer,
+    TagSerializer,
+)
+from recipe.sparse import Fieldset
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+
+
+@strict_queries
+class RowReaderTests(TestCase):
+    """Test list responses read from rows match the serializers"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='goodpass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        tags = [
+            Tag.objects.create(user=self.user, name=name)
+            for name in ('Vegan', 'Dessert')
+        ]
+        ingredients = [
+            Ingredient.objects.create(user=self.user, name=name, quantity=q)
+            for name, q in (('Salt', '1 tsp'), ('Sugar', ''))
+        ]
+        for i in range(3):
+            recipe = Recipe.objects.create(
+                user=self.user,
+                title=f'Recipe {i}',
+                time_minutes=10 + i,
+                price=Decimal('5') + i,
+                link='' if i else 'https://example.com/r',
+            )
+            # One at a time: set() links in the hash order of the IDs,
+            # and the readers list links in the order they were made
+            for tag in tags[:i]:
+                recipe.tags.add(tag)
+            for ingredient in ingredients[i % 2:]:
+                recipe.ingredients.add(ingredient)
+        Recipe.objects.create(
+            user=get_user_model().objects.create_user(
+                email='other@example.com'
+            ),
+            title='Other',
+            time_minutes=5,
+            price=Decimal('1.00')
+        )
+
+    def assertSameJSON(self, data, expected):
+        self.assertEqual(fastjson.dumps(data), fastjson.dumps(expected))
+
+    def test_recipe_list(self):
+        """Test recipes are read exactly as RecipeSerializer writes them"""
+        res = self.client.get(RECIPES_URL)
+
+        recipes = Recipe.objects.filter(user=self.user).order_by(
+            '-id'
+        ).prefetch_related(*views.recipe_prefetches())
+        self.assertSameJSON(
+            res.data['results'],
+            RecipeSerializer(recipes, many=True).data
+        )
+        self.assertEqual(res.data['results'][0]['price'], '7.00')
+
+    def test_sparse_recipe_rows(self):
+        """Test rows honour the fieldset"""
+        rows = Recipe.objects.filter(user=self.user).order_by('-id').values(
+            'id', 'title'
+        )
+        fieldset = Fieldset(['title', 'tags'], expand=[])
+
+        data = readers.read_recipes(list(rows), RecipeSerializer, fieldset)
+
+        recipe = Recipe.objects.get(user=self.user, title='Recipe 2')
+        self.assertEqual(data[0], {
+            'title': 'Recipe 2',
+            'tags': sorted(tag.id for tag in recipe.tags.all()),
+        })
+
+    def test_attribute_lists(self):
+        """Test tags and ingredients are read as their serializers write"""
+        for url, model, serializer_class in (
+            (TAGS_URL, Tag, TagSerializer),
+            (INGREDIENTS_URL, Ingredient, IngredientSerializer),
+        ):
+            with self.subTest(url=url):
+                res = self.client.get(url)
+
+                objects = model.objects.filter(user=self.user).order_by(
+                    '-name', 'id'
+                )
+                self.assertSameJSON(
+                    res.data['results'],
+                    serializer_class(objects, many=True).data
+                )
+
+    def test_search_pages(self):
+        """Test search results are paginated by rank from rows"""
+        res = self.client.get(RECIPES_URL, {'search': 'recipe',
+                                            'page_size': 2})
+        second = self.client.get(res.data['next'])
+
+        titles = [
+            recipe['title']
+            for recipe in res.data['results'] + second.data['results']
+        ]
+        self.assertEqual(
+            sorted(titles),
+            ['Recipe 0', 'Recipe 1', 'Recipe 2']
+        )
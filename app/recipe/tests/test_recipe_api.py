@@ -1,17 +1,25 @@
 from decimal import Decimal
+from io import BytesIO
 import tempfile
 import os
-from PIL import Image
+from unittest.mock import patch
+from PIL import Image, ImageFile, ImageOps, PngImagePlugin
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
 from core.models import Recipe, Tag, Ingredient
+from core.tests.utils import strict_queries
 
+from recipe import images
 from recipe.serializers import (
     RecipeSerializer,
     RecipeDetailSerializer
@@ -58,6 +66,7 @@ class PublicRecipeAPITests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
+@strict_queries
 class PrivateRecipeAPITests(TestCase):
     """ test authorized API requests"""
     def setUp(self):
@@ -79,7 +88,7 @@ class PrivateRecipeAPITests(TestCase):
         serializer = RecipeSerializer(recipes, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_recipe_list_limited_to_user(self):
         """test list of recipes is limited to authenticated user"""
@@ -96,7 +105,7 @@ class PrivateRecipeAPITests(TestCase):
         serializer = RecipeSerializer(recipes, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_get_recipe_details(self):
         recipe = create_recipe(user=self.user)
@@ -392,9 +401,9 @@ class PrivateRecipeAPITests(TestCase):
         s2 = RecipeSerializer(r2)
         s3 = RecipeSerializer(r3)
 
-        self.assertIn(s1.data, res.data)
-        self.assertIn(s2.data, res.data)
-        self.assertNotIn(s3.data, res.data)
+        self.assertIn(s1.data, res.data['results'])
+        self.assertIn(s2.data, res.data['results'])
+        self.assertNotIn(s3.data, res.data['results'])
 
     def test_recipe_filter_by_ingredients(self):
         """Test filter recipe by ingredients"""
@@ -414,11 +423,171 @@ class PrivateRecipeAPITests(TestCase):
         s2 = RecipeSerializer(r2)
         s3 = RecipeSerializer(r3)
 
-        self.assertIn(s1.data, res.data)
-        self.assertIn(s2.data, res.data)
-        self.assertNotIn(s3.data, res.data)
+        self.assertIn(s1.data, res.data['results'])
+        self.assertIn(s2.data, res.data['results'])
+        self.assertNotIn(s3.data, res.data['results'])
+
+    def test_filter_recipe_by_all_tags(self):
+        """Test filtering recipes having all of the given tags"""
+        t1 = Tag.objects.create(user=self.user, name='tag 1')
+        t2 = Tag.objects.create(user=self.user, name='tag 2')
+        r1 = create_recipe(user=self.user)
+        r1.tags.add(t1, t2)
+        r2 = create_recipe(user=self.user)
+        r2.tags.add(t1)
+
+        res = self.client.get(RECIPES_URL, {
+            'tags': f'{t1.id},{t2.id}',
+            'tags_match': 'all',
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [r['id'] for r in res.data['results']],
+            [r1.id]
+        )
+
+    def test_filter_recipe_matching_several_tags_once(self):
+        """Test a recipe matching several filter values is listed once"""
+        t1 = Tag.objects.create(user=self.user, name='tag 1')
+        t2 = Tag.objects.create(user=self.user, name='tag 2')
+        ing = Ingredient.objects.create(user=self.user, name='Ingredient')
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(t1, t2)
+        recipe.ingredients.add(ing)
+
+        res = self.client.get(RECIPES_URL, {
+            'tags': f'{t1.id},{t2.id}',
+            'ingredients': f'{ing.id}',
+        })
+
+        self.assertEqual(
+            [r['id'] for r in res.data['results']],
+            [recipe.id]
+        )
+
+    def test_filter_recipe_invalid_params(self):
+        """Test invalid filter values return a bad request"""
+        for params in [
+            {'tags': '1,abc'},
+            {'ingredients': '1', 'ingredients_match': 'some'},
+        ]:
+            res = self.client.get(RECIPES_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_filter_recipe_by_ranges(self):
+        """Test filtering recipes by time and price ranges"""
+        quick = create_recipe(self.user, time_minutes=20, price=Decimal('8'))
+        create_recipe(self.user, time_minutes=20, price=Decimal('12'))
+        create_recipe(self.user, time_minutes=45, price=Decimal('5'))
+        edge = create_recipe(self.user, time_minutes=30, price=Decimal('10'))
+
+        res = self.client.get(RECIPES_URL, {
+            'min_time': '20',
+            'max_time': '30',
+            'max_price': '10.00',
+        })
+
+        self.assertEqual(
+            [r['id'] for r in res.data['results']],
+            [edge.id, quick.id]
+        )
+
+    def test_filter_recipe_invalid_ranges(self):
+        """Test invalid ranges and orderings return a bad request"""
+        for params in [
+            {'min_time': 'abc'},
+            {'max_time': '-1'},
+            {'max_price': 'NaN'},
+            {'min_price': 'Infinity'},
+            {'min_time': '40', 'max_time': '30'},
+            {'ordering': 'title'},
+        ]:
+            with self.subTest(params=params):
+                res = self.client.get(RECIPES_URL, params)
+
+                self.assertEqual(
+                    res.status_code,
+                    status.HTTP_400_BAD_REQUEST
+                )
+
+    def test_order_recipes_through_pages(self):
+        """Test ordered recipes page forward and back across equal values"""
+        recipes = [
+            create_recipe(self.user, price=Decimal(price))
+            for price in ('9.50', '4.00', '9.50', '9.50', '4.00')
+        ]
+        cheapest_first = [recipes[i].id for i in (1, 4, 0, 2, 3)]
+
+        for ordering, expected in (
+            ('price', cheapest_first),
+            ('-price', cheapest_first[::-1]),
+        ):
+            with self.subTest(ordering=ordering):
+                pages = []
+                res = self.client.get(
+                    RECIPES_URL,
+                    {'ordering': ordering, 'page_size': 2}
+                )
+                while True:
+                    pages.append([r['id'] for r in res.data['results']])
+                    if not res.data['next']:
+                        break
+                    res = self.client.get(res.data['next'])
+                previous = self.client.get(res.data['previous'])
+
+                self.assertEqual(sum(pages, []), expected)
+                self.assertEqual(
+                    [r['id'] for r in previous.data['results']],
+                    pages[-2]
+                )
+
+    def test_invalid_cursor(self):
+        """Test a tampered cursor is not found"""
+        create_recipe(self.user)
+
+        res = self.client.get(RECIPES_URL, {
+            'ordering': 'price',
+            'cursor': 'cD0lNUIlMjJ4JTIyJTJDKyUyMjElMjIlNUQ=',
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_recipe_list_paginated(self):
+        """Test recipes are paginated with a cursor, newest first"""
+        recipes = [create_recipe(user=self.user) for _ in range(3)]
+
+        res = self.client.get(RECIPES_URL, {'page_size': 2})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotIn('count', res.data)
+        self.assertEqual(
+            [r['id'] for r in res.data['results']],
+            [recipes[2].id, recipes[1].id]
+        )
+        self.assertIsNone(res.data['previous'])
+
+        res = self.client.get(res.data['next'])
+
+        self.assertEqual(
+            [r['id'] for r in res.data['results']],
+            [recipes[0].id]
+        )
+        self.assertIsNone(res.data['next'])
+
+    def test_recipe_list_does_not_count(self):
+        """Test paginating recipes does not run a COUNT query"""
+        create_recipe(user=self.user)
 
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(RECIPES_URL)
 
+        for query in ctx.captured_queries:
+            self.assertNotIn('COUNT(', query['sql'].upper())
+
+
+@strict_queries
 class ImageUploadTestCase(TestCase):
     """Test the image upload feature"""
     def setUp(self):
@@ -429,9 +598,29 @@ class ImageUploadTestCase(TestCase):
         )
         self.client.force_authenticate(user=self.user)
         self.recipe = create_recipe(user=self.user)
+        cache.clear()
 
     def tearDown(self):
-        self.recipe.image.delete()
+        recipe = Recipe.objects.filter(pk=self.recipe.pk).first()
+        if recipe is None:
+            return
+        images.delete_variants(recipe.image_variants)
+        recipe.image.delete()
+
+    def post_image(self, size, image_format='JPEG', image=None,
+                   **save_kwargs):
+        """Upload a generated image to the recipe"""
+        url = image_upload_url(self.recipe.id)
+        image = image or Image.new('RGB', size)
+        suffix = '.' + image_format.lower()
+        with tempfile.NamedTemporaryFile(suffix=suffix) as image_file:
+            image.save(image_file, image_format, **save_kwargs)
+            image_file.seek(0)
+            return self.client.post(
+                url,
+                {'image': image_file},
+                format='multipart'
+            )
 
     def upload_image_to_recipe(self):
         """Test the upload image feature"""
@@ -449,6 +638,219 @@ class ImageUploadTestCase(TestCase):
         self.assertIn('image', res.data)
         self.assertTrue(os.path.exists(self.recipe.image.path))
 
+    @override_settings(RECIPE_IMAGE_WORKERS=0)
+    def test_upload_image_renders_variants(self):
+        """Test resized variants are rendered without EXIF data"""
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera maker'
+
+        res = self.post_image((800, 600), exif=exif)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.recipe.refresh_from_db()
+        variants = self.recipe.image_variants
+        self.assertEqual(set(variants), {'160', '320', '640'})
+        for width, formats in variants.items():
+            self.assertEqual(set(formats), set(images.supported_formats()))
+            self.assertIn('jpeg', formats)
+            for name in formats.values():
+                with default_storage.open(name) as f, Image.open(f) as img:
+                    self.assertEqual(img.width, int(width))
+                    self.assertEqual(len(img.getexif()), 0)
+
+        res = self.client.get(detail_url(self.recipe.id))
+
+        self.assertTrue(
+            res.data['image_variants']['320']['jpeg'].endswith('-320.jpeg')
+        )
+
+    @override_settings(RECIPE_IMAGE_WORKERS=0)
+    def test_upload_small_image_not_upscaled(self):
+        """Test an image narrower than every variant keeps its width"""
+        self.post_image((100, 50))
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(list(self.recipe.image_variants), ['100'])
+
+    @override_settings(RECIPE_IMAGE_WORKERS=0)
+    def test_upload_image_reduced_while_decoding(self):
+        """Test an image is decoded no larger than its widest variant"""
+        with patch.object(
+            ImageOps,
+            'exif_transpose',
+            wraps=ImageOps.exif_transpose
+        ) as transpose:
+            self.post_image((2000, 1000))
+
+        self.assertEqual(transpose.call_args.args[0].size, (640, 320))
+        self.recipe.refresh_from_db()
+        self.assertEqual(
+            set(self.recipe.image_variants),
+            {'160', '320', '640'}
+        )
+
+    @override_settings(RECIPE_IMAGE_WORKERS=0)
+    def test_upload_turned_image(self):
+        """Test variant widths follow the EXIF orientation"""
+        exif = Image.Exif()
+        exif[images.ORIENTATION_TAG] = 6
+
+        self.post_image((800, 400), exif=exif)
+
+        self.recipe.refresh_from_db()
+        variants = self.recipe.image_variants
+        self.assertEqual(set(variants), {'160', '320'})
+        with default_storage.open(variants['320']['jpeg']) as f, \
+                Image.open(f) as img:
+            self.assertEqual(img.size, (320, 640))
+
+    def test_upload_jpeg_metadata_stripped(self):
+        """Test the stored JPEG keeps only its orientation and pixels"""
+        image = Image.effect_noise((64, 48), 50).convert('RGB')
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera maker'
+        exif[images.ORIENTATION_TAG] = 6
+        exif[0x8825] = {1: 'N', 2: (51.0, 30.0, 0.0)}
+        original = BytesIO()
+        image.save(original, 'JPEG', exif=exif, icc_profile=b'profile')
+
+        res = self.post_image(image.size, image=image, exif=exif,
+                              icc_profile=b'profile')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.recipe.refresh_from_db()
+        with self.recipe.image.open() as f, Image.open(f) as stored, \
+                Image.open(original) as uploaded:
+            self.assertEqual(
+                dict(stored.getexif()),
+                {images.ORIENTATION_TAG: 6}
+            )
+            self.assertEqual(stored.info['icc_profile'], b'profile')
+            self.assertEqual(stored.tobytes(), uploaded.tobytes())
+
+    def test_upload_png_metadata_stripped(self):
+        """Test text and EXIF chunks are removed from a stored PNG"""
+        image = Image.effect_noise((32, 32), 50)
+        info = PngImagePlugin.PngInfo()
+        info.add_text('Author', 'Someone')
+        info.add_itxt('Location', 'Somewhere', zip=True)
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera maker'
+
+        res = self.post_image(image.size, 'PNG', image=image, pnginfo=info,
+                              exif=exif)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.recipe.refresh_from_db()
+        with self.recipe.image.open() as f, Image.open(f) as stored:
+            stored.load()
+            self.assertEqual(stored.text, {})
+            self.assertEqual(len(stored.getexif()), 0)
+            self.assertEqual(stored.tobytes(), image.tobytes())
+
+    @override_settings(RECIPE_IMAGE_WORKERS=0)
+    def test_delete_recipe_deletes_images(self):
+        """Test deleting a recipe deletes its image files once committed"""
+        self.post_image((400, 300))
+        self.recipe.refresh_from_db()
+        names = [self.recipe.image.name] + [
+            name
+            for formats in self.recipe.image_variants.values()
+            for name in formats.values()
+        ]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.delete(detail_url(self.recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        for name in names:
+            self.assertFalse(default_storage.exists(name))
+
+    @override_settings(RECIPE_IMAGE_WORKERS=0)
+    def test_reupload_deletes_previous_variants(self):
+        """Test replacing an image deletes its variants once committed"""
+        self.post_image((400, 300))
+        self.recipe.refresh_from_db()
+        previous = [
+            name
+            for formats in self.recipe.image_variants.values()
+            for name in formats.values()
+        ]
+        previous_image = self.recipe.image
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post_image((400, 300))
+
+        for name in previous:
+            self.assertFalse(default_storage.exists(name))
+        previous_image.delete(save=False)
+
+    @override_settings(RECIPE_IMAGE_WORKERS=2)
+    def test_upload_image_queues_variants(self):
+        """Test variants are queued to the worker pool after commit"""
+        with patch('recipe.images._get_executor') as patched_executor:
+            with self.captureOnCommitCallbacks(execute=True):
+                res = self.post_image((800, 600))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        patched_executor.return_value.submit.assert_called_once()
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_variants, {})
+
+    def test_upload_image_pixels_not_decoded(self):
+        """Test an upload is validated from its header only"""
+        with patch.object(ImageFile.ImageFile, 'load') as load, \
+                patch.object(Image.Image, 'verify') as verify:
+            res = self.post_image((800, 600))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        load.assert_not_called()
+        verify.assert_not_called()
+
+    def test_upload_image_magic_bytes_checked(self):
+        """Test a file that is not an image is rejected"""
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix='.png') as image_file:
+            image_file.write(b'<html>not an image</html>')
+            image_file.seek(0)
+            res = self.client.post(
+                url,
+                {'image': image_file},
+                format='multipart'
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('image', res.data)
+
+    @override_settings(RECIPE_IMAGE_MAX_PIXELS=100 * 100)
+    def test_upload_image_too_many_pixels(self):
+        """Test images over the pixel limit are rejected"""
+        res = self.post_image((200, 100))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image)
+
+    @override_settings(RECIPE_IMAGE_MAX_UPLOAD_SIZE=1024)
+    def test_upload_image_too_large(self):
+        """Test uploads over the size limit are refused"""
+        res = self.post_image((400, 400), quality=100)
+
+        self.assertEqual(
+            res.status_code,
+            status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        )
+
+    @override_settings(RECIPE_IMAGE_UPLOAD_RATE='1/hour')
+    def test_upload_image_throttled(self):
+        """Test the per-user upload quota"""
+        res = self.post_image((10, 10))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        res = self.post_image((10, 10))
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
     def test_upload_image_bad_request(self):
         """Test uploading invalid image"""
         url = image_upload_url(recipe_id=self.recipe.id)
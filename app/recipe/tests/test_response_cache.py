@@ -0,0 +1,140 @@
+"""
+Tests for the per-user response cache of the recipe APIs
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+def detail_url(recipe_id):
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def create_user(email='user@example.com', password='goodpass'):
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def create_recipe(user, **params):
+    defaults = {
+        'title': 'Recipe',
+        'time_minutes': 10,
+        'price': Decimal('5.00'),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+@override_settings(RECIPE_RESPONSE_CACHE_TTL=300)
+class ResponseCacheTests(TestCase):
+    """Test caching of list and retrieve responses"""
+    def setUp(self):
+        cache.clear()
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, url, params=None, **extra):
+        """GET a url, returning the response and the number of queries"""
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(url, params, **extra)
+        return res, len(ctx.captured_queries)
+
+    def test_list_served_from_cache(self):
+        """Test a repeated list request does not hit the database"""
+        create_recipe(self.user)
+        first, _ = self.get(RECIPES_URL)
+
+        second, queries = self.get(RECIPES_URL)
+
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(queries, 0)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_if_none_match_not_modified(self):
+        """Test a matching ETag returns 304 without a body"""
+        recipe = create_recipe(self.user)
+        res, _ = self.get(detail_url(recipe.id))
+
+        res, queries = self.get(
+            detail_url(recipe.id),
+            HTTP_IF_NONE_MATCH=res['ETag']
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res.content, b'')
+        self.assertEqual(queries, 0)
+
+    def test_write_invalidates_cache(self):
+        """Test creating a recipe through the API changes the list"""
+        first, _ = self.get(RECIPES_URL)
+        self.client.post(RECIPES_URL, {
+            'title': 'New recipe',
+            'time_minutes': 5,
+            'price': '1.00',
+        })
+
+        res, _ = self.get(RECIPES_URL, HTTP_IF_NONE_MATCH=first['ETag'])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], first['ETag'])
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_relation_change_invalidates_cache(self):
+        """Test linking a tag to a recipe changes the cached responses"""
+        recipe = create_recipe(self.user)
+        tag = Tag.objects.create(user=self.user, name='Tag')
+        self.get(RECIPES_URL)
+        self.get(TAGS_URL, {'assigned_only': 1})
+
+        recipe.tags.add(tag)
+
+        res, _ = self.get(RECIPES_URL)
+        self.assertEqual(res.data['results'][0]['tags'][0]['id'], tag.id)
+        res, _ = self.get(TAGS_URL, {'assigned_only': 1})
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_cache_keyed_by_query_params(self):
+        """Test different query params are cached separately"""
+        create_recipe(self.user)
+        tag = Tag.objects.create(user=self.user, name='Tag')
+
+        all_recipes, _ = self.get(RECIPES_URL)
+        filtered, _ = self.get(RECIPES_URL, {'tags': str(tag.id)})
+
+        self.assertEqual(len(all_recipes.data['results']), 1)
+        self.assertEqual(len(filtered.data['results']), 0)
+
+    def test_cache_keyed_by_user(self):
+        """Test users never see each other's cached responses"""
+        create_recipe(self.user)
+        self.get(RECIPES_URL)
+        self.client.force_authenticate(create_user(email='other@example.com'))
+
+        res, _ = self.get(RECIPES_URL)
+
+        self.assertEqual(res.data['results'], [])
+
+    @override_settings(RECIPE_RESPONSE_CACHE_TTL=0)
+    def test_cache_disabled(self):
+        """Test a TTL of 0 disables the response cache"""
+        self.get(RECIPES_URL)
+
+        res, queries = self.get(RECIPES_URL)
+
+        self.assertGreater(queries, 0)
+        self.assertNotIn('ETag', res)
@@ -0,0 +1,162 @@
+"""
+Tests for the recipe full-text search
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+from recipe import filters, search
+from recipe.management.commands.explain_queries import user_indexes
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+IMPORT_URL = reverse('recipe:recipe-import')
+
+
+def create_user(email='user@example.com', password='goodpass'):
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def create_recipe(user, **params):
+    defaults = {
+        'title': 'Recipe',
+        'time_minutes': 10,
+        'price': Decimal('5.00'),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class RecipeSearchTests(TestCase):
+    """Test searching recipes through the list endpoint"""
+    def setUp(self):
+        cache.clear()
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def search(self, terms, **params):
+        """Return the titles of the recipes matching ``terms``"""
+        res = self.client.get(RECIPES_URL, {'search': terms, **params})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [recipe['title'] for recipe in res.data['results']]
+
+    def test_search_fields(self):
+        """Test titles, descriptions, tags and ingredients are searched"""
+        create_recipe(self.user, title='Lemon tart')
+        create_recipe(self.user, title='Pie', description='Baked lemons')
+        tagged = create_recipe(self.user, title='Tagged')
+        tagged.tags.add(Tag.objects.create(user=self.user, name='Lemony'))
+        with_ingredient = create_recipe(self.user, title='Curd')
+        with_ingredient.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Lemon zest')
+        )
+        create_recipe(self.user, title='Chocolate cake')
+
+        titles = self.search('lemon')
+
+        self.assertCountEqual(titles, ['Lemon tart', 'Pie', 'Curd'])
+
+    def test_search_ranked(self):
+        """Test title matches rank above description matches"""
+        create_recipe(self.user, title='Stew', description='With garlic')
+        create_recipe(self.user, title='Garlic bread')
+
+        self.assertEqual(self.search('garlic'), ['Garlic bread', 'Stew'])
+
+    def test_search_web_syntax(self):
+        """Test excluded words and phrases"""
+        create_recipe(self.user, title='Chicken curry')
+        create_recipe(self.user, title='Chicken soup')
+
+        self.assertEqual(self.search('chicken -soup'), ['Chicken curry'])
+        self.assertEqual(self.search('"chicken soup"'), ['Chicken soup'])
+
+    def test_search_limited_to_user(self):
+        """Test other users' recipes are never returned"""
+        create_recipe(create_user(email='other@example.com'), title='Soup')
+
+        self.assertEqual(self.search('soup'), [])
+
+    def test_search_index_scoped_to_user(self):
+        """Test the search index is scanned for the user's recipes only"""
+        create_recipe(self.user, title='Soup')
+        queryset = search.search_recipes(
+            filters.filter_owned(Recipe.objects.all(), self.user),
+            'soup'
+        )
+
+        with connection.cursor() as cursor:
+            # Rolled back with the test: leave the planner no other index
+            # on the user, as a table with many users' recipes would
+            for name in user_indexes(Recipe):
+                if name != 'recipe_user_search_idx':
+                    cursor.execute(f'DROP INDEX {name}')
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            plan = queryset.explain()
+
+        self.assertIn('Bitmap Index Scan on recipe_user_search_idx', plan)
+        self.assertIn(
+            f"Index Cond: ((user_id = '{self.user.id}'::bigint) AND", plan
+        )
+
+    def test_search_paginated_by_rank(self):
+        """Test the cursor pages through results in rank order"""
+        create_recipe(self.user, title='Rice', description='Rice with rice')
+        create_recipe(self.user, title='Rice')
+        create_recipe(self.user, title='Soup', description='With rice')
+
+        titles = []
+        res = self.client.get(RECIPES_URL, {'search': 'rice', 'page_size': 1})
+        while True:
+            titles += [recipe['title'] for recipe in res.data['results']]
+            if not res.data['next']:
+                break
+            res = self.client.get(res.data['next'])
+
+        self.assertEqual(titles, self.search('rice'))
+        self.assertEqual(len(titles), 3)
+        self.assertEqual(titles[-1], 'Soup')
+
+    def test_search_follows_updates(self):
+        """Test the vectors follow recipe, tag and ingredient changes"""
+        recipe = create_recipe(self.user, title='Salad')
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        tag.recipe_set.add(recipe)
+        self.assertEqual(self.search('vegan'), ['Salad'])
+
+        tag.name = 'Summer'
+        tag.save()
+        self.assertEqual(self.search('vegan'), [])
+        self.assertEqual(self.search('summer'), ['Salad'])
+
+        tag.delete()
+        self.assertEqual(self.search('summer'), [])
+
+        self.client.patch(
+            reverse('recipe:recipe-detail', args=[recipe.id]),
+            {'title': 'Noodles'}
+        )
+        self.assertEqual(self.search('noodles'), ['Noodles'])
+
+    def test_search_imported_recipes(self):
+        """Test recipes created by the bulk import are searchable"""
+        body = (
+            b'{"title": "Pancakes", "time_minutes": 5, "price": "1.00", '
+            b'"tags": [{"name": "Breakfast"}]}\n'
+        )
+        self.client.post(
+            IMPORT_URL,
+            body,
+            content_type='application/x-ndjson'
+        )
+
+        self.assertEqual(self.search('breakfast'), ['Pancakes'])
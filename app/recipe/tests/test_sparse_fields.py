@@ -0,0 +1,151 @@
+"""
+Tests for sparse fieldsets on the recipe API
+"""
+import json
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+from core.tests.utils import strict_queries
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+EXPORT_URL = reverse('recipe:recipe-export')
+
+
+def detail_url(recipe_id):
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+@strict_queries
+class SparseFieldsTests(TestCase):
+    """Test the fields and expand query params"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='goodpass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.ingredient = Ingredient.objects.create(
+            user=self.user,
+            name='Salt'
+        )
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title='Curry',
+            time_minutes=30,
+            price=Decimal('7.50'),
+            description='Spicy'
+        )
+        self.recipe.tags.add(self.tag)
+        self.recipe.ingredients.add(self.ingredient)
+
+    def get(self, url, params):
+        with CaptureQueriesContext(connection) as context:
+            res = self.client.get(url, params)
+        sql = '\n'.join(query['sql'] for query in context.captured_queries)
+        return res, sql
+
+    def test_fields_pruned(self):
+        """Test only the requested fields are read and returned"""
+        full = self.client.get(RECIPES_URL)
+        res, sql = self.get(RECIPES_URL, {'fields': 'id,title'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res.data['results'],
+            [{'id': self.recipe.id, 'title': 'Curry'}]
+        )
+        self.assertLess(len(res.content), len(full.content))
+        self.assertNotIn('"core_recipe"."price"', sql)
+        self.assertNotIn('core_tag', sql)
+        self.assertNotIn('core_ingredient', sql)
+
+    def test_relations_not_expanded(self):
+        """Test relations left out of expand are lists of IDs"""
+        res, sql = self.get(RECIPES_URL, {
+            'fields': 'id,tags,ingredients',
+            'expand': 'tags',
+        })
+
+        recipe = res.data['results'][0]
+        self.assertEqual(
+            recipe['tags'],
+            [{'id': self.tag.id, 'name': 'Vegan'}]
+        )
+        self.assertEqual(recipe['ingredients'], [self.ingredient.id])
+        self.assertNotIn('"core_ingredient"."name"', sql)
+
+    def test_empty_expand(self):
+        """Test an empty expand returns every relation as IDs"""
+        res = self.client.get(detail_url(self.recipe.id), {'expand': ''})
+
+        self.assertEqual(res.data['tags'], [self.tag.id])
+        self.assertEqual(res.data['ingredients'], [self.ingredient.id])
+        self.assertEqual(res.data['description'], 'Spicy')
+
+    def test_detail_fields(self):
+        """Test detail only fields can be requested on their own"""
+        res, sql = self.get(
+            detail_url(self.recipe.id),
+            {'fields': 'description,image_variants'}
+        )
+
+        self.assertEqual(
+            res.data,
+            {'description': 'Spicy', 'image_variants': {}}
+        )
+        self.assertNotIn('"core_recipe"."title"', sql)
+
+    def test_unknown_field_rejected(self):
+        """Test unknown field names are a bad request"""
+        res = self.client.get(RECIPES_URL, {'fields': 'id,description'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('fields', res.data)
+
+    def test_unknown_expand_rejected(self):
+        """Test only relations can be expanded"""
+        res = self.client.get(RECIPES_URL, {'expand': 'title'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('expand', res.data)
+
+    def test_export_fields(self):
+        """Test exports honour the requested fields"""
+        res = self.client.get(EXPORT_URL, {'fields': 'id,ingredients'})
+
+        lines = b''.join(res.streaming_content).decode().splitlines()
+        self.assertEqual(
+            [json.loads(line) for line in lines],
+            [{
+                'id': self.recipe.id,
+                'ingredients': [{
+                    'id': self.ingredient.id,
+                    'name': 'Salt',
+                    'quantity': '',
+                }],
+            }]
+        )
+
+    def test_writes_return_every_field(self):
+        """Test the params do not prune the response of a write"""
+        res = self.client.patch(
+            f'{detail_url(self.recipe.id)}?fields=id',
+            {'title': 'Mild curry'}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['title'], 'Mild curry')
+        self.assertIn('tags', res.data)
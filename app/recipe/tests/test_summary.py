@@ -0,0 +1,256 @@
+"""
+Tests for the per-user recipe summaries and the stats endpoint
+"""
+import json
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Count, Sum
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    Ingredient,
+    IngredientSummary,
+    Recipe,
+    RecipeSummary,
+    Tag,
+    TagSummary,
+)
+from core.tests.utils import strict_queries
+from recipe import summary
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+STATS_URL = reverse('recipe:recipe-stats')
+IMPORT_URL = reverse('recipe:recipe-import')
+
+
+def detail_url(recipe_id):
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def expected_summaries(user):
+    """Return the summaries of a user aggregated from their recipes"""
+    recipes = Recipe.objects.filter(user=user).aggregate(
+        count=Count('id'),
+        time=Sum('time_minutes'),
+        price=Sum('price'),
+    )
+    return {
+        'user': (recipes['count'], recipes['time'] or 0,
+                 recipes['price'] or Decimal('0')),
+        'tags': dict(Tag.objects.filter(user=user).annotate(
+            n=Count('recipe')
+        ).filter(n__gt=0).values_list('id', 'n')),
+        'ingredients': dict(Ingredient.objects.filter(user=user).annotate(
+            n=Count('recipe')
+        ).filter(n__gt=0).values_list('id', 'n')),
+    }
+
+
+def stored_summaries(user):
+    """Return the summaries of a user as stored"""
+    row = RecipeSummary.objects.filter(user=user).values_list(
+        'recipe_count', 'total_time_minutes', 'total_price'
+    ).first()
+    return {
+        'user': row or (0, 0, Decimal('0')),
+        'tags': dict(TagSummary.objects.filter(
+            tag__user=user, recipe_count__gt=0
+        ).values_list('tag_id', 'recipe_count')),
+        'ingredients': dict(IngredientSummary.objects.filter(
+            ingredient__user=user, recipe_count__gt=0
+        ).values_list('ingredient_id', 'recipe_count')),
+    }
+
+
+@strict_queries
+class RecipeSummaryTests(TestCase):
+    """Test the summaries follow every change to recipes"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='goodpass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertSummariesMatch(self):
+        self.assertEqual(
+            stored_summaries(self.user),
+            expected_summaries(self.user)
+        )
+
+    def create_recipe(self, **params):
+        payload = {
+            'title': 'Curry',
+            'time_minutes': 30,
+            'price': '7.25',
+            'tags': [{'name': 'Dinner'}, {'name': 'Spicy'}],
+            'ingredients': [{'name': 'Rice'}],
+        }
+        payload.update(params)
+        res = self.client.post(RECIPES_URL, payload, format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        return Recipe.objects.get(id=res.data['id'])
+
+    def test_api_changes(self):
+        """Test creating, updating and deleting recipes via the API"""
+        recipe = self.create_recipe()
+        self.create_recipe(title='Soup', price='3.10', tags=[])
+        self.assertSummariesMatch()
+
+        self.client.patch(detail_url(recipe.id), {
+            'time_minutes': 45,
+            'price': '9.99',
+            'tags': [{'name': 'Lunch'}, {'name': 'Spicy'}],
+        }, format='json')
+        self.assertSummariesMatch()
+
+        self.client.delete(detail_url(recipe.id))
+        self.assertSummariesMatch()
+        self.assertEqual(
+            stored_summaries(self.user)['user'],
+            (1, 30, Decimal('3.10'))
+        )
+
+    def test_link_changes(self):
+        """Test links added and removed from either side"""
+        recipe = self.create_recipe()
+        other = self.create_recipe(title='Stew')
+        tag = Tag.objects.get(user=self.user, name='Dinner')
+        lunch = Tag.objects.create(user=self.user, name='Lunch')
+
+        recipe.tags.remove(tag, lunch)
+        self.assertSummariesMatch()
+        lunch.recipe_set.add(recipe, other)
+        tag.recipe_set.remove(other)
+        self.assertSummariesMatch()
+        lunch.recipe_set.clear()
+        recipe.ingredients.clear()
+        self.assertSummariesMatch()
+
+    def test_bulk_import(self):
+        """Test imported recipes are added without model signals"""
+        body = '\n'.join(json.dumps({
+            'title': f'Recipe {i}',
+            'time_minutes': 10 + i,
+            'price': '2.50',
+            'tags': [{'name': 'Dinner'}],
+            'ingredients': [{'name': 'Salt'}, {'name': f'Herb {i}'}],
+        }) for i in range(3))
+
+        res = self.client.post(
+            IMPORT_URL,
+            body,
+            content_type='application/x-ndjson'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertSummariesMatch()
+
+    def test_delete_user(self):
+        """Test deleting a user leaves no summary behind"""
+        self.create_recipe()
+
+        self.user.delete()
+
+        self.assertFalse(RecipeSummary.objects.exists())
+        self.assertFalse(TagSummary.objects.exists())
+        connection.check_constraints()
+
+    def test_rebuild(self):
+        """Test rebuilding repairs drifted summaries of the given users"""
+        self.create_recipe()
+        other = get_user_model().objects.create_user(email='o@example.com')
+        Recipe.objects.create(
+            user=other,
+            title='Other',
+            time_minutes=5,
+            price=Decimal('1.00')
+        )
+        RecipeSummary.objects.update(recipe_count=99)
+        TagSummary.objects.update(recipe_count=99)
+
+        summary.rebuild([self.user.id])
+
+        self.assertSummariesMatch()
+        self.assertEqual(RecipeSummary.objects.get(user=other).recipe_count,
+                         99)
+
+
+@strict_queries
+class RecipeStatsAPITests(TestCase):
+    """Test the recipe stats endpoint"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='goodpass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_auth_required(self):
+        res = APIClient().get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_no_recipes(self):
+        """Test the stats of a user without recipes"""
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {
+            'recipes': 0,
+            'average_time_minutes': None,
+            'average_price': None,
+            'tags': [],
+            'ingredients': [],
+        })
+
+    def test_stats(self):
+        """Test the stats are read from the user's summaries"""
+        vegan = Tag.objects.create(user=self.user, name='Vegan')
+        quick = Tag.objects.create(user=self.user, name='Quick')
+        Tag.objects.create(user=self.user, name='Unused')
+        salt = Ingredient.objects.create(user=self.user, name='Salt')
+        for minutes, price, tags in (
+            (10, '2.00', [vegan]),
+            (20, '3.00', [vegan, quick]),
+            (25, '4.50', []),
+        ):
+            recipe = Recipe.objects.create(
+                user=self.user,
+                title='Recipe',
+                time_minutes=minutes,
+                price=Decimal(price)
+            )
+            recipe.tags.set(tags)
+            recipe.ingredients.add(salt)
+        Recipe.objects.create(
+            user=get_user_model().objects.create_user(email='o@example.com'),
+            title='Other',
+            time_minutes=100,
+            price=Decimal('50.00')
+        )
+
+        with self.assertNumQueries(3):
+            res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.data, {
+            'recipes': 3,
+            'average_time_minutes': 18.33,
+            'average_price': '3.17',
+            'tags': [
+                {'id': vegan.id, 'name': 'Vegan', 'recipes': 2},
+                {'id': quick.id, 'name': 'Quick', 'recipes': 1},
+            ],
+            'ingredients': [{'id': salt.id, 'name': 'Salt', 'recipes': 3}],
+        })
@@ -8,6 +8,7 @@ from rest_framework import status
 from rest_framework.test import APIClient
 
 from core.models import Tag, Recipe
+from core.tests.utils import strict_queries
 
 from recipe.serializers import TagSerializer
 
@@ -34,6 +35,7 @@ class PublicTagAPITest(TestCase):
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
+@strict_queries
 class PrivateTagAPITest(TestCase):
     """Test the authorized tags API"""
     def setUp(self):
@@ -51,7 +53,7 @@ class PrivateTagAPITest(TestCase):
 
         serializer = TagSerializer(tags, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_tags_limited_to_user(self):
         """Test getting a list of tags of the auth user"""
@@ -62,9 +64,24 @@ class PrivateTagAPITest(TestCase):
         res = self.client.get(TAGS_URL)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]['name'], tag.name)
-        self.assertEqual(res.data[0]['id'], tag.id)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['name'], tag.name)
+        self.assertEqual(res.data['results'][0]['id'], tag.id)
+
+    def test_tags_paginated_by_name(self):
+        """Test tags are paginated by name with a stable tie-breaker"""
+        first = Tag.objects.create(user=self.user, name='Same')
+        second = Tag.objects.create(user=self.user, name='Same')
+        Tag.objects.create(user=self.user, name='Apple')
+
+        res = self.client.get(TAGS_URL, {'page_size': 1})
+        ids = [res.data['results'][0]['id']]
+        while res.data['next']:
+            res = self.client.get(res.data['next'])
+            ids.extend(tag['id'] for tag in res.data['results'])
+
+        self.assertEqual(len(ids), 3)
+        self.assertEqual(ids[:2], [first.id, second.id])
 
     def test_update_tag(self):
         """ test updating a tag """
@@ -105,8 +122,8 @@ class PrivateTagAPITest(TestCase):
         s1 = TagSerializer(tag1)
         s2 = TagSerializer(tag2)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertIn(s1.data, res.data)
-        self.assertNotIn(s2.data, res.data)
+        self.assertIn(s1.data, res.data['results'])
+        self.assertNotIn(s2.data, res.data['results'])
 
     def test_filtred_tags_unique(self):
         """test returned list of tags must be unique"""
@@ -131,4 +148,4 @@ class PrivateTagAPITest(TestCase):
             'assigned_only': 1
         })
 
-        self.assertEqual(len(res.data), 1)
+        self.assertEqual(len(res.data['results']), 1)
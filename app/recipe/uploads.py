@@ -0,0 +1,136 @@
+"""
+Streaming, size-bounded validation of recipe image uploads
+
+The upload body is streamed chunk by chunk to a temporary file and aborted
+as soon as it passes ``RECIPE_IMAGE_MAX_UPLOAD_SIZE``, so a worker holds at
+most one chunk of an upload in memory. The stored file is then checked from
+its header alone: the magic bytes must match an allowed format and the
+dimensions Pillow reads from the header must stay under
+``RECIPE_IMAGE_MAX_PIXELS``. No pixels are decoded.
+"""
+import warnings
+
+from PIL import Image
+from django.conf import settings
+from django.core.files.uploadhandler import (
+    FileUploadHandler,
+    TemporaryFileUploadHandler,
+)
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions, status
+from rest_framework.throttling import UserRateThrottle
+
+
+# Leading bytes of each accepted format, keyed by the Pillow format name
+MAGIC_BYTES = {
+    'JPEG': [(0, b'\xff\xd8\xff')],
+    'PNG': [(0, b'\x89PNG\r\n\x1a\n')],
+    'GIF': [(0, b'GIF87a'), (0, b'GIF89a')],
+    'WEBP': [(0, b'RIFF'), (8, b'WEBP')],
+}
+HEADER_SIZE = 16
+
+
+class UploadTooLarge(exceptions.APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = _('Upload is too large.')
+    default_code = 'upload_too_large'
+
+
+class SizeLimitUploadHandler(FileUploadHandler):
+    """Abort an upload once its body or a file in it passes a size limit
+
+    It passes every chunk on untouched, so it goes first in
+    ``request.upload_handlers``, ahead of the handler storing the file.
+    """
+
+    def __init__(self, request=None, max_size=None):
+        super().__init__(request)
+        self.max_size = max_size
+        self.received = 0
+
+    def handle_raw_input(self, input_data, META, content_length, boundary,
+                         encoding=None):
+        # A declared length over the limit is refused before reading a byte
+        if content_length and content_length > self.max_size:
+            raise UploadTooLarge()
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        # Bodies sent without a length are only caught while streaming
+        self.received += len(raw_data)
+        if self.received > self.max_size:
+            raise UploadTooLarge()
+        return raw_data
+
+    def file_complete(self, file_size):
+        return None
+
+
+def stream_uploads(request):
+    """Stream the files of a request to disk, bounded by the size limit
+
+    Must be called before the request body is parsed.
+    """
+    request.upload_handlers = [
+        SizeLimitUploadHandler(
+            request,
+            max_size=settings.RECIPE_IMAGE_MAX_UPLOAD_SIZE
+        ),
+        TemporaryFileUploadHandler(request),
+    ]
+
+
+def sniff_format(header):
+    """Return the format identified by the magic bytes of a header"""
+    for image_format, signatures in MAGIC_BYTES.items():
+        if all(
+            header[offset:offset + len(magic)] == magic
+            for offset, magic in signatures
+        ):
+            return image_format
+
+    return None
+
+
+def inspect_image(file):
+    """Return the format and size of an image file, reading its header only
+
+    Raises ValueError if the file is not an allowed image format or has
+    more than ``RECIPE_IMAGE_MAX_PIXELS`` pixels.
+    """
+    allowed = settings.RECIPE_IMAGE_FORMATS
+    file.seek(0)
+    image_format = sniff_format(file.read(HEADER_SIZE))
+    if image_format not in allowed:
+        raise ValueError(_('Unsupported image format.'))
+
+    file.seek(0)
+    try:
+        with warnings.catch_warnings():
+            # Pillow warns about large images; the limit below decides
+            warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+            with Image.open(file, formats=[image_format]) as image:
+                width, height = image.size
+    except Image.DecompressionBombError:
+        raise ValueError(_('Image dimensions are too large.'))
+    except OSError:
+        raise ValueError(_('Upload a valid image.'))
+    finally:
+        file.seek(0)
+
+    if width * height > settings.RECIPE_IMAGE_MAX_PIXELS:
+        raise ValueError(_('Image dimensions are too large.'))
+
+    return image_format, (width, height)
+
+
+class RecipeImageUploadThrottle(UserRateThrottle):
+    """Limit the image uploads of each user to RECIPE_IMAGE_UPLOAD_RATE"""
+    scope = 'recipe_image_upload'
+
+    def get_rate(self):
+        return settings.RECIPE_IMAGE_UPLOAD_RATE
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
@@ -16,3 +17,8 @@ app_name = 'recipe'
 urlpatterns = [
     path('', include(router.urls))
 ]
+
+if settings.RECIPE_ASYNC_VIEWS:
+    from recipe import async_views
+
+    urlpatterns = async_views.urlpatterns + urlpatterns
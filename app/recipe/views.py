@@ -1,3 +1,6 @@
+from django.conf import settings
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
 from drf_spectacular.utils import (
     extend_schema_view,
     extend_schema,
@@ -12,11 +15,68 @@ from rest_framework import (
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 
 from core.models import Recipe, Tag, Ingredient
-from recipe import serializers
+from core.replicas import ReplicaReadMixin, read_alias
+from user.authentication import CachedTokenAuthentication
+from recipe import (
+    autocomplete,
+    bulk,
+    filters,
+    images,
+    readers,
+    search,
+    serializers,
+    sparse,
+    summary,
+    uploads,
+)
+from recipe.cache import CachedResponseMixin, response_cache_key
+from recipe.parsers import NDJSONParser
+from recipe.pagination import (
+    RecipeCursorPagination,
+    RecipeAttrCursorPagination,
+)
+
+
+# Recipe actions serializing a sparse fieldset
+SPARSE_ACTIONS = ('list', 'retrieve', 'export_recipes')
+
+FIELDSET_PARAMETERS = [
+    OpenApiParameter(
+        'fields',
+        OpenApiTypes.STR,
+        description='Comma separated list of the fields to return'
+    ),
+    OpenApiParameter(
+        'expand',
+        OpenApiTypes.STR,
+        description='Comma separated list of the relations to embed as '
+                    'objects, the others are lists of IDs (default: all)'
+    ),
+]
+
+
+def recipe_prefetches(fieldset=None):
+    """Return prefetches for the relations a recipe serializes
+
+    With a fieldset, only for the relations it includes, reading just the
+    IDs of those it does not expand.
+    """
+    prefetches = []
+    for field, model, columns in (
+        ('tags', Tag, ['id', 'name']),
+        ('ingredients', Ingredient, ['id', 'name', 'quantity']),
+    ):
+        if fieldset is not None and not fieldset.expands(field):
+            if not fieldset.includes(field):
+                continue
+            columns = ['id']
+        prefetches.append(
+            Prefetch(field, queryset=model.objects.only(*columns))
+        )
+    return prefetches
 
 
 @extend_schema_view(
@@ -28,47 +88,172 @@ from recipe import serializers
                 description='Comma separated list of tags IDs to filter'
 
             ),
+            OpenApiParameter(
+                'tags_match',
+                OpenApiTypes.STR, enum=filters.MATCH_CHOICES,
+                description='Match recipes with any (default) or all tags'
+            ),
             OpenApiParameter(
                 'ingredients',
                 OpenApiTypes.STR,
                 description='Comma separated list of ingredients IDs to filter'
-            )
+            ),
+            OpenApiParameter(
+                'ingredients_match',
+                OpenApiTypes.STR, enum=filters.MATCH_CHOICES,
+                description='Match recipes with any (default) or all '
+                            'ingredients'
+            ),
+            OpenApiParameter(
+                'search',
+                OpenApiTypes.STR,
+                description='Full-text search over titles, descriptions, '
+                            'tags and ingredients, best matches first'
+            ),
+            OpenApiParameter(
+                'min_time',
+                OpenApiTypes.INT,
+                description='Only recipes taking at least this many minutes'
+            ),
+            OpenApiParameter(
+                'max_time',
+                OpenApiTypes.INT,
+                description='Only recipes taking at most this many minutes'
+            ),
+            OpenApiParameter(
+                'min_price',
+                OpenApiTypes.DECIMAL,
+                description='Only recipes costing at least this much'
+            ),
+            OpenApiParameter(
+                'max_price',
+                OpenApiTypes.DECIMAL,
+                description='Only recipes costing at most this much'
+            ),
+            OpenApiParameter(
+                'ordering',
+                OpenApiTypes.STR, enum=list(filters.RECIPE_ORDERINGS),
+                description='Sort order, newest first (-id) by default or '
+                            'best matches first when searching'
+            ),
+            *FIELDSET_PARAMETERS,
         ]
-    )
+    ),
+    retrieve=extend_schema(parameters=FIELDSET_PARAMETERS),
 )
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ReplicaReadMixin, CachedResponseMixin,
+                    readers.RowListMixin, viewsets.ModelViewSet):
     """View set for manage recipe API"""
     serializer_class = serializers.RecipeDetailSerializer
     queryset = Recipe.objects.all()
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
+    pagination_class = RecipeCursorPagination
+    _fieldset = None
+
+    def _filter_related(self, queryset, field):
+        """Apply the ``<field>`` and ``<field>_match`` query params"""
+        params = self.request.query_params
+        ids = params.get(field)
+        if not ids:
+            return queryset
+
+        match_param = f'{field}_match'
+        return filters.filter_recipes_by_related(
+            queryset,
+            field,
+            filters.parse_ids(ids, field),
+            filters.parse_match(params.get(match_param), match_param),
+        )
 
-    def _params_into_int(self, qs):
-        """Convert a string of ids to integer"""
-        return [int(str_id) for str_id in qs.split(',')]
+    def _search_terms(self):
+        if self.action != 'list':
+            return None
+        return self.request.query_params.get('search', '').strip() or None
 
     def get_queryset(self):
         """Returns a queryset of recipe objects for authenticated user"""
-        tags = self.request.query_params.get('tags')
-        ingredients = self.request.query_params.get('ingredients')
-        queryset = self.queryset
-        if tags:
-            tags_ids = self._params_into_int(tags)
-            queryset = queryset.filter(tags__id__in=tags_ids)
+        queryset = filters.filter_owned(
+            self.queryset, self.request.user
+        ).defer('search_vector')
+        queryset = self._filter_related(queryset, 'tags')
+        queryset = self._filter_related(queryset, 'ingredients')
+        queryset = filters.filter_recipes_by_range(
+            queryset, self.request.query_params
+        )
+        terms = self._search_terms()
+        if terms:
+            queryset = search.search_recipes(queryset, terms)
+        if self.action in ('list', 'export_recipes'):
+            queryset = queryset.order_by(*self.get_pagination_ordering())
+        else:
+            queryset = queryset.order_by('-id')
 
-        if ingredients:
-            ingredients_ids = self._params_into_int(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ingredients_ids)
+        return self._prefetch_for_action(queryset)
 
-        return queryset.filter(
-            user=self.request.user
-            ).order_by('-id').distinct()
+    def get_fieldset(self):
+        """Return the fields and relations the request asks for"""
+        if self._fieldset is None:
+            self._fieldset = sparse.Fieldset.from_request(
+                self.request,
+                self.get_serializer_class()
+            )
+        return self._fieldset
+
+    def _prefetch_for_action(self, queryset):
+        """Load only the columns and relations the action serializes"""
+        if self.action in ('destroy', 'upload_image'):
+            return queryset
+        if self.action not in SPARSE_ACTIONS:
+            return queryset.prefetch_related(*recipe_prefetches())
+
+        fieldset = self.get_fieldset()
+        queryset = queryset.only(*fieldset.columns())
+        if self.action == 'export_recipes':
+            # Prefetched a chunk at a time by the export
+            return queryset
+        return queryset.prefetch_related(*recipe_prefetches(fieldset))
+
+    def get_row_columns(self):
+        columns = self.get_fieldset().columns()
+        # Read by the pagination cursor
+        for field in self.get_pagination_ordering():
+            if field.lstrip('-') not in columns:
+                columns.append(field.lstrip('-'))
+        return columns
+
+    def read_page(self, rows):
+        return readers.read_recipes(
+            rows,
+            self.get_serializer_class(),
+            self.get_fieldset()
+        )
+
+    def get_pagination_ordering(self):
+        """Order by the ``ordering`` param, else search results by rank"""
+        ordering = self.request.query_params.get('ordering')
+        if ordering is None and self._search_terms():
+            return ('-search_rank', '-id')
+        return filters.parse_ordering(ordering)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action in SPARSE_ACTIONS:
+            context['fieldset'] = self.get_fieldset()
+        return context
 
     def get_serializer_class(self):
         if self.action == 'list':
             return serializers.RecipeSerializer
         elif self.action == 'upload_image':
             return serializers.RecipeImageSerializer
+        elif self.action == 'stats':
+            return serializers.RecipeStatsSerializer
 
         return self.serializer_class
 
@@ -76,18 +261,92 @@ class RecipeViewSet(viewsets.ModelViewSet):
         """create a new recipe"""
         serializer.save(user=self.request.user)
 
-    @action(methods=['POST'], detail=True, url_path='upload_image')
+    @action(
+        methods=['POST'],
+        detail=True,
+        url_path='upload_image',
+        throttle_classes=[uploads.RecipeImageUploadThrottle],
+    )
     def upload_image(self, request, pk=None):
         """Upload an image to recipe"""
+        uploads.stream_uploads(request._request)
         recipe = self.get_object()
+        replaced = recipe.image_variants
         serializer = self.get_serializer(recipe, data=request.data)
 
         if serializer.is_valid():
-            serializer.save()
+            serializer.save(image_variants={})
+            images.schedule_variants(recipe, replaced)
             return Response(serializer.data, status=status.HTTP_200_OK)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @extend_schema(
+        request={'application/x-ndjson': serializers.RecipeDetailSerializer},
+        responses={201: OpenApiTypes.OBJECT},
+    )
+    @action(
+        methods=['POST'],
+        detail=False,
+        url_path='import',
+        url_name='import',
+        parser_classes=[NDJSONParser],
+    )
+    def import_recipes(self, request):
+        """Create recipes from a newline delimited JSON body"""
+        try:
+            created = bulk.import_recipes(
+                request.data,
+                request.user,
+                self.get_serializer_context(),
+                settings.RECIPE_BULK_CHUNK_SIZE,
+            )
+        except bulk.ImportRejected as exc:
+            return Response(
+                {'errors': exc.errors},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response({'created': created}, status=status.HTTP_201_CREATED)
+
+    @extend_schema(
+        parameters=FIELDSET_PARAMETERS,
+        responses={(200, 'application/x-ndjson'): OpenApiTypes.STR},
+    )
+    @action(
+        methods=['GET'],
+        detail=False,
+        url_path='export',
+        url_name='export',
+    )
+    def export_recipes(self, request):
+        """Stream the user's recipes as newline delimited JSON"""
+        # Streamed after the view returns, from the database chosen now
+        lines = bulk.export_recipes(
+            self.filter_queryset(self.get_queryset()).using(read_alias()),
+            recipe_prefetches(self.get_fieldset()),
+            self.get_serializer_context(),
+            settings.RECIPE_BULK_CHUNK_SIZE,
+        )
+        if settings.RECIPE_ASYNC_VIEWS:
+            # Django 4.0's ASGI handler iterates a streamed response on the
+            # event loop, where the queryset cannot be read
+            lines = bulk.spool_lines(lines)
+
+        return StreamingHttpResponse(
+            lines,
+            content_type='application/x-ndjson'
+        )
+
+    @action(methods=['GET'], detail=False, url_path='stats')
+    def stats(self, request):
+        """Return the user's recipe statistics, from their summaries"""
+        return self.cached_response(self._stats, request)
+
+    def _stats(self, request):
+        stats = summary.user_stats(request.user)
+        return Response(self.get_serializer(stats).data)
+
 
 @extend_schema_view(
     list=extend_schema(
@@ -96,17 +355,29 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 'assigned_only',
                 OpenApiTypes.INT, enum=[0, 1],
                 description='Filter to only include assigned recipes'
-            )
+            ),
+            OpenApiParameter(
+                'q',
+                OpenApiTypes.STR,
+                description='Autocomplete: return an unpaginated list of '
+                            'the best matching names'
+            ),
         ]
     )
 )
-class BaseRecipeAttrViewSet(mixins.DestroyModelMixin,
+class BaseRecipeAttrViewSet(ReplicaReadMixin,
+                            CachedResponseMixin,
+                            readers.RowListMixin,
+                            mixins.DestroyModelMixin,
                             mixins.UpdateModelMixin,
                             mixins.ListModelMixin,
                             viewsets.GenericViewSet):
     """Base class for recipe attributes"""
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
+    pagination_class = RecipeAttrCursorPagination
+    # Name of the ``Recipe`` M2M field linking to this model
+    recipe_field = None
 
     def get_queryset(self):
         """filter queryset to authenticated users"""
@@ -115,20 +386,44 @@ class BaseRecipeAttrViewSet(mixins.DestroyModelMixin,
         )
         queryset = self.queryset
         if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False)
+            queryset = filters.filter_assigned(queryset, self.recipe_field)
+
+        return filters.filter_owned(
+            queryset, self.request.user
+        ).order_by('-name', 'id')
+
+    def list(self, request, *args, **kwargs):
+        terms = request.query_params.get('q', '').strip()
+        if terms:
+            return self.suggest(request, terms)
+
+        return super().list(request, *args, **kwargs)
+
+    def suggest(self, request, terms):
+        """Return the names best matching ``terms``, without pagination"""
+        key = response_cache_key(request)
+        data = autocomplete.local_cache.get(key)
+        if data is None:
+            queryset = autocomplete.suggest(
+                self.get_queryset(),
+                terms,
+                settings.RECIPE_AUTOCOMPLETE_LIMIT
+            )
+            data = list(self.get_serializer(queryset, many=True).data)
+            autocomplete.local_cache.set(key, data)
 
-        return queryset.filter(
-            user=self.request.user
-        ).order_by('-name').distinct()
+        return Response(data)
 
 
 class TagViewSet(BaseRecipeAttrViewSet):
     """View set for Tag view"""
     serializer_class = serializers.TagSerializer
     queryset = Tag.objects.all()
+    recipe_field = 'tags'
 
 
 class IngredientViewSet(BaseRecipeAttrViewSet):
     """View set for Ingredient view"""
     serializer_class = serializers.IngredientSerializer
     queryset = Ingredient.objects.all()
+    recipe_field = 'ingredients'
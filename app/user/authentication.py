@@ -0,0 +1,121 @@
+"""
+Authentication classes for the API
+"""
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from core.cache import TTLCache
+from core.metrics import record_cache
+
+
+# The user columns authentication and permission checks read, besides the
+# primary key. Never the password hash, which must not reach a shared
+# cache; other columns are loaded on first access.
+CACHED_USER_FIELDS = ('email', 'is_active', 'is_staff', 'is_superuser')
+
+local_cache = TTLCache(
+    settings.TOKEN_AUTH_CACHE_SIZE,
+    settings.TOKEN_AUTH_CACHE_TTL,
+    name='auth_token'
+)
+
+
+def _shared_cache():
+    alias = settings.TOKEN_AUTH_SHARED_CACHE
+    return caches[alias] if alias else None
+
+
+def _shared_key(key):
+    """Shared cache key for a token, without exposing the token itself"""
+    return 'auth-token:v2:' + hashlib.sha256(key.encode()).hexdigest()
+
+
+def _field_names():
+    """Return the cached user columns, in the model's order"""
+    return [
+        f.attname for f in get_user_model()._meta.concrete_fields
+        if f.primary_key or f.attname in CACHED_USER_FIELDS
+    ]
+
+
+def _freeze(user):
+    """Return the user's cached column values, safe to cache and share"""
+    return tuple(getattr(user, name) for name in _field_names())
+
+
+def _thaw(values):
+    """Build a fresh user instance from cached column values
+
+    The columns not cached are deferred, so reading one queries it.
+    """
+    return get_user_model().from_db(DEFAULT_DB_ALIAS, _field_names(), values)
+
+
+def get_cached_user(key):
+    """Return the cached user for a token key, or None"""
+    values = local_cache.get(key)
+    if values is None:
+        shared = _shared_cache()
+        if shared is None:
+            return None
+        values = shared.get(_shared_key(key))
+        record_cache('auth_token_shared', values is not None)
+        if values is None:
+            return None
+        local_cache.set(key, values)
+
+    return _thaw(values)
+
+
+def cache_user(key, user):
+    """Remember the user a token key resolves to"""
+    values = _freeze(user)
+    local_cache.set(key, values)
+    shared = _shared_cache()
+    if shared is not None:
+        shared.set(
+            _shared_key(key),
+            values,
+            settings.TOKEN_AUTH_SHARED_CACHE_TTL
+        )
+
+
+def invalidate_token(key):
+    """Forget a token key"""
+    local_cache.delete(key)
+    shared = _shared_cache()
+    if shared is not None:
+        shared.delete(_shared_key(key))
+
+
+def invalidate_user(user):
+    """Forget every token key belonging to a user"""
+    for key in Token.objects.filter(user=user).values_list('key', flat=True):
+        invalidate_token(key)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Token authentication that caches the token to user lookup
+
+    Resolved tokens are kept in a bounded in-process LRU, optionally backed
+    by the shared cache named by ``TOKEN_AUTH_SHARED_CACHE``. Entries are
+    invalidated when a token is deleted or its user is saved. Other
+    processes' LRUs still expire by ``TOKEN_AUTH_CACHE_TTL``. Each request
+    gets its own user instance, so views may modify ``request.user`` safely.
+    """
+
+    def authenticate_credentials(self, key):
+        user = get_cached_user(key)
+        if user is not None and user.is_active:
+            return (user, Token(key=key, user=user))
+
+        user, token = super().authenticate_credentials(key)
+        cache_user(key, user)
+
+        return (user, token)
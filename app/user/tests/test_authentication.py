@@ -0,0 +1,132 @@
+"""
+Tests for the cached token authentication
+"""
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user import authentication
+
+ME_URL = reverse('user:me')
+
+
+def create_user(email='user@example.com', password='goodpass'):
+    return get_user_model().objects.create_user(
+        email=email,
+        password=password,
+        name='Test Name'
+    )
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Test authenticating with a cached token"""
+    def setUp(self):
+        authentication.local_cache.clear()
+        self.user = create_user()
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def get_me(self):
+        """Request the profile, returning the response and token queries"""
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(ME_URL)
+        token_queries = [
+            q for q in ctx.captured_queries if 'authtoken_token' in q['sql']
+        ]
+        return res, token_queries
+
+    def test_token_lookup_cached(self):
+        """Test the token is looked up once and then served from cache"""
+        res, queries = self.get_me()
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(queries), 1)
+
+        res, queries = self.get_me()
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.user.email)
+        self.assertEqual(res.data['name'], self.user.name)
+        self.assertEqual(queries, [])
+
+    def test_invalid_token_rejected(self):
+        """Test an unknown token is not authenticated"""
+        self.client.credentials(HTTP_AUTHORIZATION='Token invalid')
+
+        res, _ = self.get_me()
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_token_invalidated(self):
+        """Test deleting a token evicts it from the cache"""
+        self.get_me()
+        self.token.delete()
+
+        res, _ = self.get_me()
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_invalidated(self):
+        """Test deactivating a user evicts their tokens"""
+        self.get_me()
+        self.user.is_active = False
+        self.user.save()
+
+        res, _ = self.get_me()
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_profile_update_invalidated(self):
+        """Test updating the profile refreshes the cached user"""
+        self.get_me()
+        res = self.client.patch(ME_URL, {'name': 'New Name'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        res, queries = self.get_me()
+
+        self.assertEqual(res.data['name'], 'New Name')
+        self.assertEqual(len(queries), 1)
+
+    @override_settings(
+        TOKEN_AUTH_SHARED_CACHE='default',
+        CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'token-auth-tests',
+        }}
+    )
+    def test_shared_cache_fills_local_cache(self):
+        """Test a token cached by another worker is read from shared cache"""
+        self.get_me()
+        authentication.local_cache.clear()
+
+        res, queries = self.get_me()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(queries, [])
+
+    @override_settings(
+        TOKEN_AUTH_SHARED_CACHE='default',
+        CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'token-auth-tests',
+        }}
+    )
+    def test_password_not_cached(self):
+        """Test the cached user holds no password hash"""
+        self.get_me()
+
+        values = cache.get(authentication._shared_key(self.token.key))
+
+        self.assertEqual(
+            values,
+            (self.user.id, False, self.user.email, True, False)
+        )
+        self.assertNotIn(self.user.password, values)
+        self.assertEqual(authentication.local_cache.get(self.token.key),
+                         values)
@@ -8,6 +8,6 @@ server {
     location / {
         uwsgi_pass              ${APP_HOST}:${APP_PORT};
         include                 /etc/nginx/uwsgi_params;
-        client_max_body_size    10M;
+        client_max_body_size    ${CLIENT_MAX_BODY_SIZE};
     }
 }
\ No newline at end of file
@@ -2,5 +2,13 @@
 
 set -e
 
-envsubst < /etc/nginx/default.conf.tpl > /etc/nginx/conf.d/default.conf
+# uwsgi protocol for the WSGI app server, plain HTTP for the ASGI one
+if [ "${APP_SERVER}" = "asgi" ]; then
+    template=/etc/nginx/asgi.conf.tpl
+else
+    template=/etc/nginx/default.conf.tpl
+fi
+
+envsubst '${LISTEN_PORT} ${APP_HOST} ${APP_PORT} ${CLIENT_MAX_BODY_SIZE}' \
+    < "$template" > /etc/nginx/conf.d/default.conf
 nginx -g 'daemon off;'
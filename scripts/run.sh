@@ -6,5 +6,20 @@ python manage.py wait_for_db
 python manage.py collectstatic --noinput
 python manage.py migrate
 
+# Workers write their Prometheus metrics here, to be added up on scrape
+export PROMETHEUS_MULTIPROC_DIR=${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus}
+rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
 
-uwsgi --socket :9000 --workers 4 --master --enable-threads --module app.wsgi
\ No newline at end of file
+if [ "${APP_SERVER:-wsgi}" = "asgi" ]; then
+    # Each worker serves requests from an event loop and keeps up to
+    # ASYNC_DB_THREADS persistent database connections
+    exec gunicorn app.asgi:application \
+        --worker-class uvicorn.workers.UvicornWorker \
+        --workers ${ASGI_WORKERS:-2} \
+        --bind :9000
+fi
+
+# Each worker keeps one persistent database connection (DB_CONN_MAX_AGE);
+# size max_connections or the pgbouncer pool against UWSGI_WORKERS
+uwsgi --socket :9000 --workers ${UWSGI_WORKERS:-4} --master --enable-threads --module app.wsgi
\ No newline at end of file